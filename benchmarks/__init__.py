@@ -0,0 +1,4 @@
+"""Bộ benchmark hiệu năng cho môi trường Drone TSP.
+
+Chạy: ``python -m benchmarks.run``.
+"""
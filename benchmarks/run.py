@@ -0,0 +1,371 @@
+"""
+Benchmark throughput của ``DroneTspEnv`` theo kích thước instance.
+
+Mỗi cấu hình (số khách hàng x có/không giới hạn năng lượng và trạm sạc) đo:
+    - ``steps_per_sec``: số ``step`` mỗi giây (chỉ tính thời gian trong ``step``)
+    - ``resets_per_sec``: số ``reset`` sinh instance mới mỗi giây
+    - ``reuse_resets_per_sec``: số
+      ``reset(options={"new_coordinates": False})`` mỗi giây
+    - ``episode_wall_time``: thời gian trung bình một episode (giây)
+    - ``get_obs_us``, ``is_new_env_valid_us``: thời gian một lần gọi (micro giây)
+    - ``export_to_folium_ms``: thời gian xuất bản đồ HTML (chỉ với instance nhỏ)
+    - ``memory_bytes``: bộ nhớ Python cấp phát cho một env sau ``reset`` (tracemalloc)
+
+Không cần mạng. Kết quả ghi ra JSON và có thể so với baseline đã lưu:
+    python -m benchmarks.run --quick --output bench.json \
+        --baseline benchmarks/baseline.json
+
+Mặc định so sánh số đo thô. ``--normalize`` chia theo tỉ lệ ``calibration_us`` của hai
+lần chạy, chỉ nên dùng khi so giữa hai máy khác nhau: trên máy đang tải, bản thân
+calibration cũng dao động (xem ``calibration_spread``).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import gymnasium
+import numpy as np
+
+from gymnasium_env.envs.drone_tsp import DroneTspEnv
+from gymnasium_env.envs.folium_exporter import export_to_folium
+from gymnasium_env.envs.utils import is_new_env_valid
+
+SCHEMA_VERSION = 1
+DEFAULT_SIZES = (5, 50, 500, 5000)
+QUICK_SIZES = (5, 50, 500)
+# Hướng tốt của từng chỉ số: +1 càng lớn càng tốt, -1 càng nhỏ càng tốt
+METRIC_DIRECTIONS = {
+    "steps_per_sec": 1,
+    "resets_per_sec": 1,
+    "reuse_resets_per_sec": 1,
+    "episode_wall_time": -1,
+    "get_obs_us": -1,
+    "is_new_env_valid_us": -1,
+    "export_to_folium_ms": -1,
+    "memory_bytes": -1,
+}
+# Chỉ số không phụ thuộc tốc độ máy, không chuẩn hoá theo calibration
+UNNORMALIZED_METRICS = {"memory_bytes"}
+# Số vòng calibration đầu và cuối bộ benchmark, và trước mỗi cấu hình; mỗi vòng chạy
+# tác vụ tham chiếu trong ``CALIBRATION_ROUND_TIME`` giây
+CALIBRATION_ROUNDS = 25
+CALIBRATION_SCENARIO_ROUNDS = 5
+CALIBRATION_ROUND_TIME = 0.02
+# Độ dao động calibration (median / min - 1) vượt mức này thì chuẩn hoá không đáng tin
+CALIBRATION_MAX_SPREAD = 0.1
+# Chỉ xuất folium khi instance đủ nhỏ, tránh benchmark kéo dài vì sinh HTML
+FOLIUM_MAX_CUSTOMERS = 500
+
+
+def scenarios(sizes):
+    """Các cấu hình benchmark: không giới hạn, và có ``max_energy`` cùng trạm sạc."""
+    for num_customer_nodes in sizes:
+        yield dict(
+            name=f"c{num_customer_nodes}-free",
+            num_customer_nodes=num_customer_nodes,
+            num_charge_nodes=0,
+            max_energy=-1.0,
+        )
+        yield dict(
+            name=f"c{num_customer_nodes}-energy",
+            num_customer_nodes=num_customer_nodes,
+            num_charge_nodes=max(1, num_customer_nodes // 10),
+            max_energy=300.0,
+        )
+
+
+def _policy(env: DroneTspEnv) -> int:
+    """Chính sách tất định rẻ: khách hợp lệ có index nhỏ nhất, không có thì về depot."""
+    candidates = np.flatnonzero(env.action_masks() & env._is_customer)
+    return int(candidates[0]) if candidates.size else 0
+
+
+def _per_call(
+    func, min_time: float = 0.05, max_calls: int = 10_000, rounds: int = 3
+) -> float:
+    """Thời gian một lần gọi ``func`` (giây).
+
+    Mỗi vòng lặp tới khi đủ ``min_time``, lấy vòng nhanh nhất để giảm nhiễu (giống
+    ``timeit``).
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        calls, start = 0, time.perf_counter()
+        while True:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or calls >= max_calls:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def calibrate(rounds: int = CALIBRATION_ROUNDS) -> list:
+    """Các mẫu thời gian (micro giây) của một tác vụ tham chiếu cố định.
+
+    Tác vụ gồm vòng lặp Python và phép toán NumPy nhỏ, giống tải của ``step``. Mỗi vòng
+    lặp tác vụ trong ``CALIBRATION_ROUND_TIME`` giây và cho một mẫu; ``run_suite`` gom
+    mẫu rải đều suốt lần chạy để lấy min và độ dao động.
+    """
+    values = np.linspace(0.0, 1.0, 64)
+    mask = np.zeros(64, dtype=bool)
+
+    def workload():
+        total = 0.0
+        for index in range(64):
+            np.less_equal(values, values[index], out=mask)
+            total += float(values[mask].sum())
+        return total
+
+    return [
+        _per_call(workload, min_time=CALIBRATION_ROUND_TIME, rounds=1) * 1e6
+        for _ in range(rounds)
+    ]
+
+
+def _repeats(num_customer_nodes: int, small: int) -> int:
+    """Số lần lặp giảm dần theo kích thước để instance lớn không chạy quá lâu."""
+    return max(1, small * 50 // max(num_customer_nodes, 50))
+
+
+def run_scenario(
+    scenario: dict, episodes: int = 3, seed: int = 0, max_steps: int = 20_000
+) -> dict:
+    """Chạy một cấu hình và trả về các chỉ số."""
+    kwargs = {key: value for key, value in scenario.items() if key != "name"}
+    num_customer_nodes = kwargs["num_customer_nodes"]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    env = DroneTspEnv(**kwargs)
+    env.reset(seed=seed)
+    memory_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    resets = _repeats(num_customer_nodes, 20)
+    start = time.perf_counter()
+    for _ in range(resets):
+        env.reset()
+    resets_per_sec = resets / (time.perf_counter() - start)
+
+    reuse_resets = _repeats(num_customer_nodes, 200)
+    start = time.perf_counter()
+    for _ in range(reuse_resets):
+        env.reset(options={"new_coordinates": False})
+    reuse_resets_per_sec = reuse_resets / (time.perf_counter() - start)
+
+    step_time, steps, episode_times = 0.0, 0, []
+    for episode in range(episodes):
+        env.reset(seed=seed + 1 + episode)
+        episode_start = time.perf_counter()
+        done = False
+        while not done and steps < max_steps * (episode + 1):
+            action = _policy(env)
+            start = time.perf_counter()
+            _, _, terminated, truncated, _ = env.step(action)
+            step_time += time.perf_counter() - start
+            steps += 1
+            done = terminated or truncated
+        episode_times.append(time.perf_counter() - episode_start)
+
+    get_obs = _per_call(env._get_obs)
+    is_valid = _per_call(
+        lambda: is_new_env_valid(
+            env.all_nodes,
+            env.max_energy,
+            env.drone_speed,
+            env.max_packages_weight,
+            distance_matrix=env.distance_matrix,
+        )
+    )
+    metrics = {
+        "steps_per_sec": steps / step_time if step_time else float("nan"),
+        "resets_per_sec": resets_per_sec,
+        "reuse_resets_per_sec": reuse_resets_per_sec,
+        "episode_wall_time": float(np.mean(episode_times)),
+        "get_obs_us": get_obs * 1e6,
+        "is_new_env_valid_us": is_valid * 1e6,
+        "memory_bytes": memory_bytes,
+    }
+    if num_customer_nodes <= FOLIUM_MAX_CUSTOMERS:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "render", "index.html")
+            route = env.route.tolist()
+            metrics["export_to_folium_ms"] = 1e3 * _per_call(
+                lambda: export_to_folium(env.all_nodes, route, file_path),
+                min_time=0.1,
+                max_calls=10,
+            )
+    env.close()
+    return {
+        "name": scenario["name"],
+        "params": kwargs,
+        "steps": steps,
+        "metrics": metrics,
+    }
+
+
+def run_suite(sizes=DEFAULT_SIZES, episodes: int = 3, seed: int = 0, log=print) -> dict:
+    """Chạy toàn bộ cấu hình, trả về dict sẵn sàng ghi JSON.
+
+    ``meta["calibration_us"]`` là mẫu calibration nhanh nhất trong lần chạy,
+    ``meta["calibration_spread"]`` là ``median / min - 1`` của các mẫu.
+    """
+    calibration = calibrate()
+    results = []
+    for scenario in scenarios(sizes):
+        calibration += calibrate(CALIBRATION_SCENARIO_ROUNDS)
+        result = run_scenario(scenario, episodes=episodes, seed=seed)
+        results.append(result)
+        if log is not None:
+            log(
+                f"{result['name']:>14}  "
+                + "  ".join(
+                    f"{key}={value:.4g}" for key, value in result["metrics"].items()
+                )
+            )
+    calibration += calibrate()
+    calibration_us = min(calibration)
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "gymnasium": gymnasium.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "sizes": list(sizes),
+            "episodes": episodes,
+            "seed": seed,
+            "calibration_us": calibration_us,
+            "calibration_spread": float(np.median(calibration)) / calibration_us - 1.0,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    current: dict, baseline: dict, tolerance: float = 0.3, normalize: bool = False
+) -> list:
+    """So sánh với baseline theo tên cấu hình.
+
+    Args:
+        current (dict): Kết quả của ``run_suite``.
+        baseline (dict): Kết quả đã lưu.
+        tolerance (float, optional): Mức xấu đi tương đối cho phép. Defaults to 0.3.
+        normalize (bool, optional): Chia theo tỉ lệ ``calibration_us`` của hai lần chạy
+            để bù chênh lệch tốc độ giữa hai máy. Defaults to False.
+
+    Returns:
+        list: Các dict ``{name, metric, baseline, current, change, regression}``;
+            ``change`` là thay đổi tương đối (đã chuẩn hoá), ``regression`` là True khi
+            chỉ số xấu đi quá ``tolerance``.
+    """
+    speed_ratio = 1.0
+    if (
+        normalize
+        and "calibration_us" in current["meta"]
+        and "calibration_us" in baseline["meta"]
+    ):
+        speed_ratio = (
+            current["meta"]["calibration_us"] / baseline["meta"]["calibration_us"]
+        )
+    baseline_results = {
+        result["name"]: result["metrics"] for result in baseline["results"]
+    }
+    rows = []
+    for result in current["results"]:
+        reference = baseline_results.get(result["name"])
+        if reference is None:
+            continue
+        for metric, value in result["metrics"].items():
+            if metric not in reference or not reference[metric]:
+                continue
+            direction = METRIC_DIRECTIONS.get(metric, 1)
+            ratio = value / reference[metric]
+            if metric not in UNNORMALIZED_METRICS:
+                # Máy chậm hơn k lần: thời gian kỳ vọng gấp k, throughput kỳ vọng chia k
+                ratio = ratio * speed_ratio if direction > 0 else ratio / speed_ratio
+            change = ratio - 1.0
+            rows.append(
+                {
+                    "name": result["name"],
+                    "metric": metric,
+                    "baseline": reference[metric],
+                    "current": value,
+                    "change": change,
+                    "regression": direction * change < -tolerance,
+                }
+            )
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="DroneTSP environment benchmarks.")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", help="num_customer_nodes values"
+    )
+    parser.add_argument("--quick", action="store_true", help=f"Use sizes {QUICK_SIZES}")
+    parser.add_argument("--episodes", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Relative slowdown allowed before a metric counts as a regression",
+    )
+    parser.add_argument(
+        "--normalize",
+        action="store_true",
+        help="Scale timings by the calibration ratio of the two runs "
+        "(for baselines recorded on another machine)",
+    )
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    current = run_suite(sizes, episodes=args.episodes, seed=args.seed)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if args.normalize:
+        spread = max(
+            run["meta"].get("calibration_spread", float("inf"))
+            for run in (current, baseline)
+        )
+        if spread > CALIBRATION_MAX_SPREAD:
+            print(
+                f"warning: calibration spread {spread:.0%} exceeds "
+                f"{CALIBRATION_MAX_SPREAD:.0%}; normalized results are unreliable",
+                file=sys.stderr,
+            )
+    rows = compare(
+        current, baseline, tolerance=args.tolerance, normalize=args.normalize
+    )
+    regressions = [row for row in rows if row["regression"]]
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:>14} {row['metric']:>22} {row['baseline']:>12.4g} -> "
+            f"{row['current']:<12.4g} {row['change']:+8.1%} {flag}"
+        )
+    print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
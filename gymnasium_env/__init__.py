@@ -4,3 +4,8 @@ register(
     id="gymnasium_env/DroneTsp-v1",
     entry_point="gymnasium_env.envs:DroneTspEnv",
 )
+
+register(
+    id="gymnasium_env/DroneTsp-vec-v1",
+    vector_entry_point="gymnasium_env.envs:DroneTspVecEnv",
+)
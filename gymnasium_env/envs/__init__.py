@@ -1,2 +1,3 @@
-from gymnasium_env.envs.drone_tsp import DroneTspEnv
-from gymnasium_env.envs.utils import *
\ No newline at end of file
+from gymnasium_env.envs.drone_tsp import DroneTspEnv, DroneTspState  # noqa: F401
+from gymnasium_env.envs.drone_tsp_vec import DroneTspVecEnv  # noqa: F401
+from gymnasium_env.envs.utils import *  # noqa: F401, F403
@@ -1,15 +1,93 @@
+import math
+from dataclasses import dataclass, field
+
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
 from gymnasium_env.envs.node_transformer import NodeTransformer
-from gymnasium_env.envs.interfaces import NODE_TYPES, Node
+from gymnasium_env.envs.interfaces import NODE_TYPES
+from gymnasium_env.envs.node_storage import NodeStorage
+from gymnasium_env.envs.energy import DEFAULT_ENERGY_MODEL, EnergyModel, EnergyTable
+from gymnasium_env.envs.instance_generator import DroneTspInstance, generate_instance
+from gymnasium_env.envs.instance_bank import InstanceBank
+from gymnasium_env.envs.instance_prefetcher import InstancePrefetcher
+from gymnasium_env.envs.spatial_index import GridIndex
 from gymnasium_env.envs.utils import (
-    calc_energy_consumption,
-    is_new_env_valid,
-    total_distance_of_a_random_route,
+    LazyDistanceMatrix,
+    calc_distance_matrix,
+    nearest_neighbours,
 )
-from geopy.distance import geodesic
-from gymnasium_env.envs.folium_exporter import export_to_folium
+from gymnasium_env.envs.folium_renderer import FoliumRenderer
+from gymnasium_env.envs.rasterizer import Rasterizer
+
+
+def _readonly_view(array: np.ndarray) -> np.ndarray:
+    """Trả về view chỉ đọc của mảng, không sao chép dữ liệu."""
+    view = array.view()
+    view.setflags(write=False)
+    return view
+
+
+def _last_history(buffer_name: str):
+    def getter(env) -> float:
+        last = env._history_length - 1
+        return float(getattr(env, buffer_name)[last]) if last >= 0 else 0.0
+
+    return getter
+
+
+# Các khoá ``info`` có thể yêu cầu qua ``info_keys``; mỗi khoá chỉ
+# được tính khi được yêu cầu
+INFO_FIELDS = {
+    "drone_speed": lambda env: env.drone_speed,
+    "customers": lambda env: env.customer_nodes,
+    "history_length": lambda env: env._history_length,
+    "distance_histories": lambda env: env.distance_histories,
+    "energy_consumption_histories": lambda env: env.energy_consumption_histories,
+    "last_distance": _last_history("_distance_buffer"),
+    "last_energy": _last_history("_energy_buffer"),
+    "charge_count": lambda env: env.charge_count,
+    "remain_packages_weight": lambda env: env.remain_packages_weight,
+    "max_energy": lambda env: env.max_energy,
+    "generation_retries": lambda env: env.generation_retries,
+    "generation_time": lambda env: env.generation_time,
+    "instance_id": lambda env: env.instance_id,
+}
+
+
+@dataclass(frozen=True)
+class DroneTspState:
+    """
+    Ảnh chụp trạng thái thay đổi trong episode của ``DroneTspEnv`` (xem ``get_state``).
+
+    Chỉ gồm số vô hướng và ``bytes`` nên nhỏ gọn, bất biến và hash được. Dữ liệu
+    tĩnh của instance không được sao chép; ``instance`` là số thứ tự instance trong
+    env để ``set_state`` từ chối ảnh chụp của instance khác. Lộ trình và lịch sử
+    cạnh không tham gia so sánh/hash: hai ảnh chụp bằng nhau khi cùng thứ tự ghé
+    thăm, vị trí và các giá trị tích luỹ.
+
+    Attributes:
+        instance (int): Số thứ tự instance trong env.
+        visited_order (bytes): Cột ``visited_order`` dạng int32.
+        prev_position (int): Node hiện tại.
+        remain_packages_weight (float): Khối lượng hàng còn lại.
+        total_energy_consumption (float): Năng lượng đã tiêu thụ từ lần sạc gần nhất.
+        charge_count (int): Số lần sạc.
+        total_distance (float): Tổng quãng đường.
+        route (bytes): Lộ trình dạng int32.
+        distance_histories, energy_histories (bytes): Lịch sử cạnh dạng float64.
+    """
+
+    instance: int
+    visited_order: bytes
+    prev_position: int
+    remain_packages_weight: float
+    total_energy_consumption: float
+    charge_count: int
+    total_distance: float
+    route: bytes = field(compare=False, repr=False)
+    distance_histories: bytes = field(compare=False, repr=False)
+    energy_histories: bytes = field(compare=False, repr=False)
 
 
 class DroneTspEnv(gym.Env):
@@ -33,6 +111,21 @@ class DroneTspEnv(gym.Env):
         max_package_weight: float = 5,
         max_energy: float = -1.0,
         max_charge_times: int = -1,
+        observation_copy: str = "copy",
+        observation_mode: str = "default",
+        graph_edges: str = None,
+        graph_neighbours: int = 8,
+        action_mode: str = "nodes",
+        num_candidates: int = 16,
+        lazy_distances: bool = False,
+        reachability_mask: bool = False,
+        energy_model: EnergyModel = None,
+        instance_bank=None,
+        prefetch_depth: int = 0,
+        prefetch_workers: int = 1,
+        prefetch_executor: str = "thread",
+        max_episode_steps: int = None,
+        info_keys=(),
     ):
         """Constructor của class
 
@@ -40,11 +133,75 @@ class DroneTspEnv(gym.Env):
             render_mode (str, optional): Loại hiển thị. Defaults to None.
             num_customer_nodes (int, optional): Số lượng node nhận hàng. Defaults to 5.
             num_charge_nodes (int, optional): Số lượng trạm sạc. Defaults to 1.
-            package_weights (float, optional): Sức chứa tối đa drone có thể mang (kg). Defaults to 40.
-            min_package_weight (float, optional): Khối lượng tối thiểu mỗi đơn hàng (kg). Defaults to 1.
-            max_package_weight (float, optional): Khối lượng tối đa mỗi đơn hàng (kg). Defaults to 5.
+            package_weights (float, optional): Sức chứa tối đa drone có thể
+                mang (kg). Defaults to 40.
+            min_package_weight (float, optional): Khối lượng tối thiểu mỗi đơn
+                hàng (kg). Defaults to 1.
+            max_package_weight (float, optional): Khối lượng tối đa mỗi đơn
+                hàng (kg). Defaults to 5.
             max_energy (float, optional): Tổng năng lượng của drone. Defaults to -1.0.
-            max_charge_times (int, optional): Số lần sạc tối đa của drone. Giá trị âm để bỏ giới hạn.
+            max_charge_times (int, optional): Số lần sạc tối đa của drone.
+                Giá trị âm để bỏ giới hạn.
+            observation_copy (str, optional): Cách trả về các mảng observation.
+                ``"copy"`` trả về bản sao độc lập; ``"view"`` trả về view chỉ đọc của
+                bộ đệm nội bộ (không cấp phát, nhưng giá trị thay đổi theo các bước
+                sau). Defaults to "copy".
+            observation_mode (str, optional): Bố cục observation của các node.
+                ``"default"`` là bảng ``nodes`` float32 (N, 5); ``"compact"`` tách
+                thành ``coords`` int16 (lệch so với depot, fixed-point), ``node_type``
+                uint8, ``package_weight`` float16, ``visited_order`` uint16 và
+                ``depot`` float64 (2,), giải mã bằng
+                ``NodeTransformer.decode_compact``. Defaults to "default".
+            graph_edges (str, optional): Thêm đặc trưng cạnh tĩnh vào observation, tính
+                một lần cho mỗi instance và trả về cùng một mảng chỉ đọc ở mọi bước.
+                ``"dense"`` thêm ``edge_distance``/``edge_energy`` (N, N); ``"knn"``
+                thêm ``edge_index`` (N, k) là ``k`` node gần nhất cùng
+                ``edge_distance``/``edge_energy`` (N, k). ``None`` để tắt. Defaults to
+                None.
+            graph_neighbours (int, optional): Số láng giềng ``k`` khi
+                ``graph_edges="knn"``, bị chặn bởi ``N - 1``. Defaults to 8.
+            action_mode (str, optional): ``"nodes"`` chọn trực tiếp index node
+                (``Discrete(N)``); ``"candidates"`` chọn trong ``Discrete(num_candidates
+                + 1)``: 0 là depot, ``i >= 1`` là ứng viên thứ ``i`` trong
+                ``obs["candidates"]`` — các khách hàng chưa ghé, hợp lệ gần
+                ``prev_position`` nhất, tìm qua chỉ mục lưới ``GridIndex`` thay vì duyệt
+                cả N node. ``action_mask`` khi đó theo ô ứng viên. Defaults to "nodes".
+            num_candidates (int, optional): Số ô ứng viên khi
+                ``action_mode="candidates"``, bị chặn bởi
+                ``num_customer_nodes``. Defaults to 16.
+            lazy_distances (bool, optional): Không tính trước ma trận khoảng cách
+                O(N²) mà tính từng cặp khi cần (``LazyDistanceMatrix``);
+                ``distance_matrix`` vẫn trả về ma trận đầy đủ (tính lần đầu khi truy
+                cập). Nên dùng cùng ``action_mode="candidates"`` cho instance hàng
+                nghìn khách hàng. Defaults to False.
+            reachability_mask (bool, optional): Mặt nạ chặt hơn, chỉ giữ các nước
+                đi mà sau đó drone vẫn về được depot (nơi duy nhất nạp lại năng
+                lượng, trạm sạc không có tác dụng): năng lượng tới node cộng chặng
+                về depot phải nhỏ hơn ``max_energy``; depot bị che khi về sớm chắc
+                chắn vượt ``max_charge_times`` (xem
+                ``_depot_within_charge_limit``). Defaults to False.
+            energy_model (EnergyModel, optional): Mô hình năng lượng của drone.
+                Defaults to ``DEFAULT_ENERGY_MODEL`` (công thức trong bài báo,
+                thông số DJI FlyCart 30).
+            instance_bank (str | InstanceBank, optional): Bank instance sinh sẵn (đường
+                dẫn hoặc đối tượng ``InstanceBank``). Khi có bank, ``reset`` nạp
+                instance từ bank thay vì sinh mới. Defaults to None.
+            prefetch_depth (int, optional): Số instance sinh trước ở nền; 0 để sinh đồng
+                bộ trong ``reset``. Khi bật, chuỗi instance được sinh từ seed con của
+                ``np_random``: vẫn tất định theo seed (không phụ thuộc số worker) nhưng
+                ánh xạ seed -> instance thay đổi, tức ``reset(seed=s)`` cho instance
+                khác so với khi tắt. Defaults to 0.
+            prefetch_workers (int, optional): Số worker sinh trước. Defaults to 1.
+            prefetch_executor (str, optional): ``"thread"`` hoặc
+                ``"process"``. Defaults to "thread".
+            max_episode_steps (int, optional): Số bước tối đa dự kiến của một
+                episode, dùng để cấp phát trước bộ đệm lịch sử và lộ trình; vượt
+                quá thì bộ đệm nới gấp đôi. Defaults to ``2 * số node`` (đủ cho một
+                lần về depot sau mỗi node).
+            info_keys (Sequence[str] | str, optional): Các khoá đưa vào ``info`` (xem
+                ``INFO_FIELDS``), chỉ các khoá này được tính; ``"all"`` để lấy tất
+                cả. Mặc định ``info`` rỗng, giảm chi phí tạo và pickle ``info`` (ví
+                dụ qua ``AsyncVectorEnv``).
         """
         self.num_customer_nodes = num_customer_nodes
         self.num_charge_nodes = num_charge_nodes
@@ -56,8 +213,45 @@ class DroneTspEnv(gym.Env):
         self.max_charge_times = max_charge_times
         # Số 1 là node depot
         total_num_nodes = 1 + self.num_customer_nodes + self.num_charge_nodes
-        self.observation_space = spaces.Dict(
-            {
+        if observation_mode not in ("default", "compact"):
+            raise ValueError(
+                f"Unknown observation_mode {observation_mode!r}, "
+                "expected 'default' or 'compact'."
+            )
+        self.observation_mode = observation_mode
+        if observation_mode == "compact":
+            dtypes = NodeTransformer.COMPACT_DTYPES
+            coord_limit = np.iinfo(dtypes["coords"])
+            node_spaces = {
+                "coords": spaces.Box(
+                    low=coord_limit.min,
+                    high=coord_limit.max,
+                    shape=(total_num_nodes, 2),
+                    dtype=dtypes["coords"],
+                ),
+                "node_type": spaces.Box(
+                    low=0, high=2, shape=(total_num_nodes,), dtype=dtypes["node_type"]
+                ),
+                "package_weight": spaces.Box(
+                    low=0,
+                    high=100,
+                    shape=(total_num_nodes,),
+                    dtype=dtypes["package_weight"],
+                ),
+                "visited_order": spaces.Box(
+                    low=0,
+                    high=total_num_nodes,
+                    shape=(total_num_nodes,),
+                    dtype=dtypes["visited_order"],
+                ),
+                "depot": spaces.Box(
+                    low=np.array([-180, -90], dtype=dtypes["depot"]),
+                    high=np.array([180, 90], dtype=dtypes["depot"]),
+                    dtype=dtypes["depot"],
+                ),
+            }
+        else:
+            node_spaces = {
                 "nodes": spaces.Box(
                     low=np.array(
                         [-180, -90, 0, 0, 0] * total_num_nodes, dtype=np.float32
@@ -69,6 +263,52 @@ class DroneTspEnv(gym.Env):
                     shape=(total_num_nodes, NodeTransformer.get_shape()),
                     dtype=np.float32,
                 ),
+            }
+        if graph_edges not in (None, "dense", "knn"):
+            raise ValueError(
+                f"Unknown graph_edges {graph_edges!r}, expected None, 'dense' or 'knn'."
+            )
+        self.graph_edges = graph_edges
+        if graph_edges is not None:
+            self.graph_neighbours = (
+                total_num_nodes
+                if graph_edges == "dense"
+                else max(0, min(graph_neighbours, total_num_nodes - 1))
+            )
+            edge_shape = (total_num_nodes, self.graph_neighbours)
+            if graph_edges == "knn":
+                node_spaces["edge_index"] = spaces.Box(
+                    low=0, high=total_num_nodes - 1, shape=edge_shape, dtype=np.int32
+                )
+            node_spaces["edge_distance"] = spaces.Box(
+                low=0, high=np.inf, shape=edge_shape, dtype=np.float32
+            )
+            node_spaces["edge_energy"] = spaces.Box(
+                low=0, high=np.inf, shape=edge_shape, dtype=np.float32
+            )
+        if action_mode not in ("nodes", "candidates"):
+            raise ValueError(
+                f"Unknown action_mode {action_mode!r}, "
+                "expected 'nodes' or 'candidates'."
+            )
+        self.action_mode = action_mode
+        # Không thể có nhiều ứng viên hơn số khách hàng, ô thừa sẽ luôn trống
+        num_candidates = max(1, min(num_candidates, num_customer_nodes))
+        self.num_candidates = num_candidates
+        self.lazy_distances = lazy_distances
+        self.reachability_mask = reachability_mask
+        num_actions = total_num_nodes
+        if action_mode == "candidates":
+            num_actions = num_candidates + 1
+            node_spaces["candidates"] = spaces.Box(
+                low=-1,
+                high=total_num_nodes - 1,
+                shape=(num_candidates,),
+                dtype=np.int32,
+            )
+        self.observation_space = spaces.Dict(
+            {
+                **node_spaces,
                 "total_distance": spaces.Box(
                     low=0, high=np.inf, shape=(1,), dtype=np.float32
                 ),
@@ -78,11 +318,13 @@ class DroneTspEnv(gym.Env):
                 "charge_count": spaces.Box(
                     low=0, high=np.inf, shape=(1,), dtype=np.int16
                 ),
+                # 1 nếu action hợp lệ ở trạng thái hiện tại, dùng cho maskable policy
+                "action_mask": spaces.MultiBinary(num_actions),
             }
         )
 
         # Action là index trong danh sách tất cả node.
-        self.action_space = spaces.Discrete(n=total_num_nodes, start=0)
+        self.action_space = spaces.Discrete(n=num_actions, start=0)
         # Tổng khoảng cách đã đi
         self.total_distance = 0
         # Năng lượng tiêu thụ
@@ -96,91 +338,349 @@ class DroneTspEnv(gym.Env):
         self.charge_count = 0
         # Tốc độ bay của drone, lấy theo DJI Fly-Cart 30
         self.drone_speed = 15  # m/s
-        # Lưu trữ giá trị distance và năng lượng giữa các cạnh để tạo input graph
-        self.distance_histories = []
-        self.energy_consumption_histories = []
+        # Lưu trữ giá trị distance và năng lượng giữa các cạnh để tạo input graph, cấp
+        # phát trước theo số bước tối đa của episode; _history_length là số cạnh đã ghi
+        if isinstance(info_keys, str):
+            info_keys = tuple(INFO_FIELDS) if info_keys == "all" else (info_keys,)
+        unknown = [key for key in info_keys if key not in INFO_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"Unknown info keys {unknown}, "
+                f"expected a subset of {list(INFO_FIELDS)}."
+            )
+        self.info_keys = tuple(info_keys)
+        self._info_getters = tuple((key, INFO_FIELDS[key]) for key in self.info_keys)
+        self._history_capacity = max_episode_steps or 2 * total_num_nodes
+        self._distance_buffer = np.zeros(self._history_capacity, dtype=np.float64)
+        self._energy_buffer = np.zeros(self._history_capacity, dtype=np.float64)
+        self._history_length = 0
+        # Ma trận khoảng cách giữa các node, tính một lần cho mỗi instance
+        self._distance_matrix = None
+        # Mô hình năng lượng và bảng năng lượng theo instance
+        self.energy_model = energy_model or DEFAULT_ENERGY_MODEL
+        self._energy_table = None
+        # Đặc trưng cạnh tĩnh của instance (graph_edges), tạo lại khi đổi instance
+        self._edge_obs = None
+        # Dữ liệu node dạng cột, all_nodes là các NodeView trỏ vào đây
+        self._nodes = None
+        # Số thứ tự instance, tăng mỗi khi nạp instance mới (dùng cho DroneTspState)
+        self._instance_serial = 0
+        assert observation_copy in ("copy", "view")
+        self.observation_copy = observation_copy
+        # Bộ đệm observation cho các giá trị tích luỹ, cập nhật tại chỗ mỗi bước
+        self._total_distance_buffer = np.zeros(1, dtype=np.float32)
+        self._energy_consumption_buffer = np.zeros(1, dtype=np.float32)
+        self._charge_count_buffer = np.zeros(1, dtype=np.int16)
+        # Mặt nạ action hợp lệ, cập nhật sau mỗi bước
+        self._action_mask = np.ones(num_actions, dtype=bool)
+        # Ứng viên hiện tại (index node, -1 nếu trống) và chỉ mục
+        # lưới khách hàng chưa ghé
+        self._candidates = np.full(
+            num_candidates if action_mode == "candidates" else 0, -1, dtype=np.int32
+        )
+        self._spatial_index = None
+        # Lộ trình đã đi (index node), chỉ ghi thêm vào cuối; bắt đầu từ depot
+        self._route = np.zeros(self._history_capacity + 1, dtype=np.int64)
+        self._route_length = 1
+        self._is_customer = np.zeros(total_num_nodes, dtype=bool)
+        self._is_customer[1 : 1 + self.num_customer_nodes] = True
+        # Thống kê lần sinh instance gần nhất
+        self.generation_retries = 0
+        self.generation_time = 0.0
+        # Bank instance sinh sẵn (memory-map), id instance hiện tại; -1
+        # nếu instance được sinh mới
+        if instance_bank is not None and not isinstance(instance_bank, InstanceBank):
+            instance_bank = InstanceBank(instance_bank)
+        if instance_bank is not None and instance_bank.num_nodes != total_num_nodes:
+            raise ValueError(
+                f"Instance bank has {instance_bank.num_nodes} nodes per instance, "
+                f"environment expects {total_num_nodes}."
+            )
+        self.instance_bank = instance_bank
+        self.instance_id = -1
+        # Hàng đợi instance sinh trước, tạo ở lần reset đầu tiên
+        # khi np_random đã có seed
+        self.prefetch_depth = prefetch_depth
+        self.prefetch_workers = prefetch_workers
+        self.prefetch_executor = prefetch_executor
+        self._prefetcher = None
 
         assert render_mode is None or render_mode in self.metadata["render_modes"]
         self.render_mode = render_mode
+        # Thread nền ghi bản đồ (human) và bộ vẽ offscreen
+        # (rgb_array), tạo khi render lần đầu
+        self._renderer = None
+        self.rasterizer = None
 
-    def __init_nodes(self):
-        """Khởi tạo danh sách node"""
-        # Giới hạn vĩ độ và kinh độ cho khu vực TP.HCM
-        LAT_BOTTOM, LAT_TOP = 10.75, 10.80
-        LON_LEFT, LON_RIGHT = 106.65, 106.72
-
-        max_retry = 100
-        for _ in range(max_retry):
-            # Sinh trọng lượng từng gói hàng cho node khách hàng (độc lập)
-            packages_weight = [
-                float(
-                    self.np_random.uniform(
-                        self.min_package_weight_per_node, self.max_package_weight_per_node
-                    )
-                )
-                for _ in range(self.num_customer_nodes)
-            ]
-
-            # === Tạo node Depot ===
-            depot_lat = float(self.np_random.uniform(LAT_BOTTOM, LAT_TOP))
-            depot_lon = float(self.np_random.uniform(LON_LEFT, LON_RIGHT))
-            depot = [
-                Node(
-                    lon=depot_lon,  # longitude
-                    lat=depot_lat,  # latitude
-                    node_type=NODE_TYPES.depot,
-                    package_weight=0.0,
-                    visited_order=1,
-                )
-            ]
-
-            # === Tạo node Khách hàng ===
-            customer_nodes = []
-            for i in range(self.num_customer_nodes):
-                # Random vị trí node khách hàng
-                lat = float(self.np_random.uniform(LAT_BOTTOM, LAT_TOP))
-                lon = float(self.np_random.uniform(LON_LEFT, LON_RIGHT))
-
-                # Thêm node khách hàng vào danh sách
-                customer_nodes.append(
-                    Node(
-                        lon=lon,
-                        lat=lat,
-                        node_type=NODE_TYPES.customer,
-                        package_weight=float(packages_weight[i]),
-                        visited_order=0,
-                    )
-                )
+    def __init_nodes(self, instance: DroneTspInstance = None):
+        """Khởi tạo danh sách node, sinh instance mới nếu không truyền ``instance``"""
+        if instance is None:
+            instance = self.__generate_instance()
+        self.generation_retries = instance.retries
+        self.generation_time = instance.generation_time
 
-            # === Tạo node Trạm sạc ===
-            charge_nodes = []
-            for _ in range(self.num_charge_nodes):
-                lat = float(self.np_random.uniform(LAT_BOTTOM, LAT_TOP))
-                lon = float(self.np_random.uniform(LON_LEFT, LON_RIGHT))
-                charge_nodes.append(
-                    Node(
-                        lon=lon,
-                        lat=lat,
-                        node_type=NODE_TYPES.charging_station,
-                        package_weight=0.0,
-                        visited_order=0,
-                    )
-                )
+        self._nodes = NodeStorage(
+            coords=instance.coords,
+            node_types=instance.node_types,
+            package_weights=instance.package_weights,
+        )
+        self.all_nodes = self._nodes.views()
+        self.depot = self.all_nodes[:1]
+        self.customer_nodes = self.all_nodes[1 : 1 + self.num_customer_nodes]
+        self.charge_nodes = self.all_nodes[1 + self.num_customer_nodes :]
+        distance_matrix = instance.distance_matrix
+        if distance_matrix is None:
+            if self.lazy_distances:
+                distance_matrix = LazyDistanceMatrix(instance.coords)
+            else:
+                distance_matrix = calc_distance_matrix(instance.coords)
+        if isinstance(distance_matrix, np.ndarray) and distance_matrix.flags.writeable:
+            distance_matrix.setflags(write=False)
+        self._distance_matrix = distance_matrix
+        self._energy_table = EnergyTable(
+            self._distance_matrix, self.drone_speed, self.energy_model
+        )
+        self._edge_obs = None
+        self._instance_serial += 1
+        if self.action_mode == "candidates":
+            self._spatial_index = GridIndex(
+                instance.coords,
+                np.flatnonzero(instance.node_types == NODE_TYPES.customer.value),
+            )
+
+    def __generator_kwargs(self) -> dict:
+        """Tham số sinh instance của env (trừ bộ sinh số ngẫu nhiên)"""
+        return dict(
+            num_customer_nodes=self.num_customer_nodes,
+            num_charge_nodes=self.num_charge_nodes,
+            min_package_weight=self.min_package_weight_per_node,
+            max_package_weight=self.max_package_weight_per_node,
+            max_energy=self.max_energy,
+            drone_speed=self.drone_speed,
+            max_payload=self.max_packages_weight,
+            energy_model=self.energy_model,
+            compute_distance_matrix=not self.lazy_distances,
+        )
+
+    def __generate_instance(self) -> DroneTspInstance:
+        """Sinh instance mới từ ``self.np_random``, hoặc lấy từ hàng đợi sinh trước."""
+        if self._prefetcher is not None:
+            return self._prefetcher.get()
+        return generate_instance(self.np_random, **self.__generator_kwargs())
+
+    def __reseed_prefetcher(self, seeded: bool):
+        """Tạo hoặc seed lại hàng đợi sinh trước khi ``reset`` nhận seed mới."""
+        if self.prefetch_depth <= 0 or (self._prefetcher is not None and not seeded):
+            return
+        seed_sequence = np.random.SeedSequence(int(self.np_random.integers(2**63)))
+        if self._prefetcher is None:
+            self._prefetcher = InstancePrefetcher(
+                self.__generator_kwargs(),
+                seed_sequence,
+                depth=self.prefetch_depth,
+                num_workers=self.prefetch_workers,
+                executor=self.prefetch_executor,
+            )
+        else:
+            self._prefetcher.reseed(seed_sequence)
+
+    @property
+    def prefetch_stats(self) -> dict:
+        """Thống kê hàng đợi sinh trước.
+
+        Gồm ``depth``, ``ready``, ``hits``, ``stalls`` và ``stall_time``.
+        """
+        if self._prefetcher is None:
+            return {}
+        return self._prefetcher.stats()
+
+    def __select_instance_id(self, options: dict, new_coordinates: bool):
+        """Chọn id instance trong bank theo ``options``; ``None`` nếu không nạp từ bank.
+
+        ``instance_id`` chọn đúng một instance, ``instance_range`` (``(start,
+        stop)``) chọn ngẫu nhiên trong khoảng. Khi có bank mà không truyền gì, chọn
+        ngẫu nhiên trong toàn bộ bank.
+        """
+        instance_id = options.get("instance_id")
+        instance_range = options.get("instance_range")
+        if instance_id is None and instance_range is None:
+            if self.instance_bank is None or not new_coordinates:
+                return None
+        if self.instance_bank is None:
+            raise ValueError(
+                "reset() options 'instance_id'/'instance_range' "
+                "require an instance_bank."
+            )
+        if instance_id is not None:
+            return int(instance_id)
+        start, stop = (
+            instance_range
+            if instance_range is not None
+            else (0, len(self.instance_bank))
+        )
+        if not 0 <= start < stop <= len(self.instance_bank):
+            raise ValueError(
+                f"Invalid instance_range ({start}, {stop}) "
+                f"for a bank of {len(self.instance_bank)} instances."
+            )
+        return int(self.np_random.integers(start, stop))
+
+    @property
+    def distance_matrix(self) -> np.ndarray:
+        """Ma trận khoảng cách (mét) giữa mọi cặp node của instance hiện tại.
+
+        Index trùng với action: 0 là depot, sau đó là khách hàng và trạm sạc. Mảng chỉ
+        đọc, được tính lại khi ``reset`` sinh toạ độ mới.
+        """
+        if self._distance_matrix is None:
+            raise RuntimeError("Call reset() before accessing the distance matrix.")
+        if isinstance(self._distance_matrix, LazyDistanceMatrix):
+            # Tính đầy đủ một lần; các truy cập lazy sau đó đọc từ ma trận này
+            return np.asarray(self._distance_matrix)
+        return self._distance_matrix
+
+    @property
+    def energy_table(self) -> EnergyTable:
+        """Bảng năng lượng của instance hiện tại, dùng để truy vấn theo lô."""
+        if self._energy_table is None:
+            raise RuntimeError("Call reset() before accessing the energy table.")
+        return self._energy_table
+
+    @property
+    def route(self) -> np.ndarray:
+        """Lộ trình của episode hiện tại dưới dạng view chỉ đọc, bắt đầu bằng depot (0).
+
+        ``reset`` cấp bộ đệm mới nên view của episode trước giữ nguyên giá trị.
+        """
+        return _readonly_view(self._route[: self._route_length])
+
+    @property
+    def distance_histories(self) -> np.ndarray:
+        """Khoảng cách (m) của từng cạnh đã đi trong episode (view chỉ đọc)."""
+        return _readonly_view(self._distance_buffer[: self._history_length])
 
-            all_nodes = depot + customer_nodes + charge_nodes
-            if is_new_env_valid(
-                nodes=all_nodes,
-                max_energy=self.max_energy,
-                drone_speed=self.drone_speed,
-                max_payload=self.max_packages_weight,
-            ):
-                self.depot = depot
-                self.customer_nodes = customer_nodes
-                self.charge_nodes = charge_nodes
-                self.all_nodes = all_nodes
-                return
-
-        raise RuntimeError("Unable to create a valid environment configuration within retry limit.")
+    @property
+    def energy_consumption_histories(self) -> np.ndarray:
+        """Năng lượng của từng cạnh đã đi trong episode (view chỉ đọc)."""
+        return _readonly_view(self._energy_buffer[: self._history_length])
+
+    def _append_history(self, distance: float, energy_consumption: float):
+        """Ghi khoảng cách và năng lượng của cạnh vừa đi.
+
+        Bộ đệm nới rộng gấp đôi khi đầy. Bộ đệm mới được cấp phát thay vì ghi đè, nên
+        các view đã trả về trước đó giữ nguyên.
+        """
+        length = self._history_length
+        if length == self._distance_buffer.shape[0]:
+            self._distance_buffer = np.concatenate(
+                [self._distance_buffer, np.zeros_like(self._distance_buffer)]
+            )
+            self._energy_buffer = np.concatenate(
+                [self._energy_buffer, np.zeros_like(self._energy_buffer)]
+            )
+        self._distance_buffer[length] = distance
+        self._energy_buffer[length] = energy_consumption
+        self._history_length = length + 1
+
+    def get_state(self) -> DroneTspState:
+        """Ảnh chụp trạng thái episode hiện tại, dùng cho tìm kiếm cây/beam search.
+
+        Chỉ sao chép phần thay đổi trong episode (O(N + số bước) byte); dữ liệu tĩnh của
+        instance và bộ sinh số ngẫu nhiên không được sao chép.
+
+        Returns:
+            DroneTspState: Ảnh chụp bất biến, hash được.
+        """
+        if self._nodes is None:
+            raise RuntimeError("Call reset() before get_state().")
+        length = self._history_length
+        return DroneTspState(
+            instance=self._instance_serial,
+            visited_order=self._nodes.visited_order.astype(np.int32).tobytes(),
+            prev_position=int(self.prev_position),
+            remain_packages_weight=self.remain_packages_weight,
+            total_energy_consumption=self.total_energy_consumption,
+            charge_count=self.charge_count,
+            total_distance=self.total_distance,
+            route=self._route[: self._route_length].astype(np.int32).tobytes(),
+            distance_histories=self._distance_buffer[:length].tobytes(),
+            energy_histories=self._energy_buffer[:length].tobytes(),
+        )
+
+    def set_state(self, state: DroneTspState):
+        """Khôi phục ảnh chụp từ ``get_state`` trên cùng instance.
+
+        Mặt nạ action (và ứng viên) được tính lại; bộ đệm lịch sử và lộ trình được cấp
+        phát mới nên các view đã trả về trước đó giữ nguyên.
+
+        Args:
+            state (DroneTspState): Ảnh chụp cần khôi phục.
+        Raises:
+            ValueError: Nếu ảnh chụp thuộc instance khác.
+        """
+        if self._nodes is None or state.instance != self._instance_serial:
+            raise ValueError("State was captured on a different instance of this env.")
+        self._nodes.restore_visited_order(
+            np.frombuffer(state.visited_order, dtype=np.int32)
+        )
+        if self._spatial_index is not None:
+            self._spatial_index.restore(self._nodes.available)
+        self.prev_position = state.prev_position
+        self.remain_packages_weight = state.remain_packages_weight
+        self.total_energy_consumption = state.total_energy_consumption
+        self.charge_count = state.charge_count
+        self.total_distance = state.total_distance
+
+        route = np.frombuffer(state.route, dtype=np.int32)
+        self._route = np.zeros(
+            max(self._history_capacity + 1, route.size), dtype=np.int64
+        )
+        self._route[: route.size] = route
+        self._route_length = route.size
+        distances = np.frombuffer(state.distance_histories, dtype=np.float64)
+        capacity = max(self._history_capacity, distances.size)
+        self._distance_buffer = np.zeros(capacity, dtype=np.float64)
+        self._energy_buffer = np.zeros(capacity, dtype=np.float64)
+        self._distance_buffer[: distances.size] = distances
+        self._energy_buffer[: distances.size] = np.frombuffer(
+            state.energy_histories, dtype=np.float64
+        )
+        self._history_length = distances.size
+        self._update_action_mask()
+
+    def _append_route(self, action: int):
+        """Ghi thêm một node vào lộ trình, nới rộng bộ đệm gấp đôi khi đầy."""
+        if self._route_length == self._route.shape[0]:
+            self._route = np.concatenate([self._route, np.zeros_like(self._route)])
+        self._route[self._route_length] = action
+        self._route_length += 1
+
+    def _graph_edge_obs(self) -> dict:
+        """Đặc trưng cạnh tĩnh theo ``graph_edges``, tính một lần cho mỗi instance.
+
+        ``edge_energy`` là năng lượng khi bay rỗng (0 kg); năng lượng thực tế tăng theo
+        ``payload_factor`` của khối lượng đang mang.
+        """
+        if self._edge_obs is None:
+            if self.graph_edges == "knn":
+                index = nearest_neighbours(self._distance_matrix, self.graph_neighbours)
+                rows = np.arange(index.shape[0])[:, None]
+                edges = {
+                    "edge_index": index,
+                    "edge_distance": self._distance_matrix[rows, index],
+                    "edge_energy": self._energy_table.from_node(rows, index, 0.0),
+                }
+            else:
+                edges = {
+                    "edge_distance": self._distance_matrix,
+                    "edge_energy": self._energy_table.matrix(0.0),
+                }
+            self._edge_obs = {}
+            for key, value in edges.items():
+                value = np.array(value, dtype=self.observation_space[key].dtype)
+                value.setflags(write=False)
+                self._edge_obs[key] = value
+        return self._edge_obs
 
     def _get_obs(self):
         """Định nghĩa observation của môi trường
@@ -188,54 +688,160 @@ class DroneTspEnv(gym.Env):
         Returns:
             obs: Observation
         """
-        nodes_array = np.array(
-            [NodeTransformer.encode(node) for node in self.all_nodes], dtype=np.float32
+        self._total_distance_buffer[0] = self.total_distance
+        self._energy_consumption_buffer[0] = self.total_energy_consumption
+        self._charge_count_buffer[0] = self.charge_count
+        if self.observation_mode == "compact":
+            obs = dict(self._nodes.compact_table())
+        else:
+            obs = {"nodes": self._nodes.table}
+        if self.action_mode == "candidates":
+            obs["candidates"] = self._candidates
+        obs.update(
+            {
+                "total_distance": self._total_distance_buffer,
+                "energy_consumption": self._energy_consumption_buffer,
+                "charge_count": self._charge_count_buffer,
+                "action_mask": self._action_mask.view(np.int8),
+            }
         )
-        return {
-            "nodes": nodes_array,
-            "total_distance": np.array([self.total_distance], dtype=np.float32),
-            "energy_consumption": np.array(
-                [self.total_energy_consumption], dtype=np.float32
-            ),
-            "charge_count": np.array([self.charge_count], dtype=np.int16),
-        }
+        if self.observation_copy == "copy":
+            obs = {key: value.copy() for key, value in obs.items()}
+        else:
+            obs = {key: _readonly_view(value) for key, value in obs.items()}
+        if self.graph_edges is not None:
+            # Cạnh tĩnh chỉ đọc, dùng chung cho mọi bước của instance nên không sao chép
+            obs.update(self._graph_edge_obs())
+        return obs
 
     def _get_info(self):
         """Cung cấp thông tin bổ sung của môi trường
 
+        Chỉ gồm các khoá trong ``info_keys``, mỗi khoá được tính khi tạo ``info``.
+
         Returns:
             infor: Thông tin bổ sung của môi trường
         """
-        return {
-            "drone_speed": self.drone_speed,
-            "customers": self.customer_nodes,
-            "distance_histories": self.distance_histories,
-            "energy_consumption_histories": self.energy_consumption_histories,
-            "charge_count": self.charge_count,
-            "remain_packages_weight": self.remain_packages_weight,
-            "max_energy": self.max_energy,
-        }
+        return {key: getter(self) for key, getter in self._info_getters}
+
+    def _update_action_mask(self):
+        """Cập nhật mặt nạ action hợp lệ cho trạng thái hiện tại.
+
+        Một action bị loại nếu là khách hàng đã ghé thăm, khách hàng có
+        ``package_weight`` lớn hơn ``remain_packages_weight``, hoặc làm năng lượng
+        tiêu thụ chạm ``max_energy``. Depot luôn hợp lệ vì năng lượng được đặt lại khi
+        quay về. Với ``action_mode="candidates"`` chỉ các ứng viên tìm qua chỉ mục
+        lưới được kiểm tra (xem ``_update_candidates``). Với ``reachability_mask``,
+        năng lượng còn phải đủ cho chặng về depot với khối lượng còn lại sau khi giao,
+        và depot có thể bị che theo ``_depot_within_charge_limit``; cả hai chỉ loại
+        các nước đi chắc chắn không về được.
+        """
+        if self.action_mode == "candidates":
+            self._update_candidates()
+            return
+        nodes = self._nodes
+        mask = self._action_mask
+        np.less_equal(nodes.package_weights, self.remain_packages_weight, out=mask)
+        mask &= nodes.available
+        if self.max_energy != -1:
+            # Năng lượng cạnh được tính với khối lượng còn lại sau khi giao hàng.
+            payloads = np.maximum(
+                self.remain_packages_weight - nodes.package_weights, 0.0
+            )
+            energies = self._energy_table.from_node(
+                self.prev_position, slice(None), payloads
+            )
+            if self.reachability_mask:
+                # Ma trận đối xứng nên hàng 0 là chặng về depot từ mọi node
+                energies = energies + self._energy_table.from_node(
+                    0, slice(None), payloads
+                )
+            mask &= self.total_energy_consumption + energies < self.max_energy
+        mask[0] = True
+        if self.reachability_mask and not self._depot_within_charge_limit():
+            # Không còn khách nào đi được thì vẫn cho về depot để tránh mặt nạ rỗng
+            mask[0] = not (mask & self._is_customer).any()
+
+    def _depot_within_charge_limit(self) -> bool:
+        """Về depot lúc này có còn xong được trong ``max_charge_times`` lần sạc.
+
+        Sau khi về, cần ít nhất ``ceil(unvisited_weight / sức chứa)`` chuyến nữa và mỗi
+        chuyến kết thúc bằng một lần về depot (một lần sạc); đây là cận dưới nên chỉ che
+        depot khi chắc chắn vượt giới hạn.
+        """
+        nodes = self._nodes
+        if self.max_charge_times == -1 or nodes.unvisited_customers == 0:
+            return True
+        # Trừ sai số cộng dồn của unvisited_weight trước khi làm tròn lên
+        trips = math.ceil(nodes.unvisited_weight / self.max_packages_weight - 1e-9)
+        return self.charge_count + 1 + trips <= self.max_charge_times
+
+    def _update_candidates(self):
+        """Lấy ``num_candidates`` khách chưa ghé, hợp lệ gần ``prev_position`` nhất.
+
+        Cùng điều kiện hợp lệ với ``_update_action_mask`` nhưng chỉ tính cho các node
+        trong các ô lưới được duyệt; ô thừa được điền -1 và bị che trong
+        ``action_mask``.
+        """
+        nodes = self._nodes
+
+        def feasible(candidates: np.ndarray) -> np.ndarray:
+            weights = nodes.package_weights[candidates]
+            accepted = weights <= self.remain_packages_weight
+            if self.max_energy != -1 and accepted.any():
+                # Chỉ tính năng lượng cho các node đủ sức chứa
+                kept = np.flatnonzero(accepted)
+                payloads = self.remain_packages_weight - weights[kept]
+                energies = self._energy_table.from_node(
+                    self.prev_position, candidates[kept], payloads
+                )
+                if self.reachability_mask:
+                    energies = energies + self._energy_table.from_node(
+                        0, candidates[kept], payloads
+                    )
+                accepted[kept] = (
+                    self.total_energy_consumption + energies < self.max_energy
+                )
+            return accepted
+
+        found = self._spatial_index.nearest(
+            self.prev_position, self.num_candidates, feasible
+        )
+        self._candidates.fill(-1)
+        self._candidates[: found.size] = found
+        np.greater_equal(self._candidates, 0, out=self._action_mask[1:])
+        self._action_mask[0] = (
+            not self.reachability_mask
+            or found.size == 0
+            or self._depot_within_charge_limit()
+        )
+
+    def action_masks(self) -> np.ndarray:
+        """Mặt nạ action hợp lệ dạng bool (N,), theo quy ước của MaskablePPO."""
+        return self._action_mask.copy()
 
     def _sample(self) -> int:
         """
-        Trả về index ngẫu nhiên của một node chưa được ghé thăm.
-        Dùng để thay thế cho action_space.sample().
+        Trả về index ngẫu nhiên của một khách hàng hợp lệ theo ``action_mask``. Dùng để
+        thay thế cho action_space.sample(), lấy ngẫu nhiên từ ``self.np_random``. Với
+        ``action_mode="candidates"`` trả về một ô ứng viên hợp lệ.
         """
-        unvisited_indices = [
-            idx
-            for idx, node in enumerate(self.all_nodes)
-            if node.visited_order == 0 and node.node_type != NODE_TYPES.charging_station
-        ]
-        if not unvisited_indices:
+        if self.action_mode == "candidates":
+            slots = np.flatnonzero(self._action_mask[1:])
+            return int(self.np_random.choice(slots)) + 1 if slots.size else 0
+        candidates = np.flatnonzero(self._action_mask & self._is_customer)
+        if candidates.size == 0:
             return 0  # Không còn node nào để đi thì trả về vị trí đầu tiên là depot
-        return np.random.choice(unvisited_indices)
+        return int(self.np_random.choice(candidates))
 
     def reset(self, seed=None, options=None):
         """Reset môi trường
 
         Args:
             seed (_type_, optional): _description_. Defaults to None.
-            options (_type_, optional): _description_. Defaults to None.
+            options (_type_, optional): ``new_coordinates`` (bool) giữ instance cũ khi
+                False; ``instance_id`` (int) hoặc ``instance_range`` (start, stop) nạp
+                instance từ ``instance_bank``. Defaults to None.
 
         Returns:
             obs: Observation của môi trường
@@ -243,6 +849,7 @@ class DroneTspEnv(gym.Env):
         """
         # We need the following line to seed self.np_random
         super().reset(seed=seed)
+        self.__reseed_prefetcher(seed is not None)
 
         if options is None:
             options = {}
@@ -253,20 +860,26 @@ class DroneTspEnv(gym.Env):
         self.prev_position = 0
         self.remain_packages_weight = self.max_packages_weight
         self.charge_count = 0
-        self.distance_histories = []
-        self.energy_consumption_histories = []
-        if new_coordinates == True:
+        # Bộ đệm lịch sử và lộ trình mới cho episode mới: view của episode trước (đã nằm
+        # trong info hoặc lấy qua ``route``) không bị ghi đè
+        self._distance_buffer = np.zeros(self._history_capacity, dtype=np.float64)
+        self._energy_buffer = np.zeros(self._history_capacity, dtype=np.float64)
+        self._history_length = 0
+        self._route = np.zeros(self._history_capacity + 1, dtype=np.int64)
+        self._route_length = 1
+        instance_id = self.__select_instance_id(options, new_coordinates)
+        if instance_id is not None:
+            self.__init_nodes(self.instance_bank[instance_id])
+            self.instance_id = instance_id % len(self.instance_bank)
+        elif new_coordinates:
             self.__init_nodes()
+            self.instance_id = -1
         else:
-            for node in self.all_nodes:
-                if node.node_type == NODE_TYPES.depot:
-                    node.visited_order = 1
-                elif (
-                    node.node_type == NODE_TYPES.customer
-                    or node.node_type == NODE_TYPES.charging_station
-                ):
-                    node.visited_order = 0
+            self._nodes.reset_visited_order()
+            if self._spatial_index is not None:
+                self._spatial_index.reset()
 
+        self._update_action_mask()
         observation = self._get_obs()
         info = self._get_info()
 
@@ -275,54 +888,75 @@ class DroneTspEnv(gym.Env):
 
         return observation, info
 
+    def _candidate_node(self, action) -> int:
+        """Index node của ô ứng viên ``action`` (0 là depot, -1 nếu ô trống)."""
+        action = int(action)
+        if action == 0:
+            return 0
+        return int(self._candidates[action - 1])
+
     def step(self, action):
         """
         Thực hiện một bước trong môi trường với hành động được cung cấp.
 
         Args:
-            action (int): Chỉ số của node sẽ được ghé thăm tiếp theo trong danh sách all_nodes. Có thể là node khách hàng, trạm sạc hoặc depot (chỉ số 0).
+            action (int): Chỉ số của node sẽ được ghé thăm tiếp theo trong danh sách
+                all_nodes. Có thể là node khách hàng, trạm sạc hoặc depot (chỉ số 0).
+                Với ``action_mode="candidates"`` là ô ứng viên (0 là depot, ``i`` là
+                ``obs["candidates"][i - 1]``). Chọn ô trống (``obs["candidates"][i - 1]
+                == -1``) không làm gì: trạng thái giữ nguyên, trả về quãng đường 0,
+                không terminated/truncated.
 
         Returns:
-            observation (dict): Quan sát hiện tại của môi trường sau khi thực hiện hành động.
-            reward (tuple hoặc None): Bộ giá trị thưởng (tổng quãng đường, tổng năng lượng tiêu thụ, số lần sạc, tổng thời gian trễ) nếu kết thúc episode, ngược lại là None.
-            terminated (bool): True nếu episode kết thúc do quay về depot, ngược lại là False.
-            truncated (bool): True nếu episode kết thúc do vượt quá giới hạn năng lượng, ngược lại là False.
+            observation (dict): Quan sát hiện tại của môi trường
+                sau khi thực hiện hành động.
+            reward (tuple hoặc None): Bộ giá trị thưởng (tổng quãng đường, tổng năng
+                lượng tiêu thụ, số lần sạc, tổng thời gian trễ) nếu kết thúc
+                episode, ngược lại là None.
+            terminated (bool): True nếu episode kết thúc do quay về
+                depot, ngược lại là False.
+            truncated (bool): True nếu episode kết thúc do vượt quá giới hạn năng
+                lượng, ngược lại là False.
             info (dict): Thông tin bổ sung về trạng thái môi trường.
         """
         terminated, truncated = False, False
-        # Action là index của node trong danh sách tất cả node bao gồm khách hàng và trạm sạc.
-        prev_node = self.all_nodes[self.prev_position]
-        selected_node = self.all_nodes[action]
-        # Chỉ cập nhật khi action lớn hơn 0, action bằng 0 là node cuối cùng quay về vị trí
-        # xuất phát, không phải đi đến node mới. Không giới hạn số lần đến trạm sạc.
-        distance = geodesic(
-            (prev_node.lat, prev_node.lon), (selected_node.lat, selected_node.lon)
-        ).meters
-        self.distance_histories.append(distance)
-        if action > 0 and selected_node.node_type != NODE_TYPES.charging_station:
-            self.remain_packages_weight -= selected_node.package_weight
+        if self.action_mode == "candidates":
+            action = self._candidate_node(action)
+            if action < 0:
+                # Ô trống bị mask: bỏ qua thay vì báo lỗi, giữ nguyên trạng thái
+                return self._get_obs(), 0.0, False, False, self._get_info()
+        # Action là index của node trong danh sách tất cả node bao gồm khách hàng
+        # và trạm sạc. Chỉ cập nhật khi action lớn hơn 0, action bằng 0 là node
+        # cuối cùng quay về vị trí xuất phát, không phải đi đến node mới. Không
+        # giới hạn số lần đến trạm sạc.
+        distance = float(self._distance_matrix[self.prev_position, action])
+        nodes = self._nodes
+        if action > 0 and nodes.node_types[action] != NODE_TYPES.charging_station.value:
+            self.remain_packages_weight -= float(nodes.package_weights[action])
             if self.remain_packages_weight < 0:
                 # Không để khối lượng còn lại âm để tránh lỗi tính năng lượng
                 truncated = True
-            order = len([node for node in self.all_nodes if node.visited_order > 0])
-            selected_node.visited_order = (
-                order + 1
+            order = nodes.visited_count
+            nodes.set_visited_order(
+                action, order + 1
             )  # Những node đã đi qua cộng với vị trí đang xét.
+            if self._spatial_index is not None:
+                self._spatial_index.remove(action)
         self.total_distance += distance
-        energy_consumption = calc_energy_consumption(
-            gij=self.remain_packages_weight,
-            distanceij=distance,
-            speedij=self.drone_speed,
+        energy_consumption = self._energy_table.edge(
+            self.prev_position, action, self.remain_packages_weight
         )
-        self.energy_consumption_histories.append(energy_consumption)
+        self._append_history(distance, energy_consumption)
         self.total_energy_consumption += energy_consumption
 
         # Nếu node này là trạm sạc thì reset mức năng lượng đã tiêu thụ
         # if selected_node.node_type == NODE_TYPES.charging_station:
-        #     self.charge_count += 1  # Lưu lại số lần sạc để biết agent có lạm dụng việc sạc hay không.
+        #     # Lưu lại số lần sạc để biết agent có lạm dụng việc sạc hay không.
+        #     self.charge_count += 1
         #     self.total_energy_consumption = 0
 
-        # Luôn bắt đầu từ 0, TSP phải quay về điểm bắt đầu thì mới được xem là hoàn thành.
+        # Luôn bắt đầu từ 0, TSP phải quay về điểm bắt đầu thì mới
+        # được xem là hoàn thành.
         if action == 0:
             self.charge_count += 1
             # Reset năng lượng đã tiêu thụ
@@ -330,25 +964,23 @@ class DroneTspEnv(gym.Env):
             # Quay về depot để lấy thêm hàng: nạp lại sức chứa
             self.remain_packages_weight = self.max_packages_weight
 
-        # Hết năng lượng được xem là truncated. Khi năng lượng tiêu thụ vượt quá mức năng lượng tối đa
-        # thì được xem là hết năng lượng.
+        # Hết năng lượng được xem là truncated. Khi năng lượng tiêu thụ vượt quá mức
+        # năng lượng tối đa thì được xem là hết năng lượng.
         if self.max_energy != -1 and self.total_energy_consumption >= self.max_energy:
             truncated = True
         if self.max_charge_times != -1 and self.charge_count > self.max_charge_times:
             truncated = True
 
-        if action == 0 and all(
-            node.visited_order > 0
-            for node in self.all_nodes
-            if node.node_type != NODE_TYPES.charging_station
-        ):
+        if action == 0 and nodes.unvisited_customers == 0:
             terminated = True
 
-        observation = self._get_obs()
-        info = self._get_info()
-
         # Đánh dấu là node trước đó sau khi hoàn thành xử lý
         self.prev_position = action
+        self._append_route(action)
+        self._update_action_mask()
+
+        observation = self._get_obs()
+        info = self._get_info()
 
         if self.render_mode == "human":
             self._render_frame()
@@ -359,8 +991,9 @@ class DroneTspEnv(gym.Env):
         """
         Hiển thị môi trường theo chế độ render_mode đã chọn.
 
-        Nếu render_mode là 'rgb_array', trả về frame đã render dưới dạng mảng.
-        Nếu render_mode là 'human', hiển thị trực quan môi trường (xử lý trong _render_frame).
+        Nếu render_mode là 'rgb_array', trả về frame (H, W, 3) uint8 do
+        ``Rasterizer`` vẽ. Nếu render_mode là 'human', hiển thị trực quan môi trường
+        (xử lý trong _render_frame).
         """
         if self.render_mode == "rgb_array":
             return self._render_frame()
@@ -369,28 +1002,31 @@ class DroneTspEnv(gym.Env):
         """
         Phương thức nội bộ để hiển thị trạng thái hiện tại của môi trường.
 
-        Sinh bản đồ HTML trực quan hóa đường đi và các node đã ghé thăm bằng folium,
-        và lưu vào 'render/index.html'.
+        Sinh bản đồ HTML trực quan hóa đường đi và các node đã ghé thăm bằng folium, và
+        lưu vào 'render/index.html'. Đường đi là lộ trình thực tế của drone, gồm cả các
+        lần quay về depot. Việc ghi file chạy ở thread nền: chỉ trạng thái mới nhất được
+        ghi, tối đa ``metadata["render_fps"]`` lần mỗi giây.
+
+        Với ``rgb_array``, vẽ frame bằng ``self.rasterizer`` (NumPy,
+        không cần mạng) và trả về.
         """
-        # Tạo danh sách các node đã được ghé thăm theo thứ tự
-        visited_nodes = sorted(
-            [(idx, n) for idx, n in enumerate(self.all_nodes) if n.visited_order > 0],
-            key=lambda x: x[1].visited_order,
-        )
-        path_indices = [idx for idx, _ in visited_nodes]
-        if (
-            self.prev_position == 0
-        ):  # Khi hàm step chạy xong thì prev_position cũng chính là action.
-            path_indices.append(
-                0
-            )  # Nếu như action bằng 0 thì thêm 0 vào cuối để quay về.
-
-        # Xuất bản đồ dạng HTML
-        export_to_folium(
-            nodes=self.all_nodes,
-            path_indices=path_indices,
-            file_path="render/index.html",
-        )
+        if self.render_mode == "rgb_array":
+            if self.rasterizer is None:
+                self.rasterizer = Rasterizer()
+            nodes = self._nodes
+            return self.rasterizer.render(
+                nodes.coords, nodes.node_types, self.route, nodes.visited_order > 0
+            )
+        if self._renderer is None:
+            self._renderer = FoliumRenderer(
+                file_path="render/index.html", render_fps=self.metadata["render_fps"]
+            )
+        self._renderer.submit(self._nodes, self.route)
 
     def close(self):
-        pass
+        if self._renderer is not None:
+            self._renderer.close()
+            self._renderer = None
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
@@ -0,0 +1,346 @@
+import gymnasium as gym
+from gymnasium.utils import seeding
+from gymnasium.vector.utils import batch_space
+import numpy as np
+from gymnasium_env.envs.drone_tsp import DroneTspEnv
+from gymnasium_env.envs.energy import DEFAULT_ENERGY_MODEL, EnergyModel
+from gymnasium_env.envs.instance_generator import generate_instance, node_type_layout
+from gymnasium_env.envs.interfaces import NODE_TYPES
+from gymnasium_env.envs.rasterizer import Rasterizer
+
+try:
+    from gymnasium.vector import AutoresetMode
+
+    _NEXT_STEP = AutoresetMode.NEXT_STEP
+except ImportError:  # gymnasium < 1.1
+    _NEXT_STEP = "NextStep"
+
+
+class DroneTspVecEnv(gym.vector.VectorEnv):
+    """Phiên bản vector hoá của ``DroneTspEnv``.
+
+    B instance được lưu trong các mảng batch và được cập nhật cùng lúc bằng phép toán
+    NumPy trong mỗi lần ``step``.
+
+    Quy tắc chuyển trạng thái, phần thưởng, ``terminated``/``truncated`` giống hệt
+    ``DroneTspEnv.step``. Instance kết thúc được tự động reset ở lần ``step`` kế tiếp
+    (chế độ autoreset ``NextStep`` mặc định của Gymnasium).
+    """
+
+    metadata = {
+        "render_modes": ["rgb_array"],
+        "render_fps": 4,
+        "autoreset_mode": _NEXT_STEP,
+    }
+
+    def __init__(
+        self,
+        num_envs: int = 1,
+        render_mode=None,
+        num_customer_nodes: int = 5,
+        num_charge_nodes: int = 1,
+        package_weights: float = 40,
+        min_package_weight: float = 1,
+        max_package_weight: float = 5,
+        max_energy: float = -1.0,
+        max_charge_times: int = -1,
+        max_episode_steps: int = None,
+        energy_model: EnergyModel = None,
+    ):
+        """Constructor của class
+
+        Args:
+            num_envs (int, optional): Số instance chạy song song (B). Defaults to 1.
+            render_mode (str, optional): ``None`` hoặc ``"rgb_array"`` (``render`` trả
+                về ảnh (B, H, W, 3) uint8 cho cả batch). Defaults to None.
+            max_episode_steps (int, optional): Giới hạn số bước mỗi episode, vượt quá
+                thì ``truncated``. Defaults to None.
+            energy_model (EnergyModel, optional): Mô hình năng lượng. Defaults to
+                ``DEFAULT_ENERGY_MODEL``.
+
+            Các tham số còn lại giống ``DroneTspEnv``.
+        """
+        assert render_mode is None or render_mode in self.metadata["render_modes"]
+        self.render_mode = render_mode
+        self.num_envs = num_envs
+        self.num_customer_nodes = num_customer_nodes
+        self.num_charge_nodes = num_charge_nodes
+        self.min_package_weight_per_node = min_package_weight
+        self.max_package_weight_per_node = max_package_weight
+        self.max_energy = max_energy
+        self.max_charge_times = max_charge_times
+        self.max_packages_weight = package_weights
+        self.max_episode_steps = max_episode_steps
+        self.drone_speed = 15  # m/s, giống DroneTspEnv
+        self.energy_model = energy_model or DEFAULT_ENERGY_MODEL
+
+        # Dùng lại định nghĩa space của env đơn để đảm bảo tương thích.
+        single_env = DroneTspEnv(
+            num_customer_nodes=num_customer_nodes,
+            num_charge_nodes=num_charge_nodes,
+            package_weights=package_weights,
+        )
+        self.single_observation_space = single_env.observation_space
+        self.single_action_space = single_env.action_space
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        B = num_envs
+        N = self.total_num_nodes = 1 + num_customer_nodes + num_charge_nodes
+        # Bố cục node cố định cho mọi instance: depot, khách hàng, trạm sạc.
+        self.node_types = node_type_layout(num_customer_nodes, num_charge_nodes)
+        self._is_customer = self.node_types == NODE_TYPES.customer.value
+
+        # Dữ liệu tĩnh của từng instance
+        self.coords = np.zeros((B, N, 2), dtype=np.float64)  # [lon, lat]
+        self.package_weights = np.zeros((B, N), dtype=np.float64)
+        self.distance_matrices = np.zeros((B, N, N), dtype=np.float64)
+        # Trạng thái episode
+        self.visited_order = np.zeros((B, N), dtype=np.int64)
+        self.visited_count = np.zeros(B, dtype=np.int64)
+        self.unvisited_customers = np.zeros(B, dtype=np.int64)
+        self.prev_position = np.zeros(B, dtype=np.int64)
+        self.remain_packages_weight = np.zeros(B, dtype=np.float64)
+        self.total_energy_consumption = np.zeros(B, dtype=np.float64)
+        self.total_distance = np.zeros(B, dtype=np.float64)
+        self.charge_count = np.zeros(B, dtype=np.int64)
+        self.episode_steps = np.zeros(B, dtype=np.int64)
+        # Bộ đệm observation [lon, lat, node_type, package_weight, visited_order]
+        self._nodes_buffer = np.zeros((B, N, 5), dtype=np.float32)
+        self._nodes_buffer[:, :, 2] = self.node_types
+        # Khách hàng chưa ghé (cùng depot, trạm sạc) và mặt nạ action hợp lệ
+        self._available = np.ones((B, N), dtype=bool)
+        self._action_mask = np.ones((B, N), dtype=bool)
+
+        # Lộ trình của từng instance (chỉ ghi thêm), dùng để render
+        self._routes = np.zeros((B, 2 * N), dtype=np.int64)
+        self._route_lengths = np.ones(B, dtype=np.int64)
+        self.rasterizer = None
+
+        self._autoreset = np.zeros(B, dtype=bool)
+        self._np_randoms = [None] * B
+        self._batch_index = np.arange(B)
+
+    def _generate_instance(self, index: int):
+        """Sinh toạ độ, khối lượng hàng và ma trận khoảng cách cho instance ``index``.
+
+        Dùng chung ``generate_instance`` với ``DroneTspEnv`` nên cùng seed sẽ cho cùng
+        instance với env đơn.
+        """
+        instance = generate_instance(
+            self._np_randoms[index],
+            num_customer_nodes=self.num_customer_nodes,
+            num_charge_nodes=self.num_charge_nodes,
+            min_package_weight=self.min_package_weight_per_node,
+            max_package_weight=self.max_package_weight_per_node,
+            max_energy=self.max_energy,
+            drone_speed=self.drone_speed,
+            max_payload=self.max_packages_weight,
+            energy_model=self.energy_model,
+        )
+        self.coords[index] = instance.coords
+        self.package_weights[index] = instance.package_weights
+        self.distance_matrices[index] = instance.distance_matrix
+        self._nodes_buffer[index, :, :2] = instance.coords
+        self._nodes_buffer[index, :, 3] = instance.package_weights
+
+    def _reset_instances(self, indices: np.ndarray, new_coordinates: bool = True):
+        """Đặt lại trạng thái episode (và sinh instance mới nếu cần) cho các index."""
+        if new_coordinates:
+            for index in indices:
+                self._generate_instance(index)
+        self.visited_order[indices] = 0
+        self.visited_order[indices, 0] = 1
+        self.visited_count[indices] = 1
+        self.unvisited_customers[indices] = self.num_customer_nodes
+        self.prev_position[indices] = 0
+        self.remain_packages_weight[indices] = self.max_packages_weight
+        self.total_energy_consumption[indices] = 0
+        self.total_distance[indices] = 0
+        self.charge_count[indices] = 0
+        self.episode_steps[indices] = 0
+        self._routes[indices, 0] = 0
+        self._route_lengths[indices] = 1
+        self._nodes_buffer[indices, :, 4] = self.visited_order[indices]
+        self._available[indices] = True
+        self._autoreset[indices] = False
+
+    def _append_routes(self, indices: np.ndarray, actions: np.ndarray):
+        """Ghi thêm action vào lộ trình các instance, nới bộ đệm gấp đôi khi đầy."""
+        if indices.size and self._route_lengths[indices].max() == self._routes.shape[1]:
+            self._routes = np.concatenate(
+                [self._routes, np.zeros_like(self._routes)], axis=1
+            )
+        self._routes[indices, self._route_lengths[indices]] = actions
+        self._route_lengths[indices] += 1
+
+    def render(self):
+        """Ảnh (B, H, W, 3) uint8 của cả batch khi ``render_mode="rgb_array"``."""
+        if self.render_mode != "rgb_array":
+            return None
+        if self.rasterizer is None:
+            self.rasterizer = Rasterizer()
+        max_length = self._route_lengths.max()
+        return self.rasterizer.render_batch(
+            self.coords,
+            self.node_types,
+            self._routes[:, :max_length],
+            self._route_lengths,
+            self.visited_order > 0,
+        )
+
+    def _update_action_mask(self):
+        """Mặt nạ action hợp lệ cho cả batch.
+
+        Cùng quy tắc với ``DroneTspEnv._update_action_mask``.
+        """
+        mask = self.package_weights <= self.remain_packages_weight[:, None]
+        mask &= self._available
+        if self.max_energy != -1:
+            payloads = np.maximum(
+                self.remain_packages_weight[:, None] - self.package_weights, 0.0
+            )
+            distances = self.distance_matrices[self._batch_index, self.prev_position]
+            energies = self.energy_model.consumption(
+                payloads, distances, self.drone_speed
+            )
+            mask &= self.total_energy_consumption[:, None] + energies < self.max_energy
+        mask[:, 0] = True
+        self._action_mask = mask
+
+    def action_masks(self) -> np.ndarray:
+        """Mặt nạ action hợp lệ dạng bool (B, N)."""
+        return self._action_mask.copy()
+
+    def _get_obs(self):
+        """Observation dạng batch, cùng cấu trúc với ``DroneTspEnv._get_obs``."""
+        return {
+            "nodes": self._nodes_buffer.copy(),
+            "total_distance": self.total_distance.astype(np.float32)[:, None],
+            "energy_consumption": self.total_energy_consumption.astype(np.float32)[
+                :, None
+            ],
+            "charge_count": self.charge_count.astype(np.int16)[:, None],
+            "action_mask": self._action_mask.astype(np.int8),
+        }
+
+    def _get_info(self):
+        """Thông tin bổ sung theo quy ước info dạng mảng của vector env."""
+        present = np.ones(self.num_envs, dtype=bool)
+        return {
+            "charge_count": self.charge_count.copy(),
+            "_charge_count": present,
+            "remain_packages_weight": self.remain_packages_weight.copy(),
+            "_remain_packages_weight": present.copy(),
+        }
+
+    def reset(self, *, seed=None, options=None):
+        """Reset toàn bộ B instance.
+
+        Args:
+            seed (int | list[int], optional): Nếu là số nguyên, instance ``i`` được seed
+                bằng ``seed + i`` (giống ``SyncVectorEnv``). Defaults to None.
+            options (dict, optional): Hỗ trợ ``new_coordinates`` như ``DroneTspEnv``.
+        """
+        if seed is None:
+            seeds = [None] * self.num_envs
+        elif isinstance(seed, (int, np.integer)):
+            seeds = [int(seed) + i for i in range(self.num_envs)]
+        else:
+            seeds = [None if env_seed is None else int(env_seed) for env_seed in seed]
+            assert len(seeds) == self.num_envs, "Number of seeds must match num_envs."
+
+        for index, env_seed in enumerate(seeds):
+            if env_seed is not None or self._np_randoms[index] is None:
+                self._np_randoms[index], _ = seeding.np_random(env_seed)
+        if seeds[0] is not None:
+            self._np_random, self._np_random_seed = seeding.np_random(seeds[0])
+
+        if options is None:
+            options = {}
+        new_coordinates = bool(options.get("new_coordinates", True))
+        self._reset_instances(self._batch_index, new_coordinates=new_coordinates)
+        self._update_action_mask()
+        return self._get_obs(), self._get_info()
+
+    def step(self, actions):
+        """Thực hiện một bước cho cả B instance.
+
+        Args:
+            actions (np.ndarray): Mảng (B,) index node được chọn cho từng instance.
+
+        Returns:
+            Bộ ``(observations, rewards, terminations, truncations, infos)`` dạng batch.
+            Instance vừa được autoreset trả về reward 0 và bỏ qua action.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        B = self.num_envs
+        rewards = np.zeros(B, dtype=np.float64)
+        terminations = np.zeros(B, dtype=bool)
+        truncations = np.zeros(B, dtype=bool)
+
+        resetting = self._autoreset.copy()
+        if resetting.any():
+            self._reset_instances(np.flatnonzero(resetting))
+            active = ~resetting
+        else:
+            active = np.ones(B, dtype=bool)
+        idx = self._batch_index[active]
+        action = actions[active]
+        prev = self.prev_position[idx]
+
+        distance = self.distance_matrices[idx, prev, action]
+        is_customer = self._is_customer[action]
+        remain = self.remain_packages_weight[idx] - np.where(
+            is_customer, self.package_weights[idx, action], 0.0
+        )
+        truncated = is_customer & (remain < 0)
+
+        # Cập nhật thứ tự ghé thăm cho các node khách hàng
+        cust_idx, cust_action = idx[is_customer], action[is_customer]
+        newly_visited = self.visited_order[cust_idx, cust_action] == 0
+        self.visited_order[cust_idx, cust_action] = self.visited_count[cust_idx] + 1
+        self._nodes_buffer[cust_idx, cust_action, 4] = self.visited_order[
+            cust_idx, cust_action
+        ]
+        self._available[cust_idx, cust_action] = False
+        self.visited_count[cust_idx] += newly_visited
+        self.unvisited_customers[cust_idx] -= newly_visited
+
+        self.total_distance[idx] += distance
+        # Khối lượng âm khiến env đơn báo lỗi; ở đây instance đó đã bị truncated nên
+        # tính năng lượng với khối lượng 0 để các instance khác tiếp tục chạy.
+        energy = self.energy_model.consumption(
+            np.maximum(remain, 0.0), distance, self.drone_speed
+        )
+        total_energy = self.total_energy_consumption[idx] + energy
+        charge_count = self.charge_count[idx]
+
+        to_depot = action == 0
+        charge_count = charge_count + to_depot
+        total_energy[to_depot] = 0
+        remain[to_depot] = self.max_packages_weight
+
+        if self.max_energy != -1:
+            truncated |= total_energy >= self.max_energy
+        if self.max_charge_times != -1:
+            truncated |= charge_count > self.max_charge_times
+        terminated = to_depot & (self.unvisited_customers[idx] == 0)
+
+        self.episode_steps[idx] += 1
+        if self.max_episode_steps is not None:
+            truncated |= self.episode_steps[idx] >= self.max_episode_steps
+
+        self.remain_packages_weight[idx] = remain
+        self.total_energy_consumption[idx] = total_energy
+        self.charge_count[idx] = charge_count
+        self.prev_position[idx] = action
+        self._append_routes(idx, action)
+
+        rewards[idx] = distance
+        terminations[idx] = terminated
+        truncations[idx] = truncated
+        self._autoreset = terminations | truncations
+        self._update_action_mask()
+
+        return self._get_obs(), rewards, terminations, truncations, self._get_info()
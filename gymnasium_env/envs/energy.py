@@ -0,0 +1,162 @@
+"""
+Mô hình năng lượng tiêu thụ của drone, hỗ trợ tính theo mảng NumPy.
+
+Năng lượng của một cạnh được tách thành hai thừa số:
+    ``payload_factor(gij) * ((distanceij / 100) / speedij)``
+Thừa số đầu chỉ phụ thuộc khối lượng mang theo nên có thể lưu đệm theo từng instance,
+thừa số sau chỉ phụ thuộc ma trận khoảng cách của instance.
+"""
+import abc
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+def round_half_even_2(values) -> np.ndarray:
+    """Làm tròn 2 chữ số cho mảng, cho kết quả giống hệt ``round(x, 2)`` của Python.
+
+    ``np.round`` nhân 100 rồi làm tròn nên có thể lệch ở các giá trị sát mốc .5; các
+    phần tử đó được làm tròn lại bằng Python.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100.0
+    rounded = np.array(np.rint(scaled) / 100.0, dtype=np.float64)
+    near_half = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    for idx in map(tuple, np.argwhere(near_half)):
+        rounded[idx] = round(float(values[idx]), 2)
+    return rounded
+
+
+class EnergyModel(abc.ABC):
+    """
+    Lớp cơ sở cho mô hình năng lượng. Lớp con chỉ cần cài đặt ``payload_factor``
+    (dạng mảng) là dùng được cho env, bảng năng lượng và các bộ giải; thiếu thì
+    báo lỗi ngay khi khởi tạo.
+    """
+
+    @abc.abstractmethod
+    def payload_factor(self, gij):
+        """Năng lượng trên mỗi đơn vị ``(distance / 100) / speed`` khi mang ``gij``."""
+
+    def consumption(self, gij, distanceij, speedij: float = 15):
+        """Năng lượng tiêu thụ của cạnh, làm tròn 2 chữ số.
+
+        Nhận scalar (trả về ``float``) hoặc mảng (trả về
+        ``np.ndarray``, broadcast theo NumPy).
+
+        Raises:
+            ValueError: Nếu khối lượng âm.
+        """
+        if np.ndim(gij) == 0 and np.ndim(distanceij) == 0:
+            if gij < 0:
+                raise ValueError("Weight can't be negative.")
+            return round(
+                float(self.payload_factor(gij)) * ((distanceij / 100.0) / speedij), 2
+            )
+
+        gij = np.asarray(gij, dtype=np.float64)
+        if np.any(gij < 0):
+            raise ValueError("Weight can't be negative.")
+        distanceij_energy_consumption = np.asarray(distanceij, dtype=np.float64) / 100.0
+        return round_half_even_2(
+            self.payload_factor(gij) * (distanceij_energy_consumption / speedij)
+        )
+
+
+@dataclass(frozen=True)
+class PointerNetworkEnergyModel(EnergyModel):
+    """
+    Công thức năng lượng trong bài báo Trajectory Optimization for Drone Logistics
+    Delivery via Attention-Based Pointer Network. Giá trị mặc định là DJI FlyCart 30.
+    """
+
+    drone_frame_weight: float = 42.5  # kg
+    battery_weight: float = 22.5  # kg
+    gravity: float = 9.81  # m/s^2
+    wind_fluid_density: float = 1.225  # kg/m^3
+    motor_area: float = 1.375  # m^2
+    motor_number: int = 8
+    _lambda_coef: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        lambda_coef = (self.gravity**3) / (
+            2 * self.wind_fluid_density * self.motor_area * self.motor_number
+        )
+        object.__setattr__(self, "_lambda_coef", lambda_coef)
+
+    def payload_factor(self, gij):
+        total_mass = self.drone_frame_weight + self.battery_weight + gij
+        gij_energy_consumption = (total_mass**1.5) * self._lambda_coef
+        return gij_energy_consumption / 1_000.0
+
+
+DEFAULT_ENERGY_MODEL = PointerNetworkEnergyModel()
+
+
+class EnergyTable:
+    """
+    Bảng năng lượng theo từng instance.
+
+    Tham chiếu (không sao chép) ma trận khoảng cách của instance và đệm
+    ``payload_factor`` theo khối lượng mang theo, để truy vấn năng lượng của một cạnh
+    hoặc cả tập ứng viên trong một phép nhân. Kết quả trùng khớp với
+    ``energy_model.consumption``.
+    """
+
+    # Giới hạn số khối lượng được lưu đệm, tránh bảng phình to qua nhiều episode.
+    MAX_CACHED_PAYLOADS = 4096
+
+    def __init__(
+        self,
+        distance_matrix: np.ndarray,
+        speed: float,
+        energy_model: EnergyModel = None,
+    ):
+        """
+        Args:
+            distance_matrix (np.ndarray): Ma trận khoảng cách (N, N) của instance (mét).
+            speed (float): Vận tốc bay của drone (m/s).
+            energy_model (EnergyModel, optional): Mô hình năng lượng. Defaults to
+                ``DEFAULT_ENERGY_MODEL``.
+        """
+        self.energy_model = energy_model or DEFAULT_ENERGY_MODEL
+        self.speed = speed
+        self.distance_matrix = distance_matrix
+        self._factor_cache = {}
+
+    def payload_factor(self, gij: float) -> float:
+        """``payload_factor`` của khối lượng ``gij``, có lưu đệm."""
+        factor = self._factor_cache.get(gij)
+        if factor is None:
+            if gij < 0:
+                raise ValueError("Weight can't be negative.")
+            factor = float(self.energy_model.payload_factor(gij))
+            if len(self._factor_cache) >= self.MAX_CACHED_PAYLOADS:
+                self._factor_cache.clear()
+            self._factor_cache[gij] = factor
+        return factor
+
+    def edge(self, src: int, dst: int, gij: float) -> float:
+        """Năng lượng của cạnh ``src -> dst`` khi mang ``gij`` kg."""
+        distance = float(self.distance_matrix[src, dst])
+        return round(self.payload_factor(gij) * ((distance / 100.0) / self.speed), 2)
+
+    def from_node(self, src: int, dsts, gij) -> np.ndarray:
+        """Năng lượng từ ``src`` tới mọi node trong ``dsts``.
+
+        ``gij`` có thể là số hoặc mảng cùng shape với ``dsts``.
+        """
+        gij = np.asarray(gij, dtype=np.float64)
+        if np.any(gij < 0):
+            raise ValueError("Weight can't be negative.")
+        distances = np.asarray(self.distance_matrix[src, dsts], dtype=np.float64)
+        return round_half_even_2(
+            self.energy_model.payload_factor(gij) * ((distances / 100.0) / self.speed)
+        )
+
+    def matrix(self, gij: float) -> np.ndarray:
+        """Ma trận năng lượng (N, N) khi mang ``gij`` kg trên mọi cạnh."""
+        distances = np.asarray(self.distance_matrix, dtype=np.float64)
+        return round_half_even_2(
+            self.payload_factor(gij) * ((distances / 100.0) / self.speed)
+        )
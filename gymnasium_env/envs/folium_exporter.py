@@ -1,47 +1,97 @@
 import folium
-from folium import Map, PolyLine, Marker
+from folium import PolyLine, Marker
 from gymnasium_env.envs.interfaces import NODE_TYPES
+import json
 import os
 
+import numpy as np
 
-def export_to_folium(nodes: list, path_indices: list, file_path="render/index.html"):
-    """
-    Xuất bản đồ các node và đường đi của drone ra file HTML sử dụng thư viện folium.
+# Chuỗi giữ chỗ cho toạ độ đường đi trong HTML tĩnh của một instance
+ROUTE_PLACEHOLDER = "__DRONE_TSP_ROUTE__"
+# Toạ độ giả dùng để tìm vị trí polyline trong HTML do folium sinh ra
+_SENTINEL_ROUTE = [[-89.123456, -179.654321], [-89.654321, -179.123456]]
 
-    Args:
-        nodes (list): Danh sách các node (depot, khách hàng, trạm sạc) cần hiển thị trên bản đồ.
-        path_indices (list): Danh sách chỉ số các node theo thứ tự đã đi qua để vẽ đường đi.
-        file_path (str, optional): Đường dẫn file HTML sẽ lưu bản đồ. Mặc định là "render/index.html".
 
-    Raises:
-        ValueError: Nếu không có danh sách node hoặc path.
+def build_map_template(coords, node_types) -> str:
     """
-    # Tạo thư mục cha nếu chưa có
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    Dựng HTML bản đồ gồm các marker của instance, phần toạ độ đường đi được thay bằng
+    ``ROUTE_PLACEHOLDER``. Chỉ cần dựng một lần cho mỗi instance.
 
-    if not nodes or not path_indices:
-        raise ValueError("Phải có danh sách node và path.")
+    Args:
+        coords: Toạ độ ``[lon, lat]`` của các node, shape (N, 2).
+        node_types: Giá trị ``NODE_TYPES`` của các node, shape (N,).
 
+    Returns:
+        str: HTML của bản đồ có chứa ``ROUTE_PLACEHOLDER``.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
     # Lấy trung tâm bản đồ là depot
-    depot = nodes[0]
-    m = folium.Map(location=[depot.lat, depot.lon], zoom_start=14, tiles="OpenStreetMap")
+    m = folium.Map(
+        location=[coords[0, 1], coords[0, 0]], zoom_start=14, tiles="OpenStreetMap"
+    )
 
     # Thêm marker cho từng node
-    for i, node in enumerate(nodes):
+    for i, ((lon, lat), node_type) in enumerate(zip(coords, node_types)):
+        node_type = NODE_TYPES(int(node_type))
         color = (
-            "red" if node.node_type == NODE_TYPES.depot else
-            "blue" if node.node_type == NODE_TYPES.charging_station else
-            "green"
+            "red"
+            if node_type == NODE_TYPES.depot
+            else "blue"
+            if node_type == NODE_TYPES.charging_station
+            else "green"
         )
-        label = f"{i} ({node.node_type.name})"
+        label = f"{i} ({node_type.name})"
         Marker(
-            location=(node.lat, node.lon),
+            location=(float(lat), float(lon)),
             popup=label,
-            icon=folium.Icon(color=color)
+            icon=folium.Icon(color=color),
         ).add_to(m)
 
-    # Thêm polyline cho route đã đi
-    latlon_path = [(nodes[i].lat, nodes[i].lon) for i in path_indices]
-    PolyLine(locations=latlon_path, color="blue", weight=5).add_to(m)
+    PolyLine(locations=_SENTINEL_ROUTE, color="blue", weight=5).add_to(m)
+    html = m.get_root().render()
+    sentinel = json.dumps(_SENTINEL_ROUTE)
+    if sentinel not in html:
+        raise RuntimeError("Unable to locate the route polyline in the folium output.")
+    return html.replace(sentinel, ROUTE_PLACEHOLDER)
+
+
+def render_route_html(template: str, coords, path_indices) -> str:
+    """Điền toạ độ ``[lat, lon]`` của đường đi ``path_indices`` vào HTML tĩnh."""
+    coords = np.asarray(coords, dtype=np.float64)
+    latlon_path = coords[np.asarray(path_indices, dtype=np.int64)][:, ::-1]
+    return template.replace(ROUTE_PLACEHOLDER, json.dumps(latlon_path.tolist()))
+
+
+def write_html_atomic(html: str, file_path: str):
+    """Ghi HTML ra file tạm rồi đổi tên để trình duyệt không đọc phải file ghi dở."""
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, file_path)
+
+
+def export_to_folium(nodes: list, path_indices: list, file_path="render/index.html"):
+    """
+    Xuất bản đồ các node và đường đi của drone ra file HTML sử dụng thư viện folium.
+
+    Args:
+        nodes (list): Danh sách các node (depot, khách hàng, trạm sạc)
+            cần hiển thị trên bản đồ.
+        path_indices (list): Danh sách chỉ số các node theo thứ tự
+            đã đi qua để vẽ đường đi.
+        file_path (str, optional): Đường dẫn file HTML sẽ lưu bản đồ. Mặc
+            định là "render/index.html".
+
+    Raises:
+        ValueError: Nếu không có danh sách node hoặc path.
+    """
+    # Tạo thư mục cha nếu chưa có
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    if not nodes or not path_indices:
+        raise ValueError("Phải có danh sách node và path.")
 
-    m.save(file_path)
+    coords = [(node.lon, node.lat) for node in nodes]
+    template = build_map_template(coords, [node.node_type.value for node in nodes])
+    write_html_atomic(render_route_html(template, coords, path_indices), file_path)
@@ -0,0 +1,123 @@
+"""
+Render ``human`` không chặn cho ``DroneTspEnv``.
+
+``step``/``reset`` chỉ gửi trạng thái mới nhất (kho node và bản sao lộ trình) cho một
+thread nền. Thread này gộp các frame: chỉ frame mới nhất được ghi, các frame trung gian
+bị bỏ qua, và số lần ghi được giới hạn theo ``render_fps``. HTML tĩnh (marker) của mỗi
+instance được dựng một lần, giữa các frame chỉ thay toạ độ đường đi.
+"""
+import threading
+import time
+
+import numpy as np
+
+from gymnasium_env.envs.folium_exporter import (
+    build_map_template,
+    render_route_html,
+    write_html_atomic,
+)
+
+
+class FoliumRenderer:
+    """
+    Thread nền ghi bản đồ folium của trạng thái mới nhất.
+
+    Attributes:
+        frames_submitted (int): Số frame đã gửi.
+        frames_written (int): Số frame đã ghi ra file; phần
+            chênh lệch là số frame bị gộp.
+    """
+
+    def __init__(self, file_path: str = "render/index.html", render_fps: float = None):
+        """
+        Args:
+            file_path (str, optional): File HTML đích. Defaults to "render/index.html".
+            render_fps (float, optional): Số lần ghi tối đa mỗi giây; ``None`` hoặc 0 để
+                không giới hạn. Defaults to None.
+        """
+        self.file_path = file_path
+        self.min_interval = 1.0 / render_fps if render_fps else 0.0
+        self.frames_submitted = 0
+        self.frames_written = 0
+        self._condition = threading.Condition()
+        self._pending = None
+        self._busy = False
+        self._closed = False
+        self._error = None
+        # Instance (kho node) ứng với HTML tĩnh đang lưu đệm
+        self._template_nodes = None
+        self._template = None
+        self._thread = threading.Thread(
+            target=self._run, name="drone-tsp-renderer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, nodes, route: np.ndarray):
+        """Gửi frame mới, thay thế frame chưa kịp ghi (nếu có).
+
+        Args:
+            nodes: ``NodeStorage`` của instance hiện tại; toạ độ và loại node không đổi
+                trong suốt vòng đời của kho.
+            route (np.ndarray): Lộ trình (index node), được sao chép trước khi gửi.
+        """
+        route = np.array(route, dtype=np.int64)
+        with self._condition:
+            if self._error is not None:
+                raise RuntimeError("Background renderer failed.") from self._error
+            self._pending = (nodes, route)
+            self.frames_submitted += 1
+            self._condition.notify_all()
+
+    def _run(self):
+        last_write = -np.inf
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+            # Chờ đủ khoảng cách giữa hai lần ghi; frame mới đến trong
+            # lúc chờ sẽ thay frame cũ.
+            delay = last_write + self.min_interval - time.perf_counter()
+            if delay > 0:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._closed, timeout=delay)
+            with self._condition:
+                nodes, route = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                if nodes is not self._template_nodes:
+                    self._template = build_map_template(nodes.coords, nodes.node_types)
+                    self._template_nodes = nodes
+                write_html_atomic(
+                    render_route_html(self._template, nodes.coords, route),
+                    self.file_path,
+                )
+                last_write = time.perf_counter()
+                with self._condition:
+                    self.frames_written += 1
+            except Exception as error:  # pylint: disable=broad-except
+                with self._condition:
+                    self._error = error
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Chờ frame mới nhất được ghi xong. Trả về ``False`` nếu hết ``timeout``."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: (self._pending is None and not self._busy)
+                or self._error is not None,
+                timeout=timeout,
+            )
+
+    def close(self):
+        """Ghi nốt frame mới nhất rồi dừng thread."""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
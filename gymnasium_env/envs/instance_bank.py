@@ -0,0 +1,291 @@
+"""
+Ngân hàng instance sinh sẵn, lưu trên đĩa dưới dạng file ``.npy`` để memory-map.
+
+Cấu trúc thư mục:
+    meta.json                 Tham số sinh và số lượng instance
+    coords.npy                (M, N, 2) float64, toạ độ ``[lon, lat]``
+    package_weights.npy       (M, N) float64
+    distance_matrices.npy     (M, N, N), tuỳ chọn
+
+Các file được mở bằng ``np.load(mmap_mode="r")`` nên mọi tiến trình đọc cùng một bank
+dùng chung page cache của hệ điều hành, không nhân bản RAM.
+
+Sinh bank từ dòng lệnh:
+    python -m gymnasium_env.envs.instance_bank OUT_DIR --num-instances 1000000 \\
+        --num-customer-nodes 20 --seed 0 --workers 8
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gymnasium_env.envs.instance_generator import (
+    DroneTspInstance,
+    generate_instance,
+    node_type_layout,
+)
+
+BANK_VERSION = 1
+_META_FILE = "meta.json"
+_COORDS_FILE = "coords.npy"
+_WEIGHTS_FILE = "package_weights.npy"
+_DISTANCES_FILE = "distance_matrices.npy"
+
+
+class InstanceBank:
+    """
+    Truy cập chỉ đọc vào một bank instance đã sinh, không sao chép dữ liệu.
+
+    Có thể pickle (chỉ lưu đường dẫn) nên dùng được với ``AsyncVectorEnv``: mỗi tiến
+    trình tự memory-map lại cùng các file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Thư mục bank tạo bởi ``create_instance_bank``.
+        """
+        self.path = os.fspath(path)
+        with open(os.path.join(self.path, _META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != BANK_VERSION:
+            raise ValueError(
+                f"Unsupported instance bank version: {self.meta.get('version')}"
+            )
+        self.num_customer_nodes = int(self.meta["num_customer_nodes"])
+        self.num_charge_nodes = int(self.meta["num_charge_nodes"])
+        self.node_types = node_type_layout(
+            self.num_customer_nodes, self.num_charge_nodes
+        )
+        self.coords = np.load(os.path.join(self.path, _COORDS_FILE), mmap_mode="r")
+        self.package_weights = np.load(
+            os.path.join(self.path, _WEIGHTS_FILE), mmap_mode="r"
+        )
+        distances_path = os.path.join(self.path, _DISTANCES_FILE)
+        self.distance_matrices = (
+            np.load(distances_path, mmap_mode="r")
+            if os.path.exists(distances_path)
+            else None
+        )
+
+    def __len__(self) -> int:
+        return self.coords.shape[0]
+
+    @property
+    def num_nodes(self) -> int:
+        return self.coords.shape[1]
+
+    def __getitem__(self, instance_id: int) -> DroneTspInstance:
+        """Instance thứ ``instance_id``; các mảng là view chỉ đọc trên memmap."""
+        instance_id = int(instance_id)
+        if not -len(self) <= instance_id < len(self):
+            raise IndexError(
+                f"Instance id {instance_id} out of range [0, {len(self)})."
+            )
+        return DroneTspInstance(
+            coords=self.coords[instance_id],
+            node_types=self.node_types,
+            package_weights=self.package_weights[instance_id],
+            distance_matrix=(
+                None
+                if self.distance_matrices is None
+                else self.distance_matrices[instance_id]
+            ),
+        )
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+def _generate_chunk(seed_sequence, count, generator_kwargs, with_distance_matrices):
+    """Sinh ``count`` instance liên tiếp từ một ``SeedSequence`` (chạy trong worker)."""
+    rng = np.random.default_rng(seed_sequence)
+    instances = [
+        generate_instance(
+            rng, compute_distance_matrix=with_distance_matrices, **generator_kwargs
+        )
+        for _ in range(count)
+    ]
+    coords = np.stack([instance.coords for instance in instances])
+    weights = np.stack([instance.package_weights for instance in instances])
+    distances = (
+        np.stack([instance.distance_matrix for instance in instances])
+        if with_distance_matrices
+        else None
+    )
+    return coords, weights, distances
+
+
+def _store_chunk(arrays, start: int, result):
+    """Ghi kết quả của ``_generate_chunk`` vào ``(coords, weights, distances)``."""
+    coords, weights, distances = arrays
+    chunk_coords, chunk_weights, chunk_distances = result
+    stop = start + chunk_coords.shape[0]
+    coords[start:stop] = chunk_coords
+    weights[start:stop] = chunk_weights
+    if distances is not None:
+        distances[start:stop] = chunk_distances
+
+
+def create_instance_bank(
+    path: str,
+    num_instances: int,
+    num_customer_nodes: int = 5,
+    num_charge_nodes: int = 1,
+    package_weights: float = 40,
+    min_package_weight: float = 1,
+    max_package_weight: float = 5,
+    max_energy: float = -1.0,
+    drone_speed: float = 15,
+    seed: int = 0,
+    with_distance_matrices: bool = False,
+    distance_dtype=np.float32,
+    chunk_size: int = 1024,
+    num_workers: int = 1,
+) -> InstanceBank:
+    """Sinh trước ``num_instances`` instance và ghi ra thư mục ``path``.
+
+    Mỗi khối ``chunk_size`` instance có seed riêng sinh từ ``SeedSequence(seed)``, nên
+    kết quả không phụ thuộc số worker. Dữ liệu được ghi thẳng vào file memory-map, không
+    cần giữ toàn bộ bank trong RAM.
+
+    Args:
+        path (str): Thư mục đích (tạo mới nếu chưa có).
+        num_instances (int): Số instance cần sinh.
+        num_customer_nodes, num_charge_nodes, package_weights, min_package_weight,
+            max_package_weight, max_energy: Giống tham số của ``DroneTspEnv``.
+        drone_speed (float, optional): Vận tốc bay dùng khi kiểm tra
+            năng lượng. Defaults to 15.
+        seed (int, optional): Seed gốc của bank. Defaults to 0.
+        with_distance_matrices (bool, optional): Lưu kèm ma trận
+            khoảng cách. Defaults to False.
+        distance_dtype (optional): Kiểu dữ liệu của ma trận khoảng cách. ``float32``
+            tiết kiệm một nửa dung lượng (sai số cỡ mm); ``float64`` giữ nguyên giá
+            trị. Defaults to np.float32.
+        chunk_size (int, optional): Số instance mỗi khối. Defaults to 1024.
+        num_workers (int, optional): Số tiến trình sinh song song. Defaults to 1.
+
+    Returns:
+        InstanceBank: Bank vừa tạo, đã mở ở chế độ chỉ đọc.
+    """
+    os.makedirs(path, exist_ok=True)
+    num_nodes = 1 + num_customer_nodes + num_charge_nodes
+    generator_kwargs = dict(
+        num_customer_nodes=num_customer_nodes,
+        num_charge_nodes=num_charge_nodes,
+        min_package_weight=min_package_weight,
+        max_package_weight=max_package_weight,
+        max_energy=max_energy,
+        drone_speed=drone_speed,
+        max_payload=package_weights,
+    )
+
+    coords = np.lib.format.open_memmap(
+        os.path.join(path, _COORDS_FILE),
+        mode="w+",
+        dtype=np.float64,
+        shape=(num_instances, num_nodes, 2),
+    )
+    weights = np.lib.format.open_memmap(
+        os.path.join(path, _WEIGHTS_FILE),
+        mode="w+",
+        dtype=np.float64,
+        shape=(num_instances, num_nodes),
+    )
+    distances = None
+    if with_distance_matrices:
+        distances = np.lib.format.open_memmap(
+            os.path.join(path, _DISTANCES_FILE),
+            mode="w+",
+            dtype=distance_dtype,
+            shape=(num_instances, num_nodes, num_nodes),
+        )
+    elif os.path.exists(os.path.join(path, _DISTANCES_FILE)):
+        os.remove(os.path.join(path, _DISTANCES_FILE))
+
+    starts = list(range(0, num_instances, chunk_size))
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(starts))
+    counts = [min(chunk_size, num_instances - start) for start in starts]
+    args = [
+        (ss, count, generator_kwargs, with_distance_matrices)
+        for ss, count in zip(seed_sequences, counts)
+    ]
+
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            for start, result in zip(
+                starts, executor.map(_generate_chunk, *zip(*args))
+            ):
+                _store_chunk((coords, weights, distances), start, result)
+    else:
+        for start, arg in zip(starts, args):
+            _store_chunk((coords, weights, distances), start, _generate_chunk(*arg))
+
+    for array in (coords, weights, distances):
+        if array is not None:
+            array.flush()
+    del coords, weights, distances
+
+    meta = dict(
+        version=BANK_VERSION,
+        num_instances=num_instances,
+        seed=seed,
+        chunk_size=chunk_size,
+        package_weights=package_weights,
+        has_distance_matrices=with_distance_matrices,
+        **generator_kwargs,
+    )
+    meta.pop("max_payload")
+    with open(os.path.join(path, _META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return InstanceBank(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Pre-generate a memory-mapped DroneTSP instance bank."
+    )
+    parser.add_argument("path", help="Output directory")
+    parser.add_argument("--num-instances", type=int, required=True)
+    parser.add_argument("--num-customer-nodes", type=int, default=5)
+    parser.add_argument("--num-charge-nodes", type=int, default=1)
+    parser.add_argument("--package-weights", type=float, default=40)
+    parser.add_argument("--min-package-weight", type=float, default=1)
+    parser.add_argument("--max-package-weight", type=float, default=5)
+    parser.add_argument("--max-energy", type=float, default=-1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--distance-matrices", action="store_true", help="Also store distance matrices"
+    )
+    parser.add_argument(
+        "--distance-dtype", choices=["float32", "float64"], default="float32"
+    )
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    bank = create_instance_bank(
+        args.path,
+        num_instances=args.num_instances,
+        num_customer_nodes=args.num_customer_nodes,
+        num_charge_nodes=args.num_charge_nodes,
+        package_weights=args.package_weights,
+        min_package_weight=args.min_package_weight,
+        max_package_weight=args.max_package_weight,
+        max_energy=args.max_energy,
+        seed=args.seed,
+        with_distance_matrices=args.distance_matrices,
+        distance_dtype=np.dtype(args.distance_dtype),
+        chunk_size=args.chunk_size,
+        num_workers=args.workers,
+    )
+    print(f"Wrote {len(bank)} instances ({bank.num_nodes} nodes each) to {bank.path}")
+
+
+if __name__ == "__main__":
+    main()
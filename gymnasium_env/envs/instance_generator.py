@@ -0,0 +1,160 @@
+"""
+Sinh instance (toạ độ node, khối lượng hàng, ma trận khoảng
+cách) cho bài toán Drone TSP.
+
+Toàn bộ số ngẫu nhiên được rút theo mảng và tính khả thi được kiểm tra bằng phép toán
+vector. Node không khả thi về năng lượng được sinh lại riêng lẻ thay vì sinh lại cả
+instance.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+from gymnasium_env.envs.energy import EnergyModel
+from gymnasium_env.envs.interfaces import NODE_TYPES
+from gymnasium_env.envs.utils import (
+    calc_distance_matrix,
+    geodesic_distances,
+    infeasible_nodes_mask,
+)
+
+# Giới hạn vĩ độ và kinh độ cho khu vực TP.HCM
+LAT_BOTTOM, LAT_TOP = 10.75, 10.80
+LON_LEFT, LON_RIGHT = 106.65, 106.72
+
+
+@dataclass
+class DroneTspInstance:
+    """
+    Dữ liệu tĩnh của một instance, index node trùng với action của env:
+    0 là depot, tiếp theo là khách hàng rồi tới trạm sạc.
+
+    Attributes:
+        coords (np.ndarray): Toạ độ ``[lon, lat]`` float64, shape (N, 2).
+        node_types (np.ndarray): Giá trị ``NODE_TYPES`` dạng int8, shape (N,).
+        package_weights (np.ndarray): Khối lượng hàng (kg),
+            bằng 0 với depot và trạm sạc.
+        distance_matrix (np.ndarray, optional): Ma trận khoảng cách (N, N) theo mét.
+        retries (int): Số vòng sinh lại node không khả thi.
+        generation_time (float): Thời gian sinh instance (giây).
+    """
+
+    coords: np.ndarray
+    node_types: np.ndarray
+    package_weights: np.ndarray
+    distance_matrix: Optional[np.ndarray] = None
+    retries: int = 0
+    generation_time: float = field(default=0.0, compare=False)
+
+
+def node_type_layout(num_customer_nodes: int, num_charge_nodes: int) -> np.ndarray:
+    """Bố cục loại node: depot, ``num_customer_nodes`` khách hàng rồi trạm sạc."""
+    node_types = np.full(
+        1 + num_customer_nodes + num_charge_nodes,
+        NODE_TYPES.customer.value,
+        dtype=np.int8,
+    )
+    node_types[0] = NODE_TYPES.depot.value
+    node_types[1 + num_customer_nodes :] = NODE_TYPES.charging_station.value
+    return node_types
+
+
+def _uniform_latlon(np_random: np.random.Generator, size: int) -> np.ndarray:
+    """Rút ``size`` cặp ``[lat, lon]`` trong khung TP.HCM."""
+    return np_random.uniform(
+        (LAT_BOTTOM, LON_LEFT), (LAT_TOP, LON_RIGHT), size=(size, 2)
+    )
+
+
+def generate_instance(
+    np_random: np.random.Generator,
+    num_customer_nodes: int,
+    num_charge_nodes: int,
+    min_package_weight: float,
+    max_package_weight: float,
+    max_energy: float,
+    drone_speed: float,
+    max_payload: float,
+    max_retry: int = 100,
+    compute_distance_matrix: bool = True,
+    energy_model: Optional[EnergyModel] = None,
+) -> DroneTspInstance:
+    """Sinh một instance hợp lệ theo ``is_new_env_valid``.
+
+    Args:
+        np_random (np.random.Generator): Bộ sinh số ngẫu nhiên
+            (thường là ``env.np_random``).
+        num_customer_nodes (int): Số khách hàng.
+        num_charge_nodes (int): Số trạm sạc.
+        min_package_weight (float): Khối lượng đơn tối thiểu (kg).
+        max_package_weight (float): Khối lượng đơn tối đa (kg).
+        max_energy (float): Giới hạn năng lượng; âm nghĩa là không giới hạn.
+        drone_speed (float): Vận tốc bay của drone (m/s).
+        max_payload (float): Sức chứa tối đa của drone (kg).
+        max_retry (int, optional): Số vòng sinh lại tối đa. Defaults to 100.
+        compute_distance_matrix (bool, optional): Tính luôn ma trận
+            khoảng cách. Defaults to True.
+        energy_model (EnergyModel, optional): Mô hình năng lượng dùng để kiểm tra tính
+            khả thi. Defaults to ``DEFAULT_ENERGY_MODEL``.
+
+    Returns:
+        DroneTspInstance: Instance hợp lệ.
+
+    Raises:
+        RuntimeError: Nếu vẫn còn node không khả thi sau ``max_retry`` vòng.
+    """
+    start = time.perf_counter()
+    node_types = node_type_layout(num_customer_nodes, num_charge_nodes)
+    num_nodes = node_types.shape[0]
+
+    # Sinh trọng lượng từng gói hàng cho node khách hàng (độc lập)
+    package_weights = np.zeros(num_nodes, dtype=np.float64)
+    package_weights[1 : 1 + num_customer_nodes] = np_random.uniform(
+        min_package_weight, max_package_weight, size=num_customer_nodes
+    )
+    # Depot, khách hàng, trạm sạc: cùng thứ tự rút số như khi sinh từng node một.
+    latlon = np.empty((num_nodes, 2), dtype=np.float64)
+    latlon[0, 0] = np_random.uniform(LAT_BOTTOM, LAT_TOP)
+    latlon[0, 1] = np_random.uniform(LON_LEFT, LON_RIGHT)
+    latlon[1 : 1 + num_customer_nodes] = _uniform_latlon(np_random, num_customer_nodes)
+    latlon[1 + num_customer_nodes :] = _uniform_latlon(np_random, num_charge_nodes)
+
+    retries = 0
+    if max_energy >= 0:
+        while True:
+            depot_distances = geodesic_distances(
+                latlon[0, 0], latlon[0, 1], latlon[:, 0], latlon[:, 1]
+            )
+            infeasible = np.flatnonzero(
+                infeasible_nodes_mask(
+                    depot_distances,
+                    node_types,
+                    max_energy,
+                    drone_speed,
+                    max_payload,
+                    energy_model,
+                )
+            )
+            if infeasible.size == 0:
+                break
+            if retries >= max_retry:
+                raise RuntimeError(
+                    "Unable to create a valid environment configuration "
+                    "within retry limit."
+                )
+            # Chỉ sinh lại toạ độ các node không khả thi.
+            latlon[infeasible] = _uniform_latlon(np_random, infeasible.size)
+            retries += 1
+
+    coords = np.ascontiguousarray(latlon[:, ::-1])
+    distance_matrix = calc_distance_matrix(coords) if compute_distance_matrix else None
+    return DroneTspInstance(
+        coords=coords,
+        node_types=node_types,
+        package_weights=package_weights,
+        distance_matrix=distance_matrix,
+        retries=retries,
+        generation_time=time.perf_counter() - start,
+    )
@@ -0,0 +1,123 @@
+"""
+Sinh trước instance ở nền để ``reset`` không phải chờ vòng sinh lại node không khả thi.
+
+``InstancePrefetcher`` giữ tối đa ``depth`` instance đang sinh hoặc đã sẵn sàng trong
+một hàng đợi có giới hạn (thread pool hoặc process pool). Instance thứ k luôn được sinh
+từ seed con thứ k của một ``SeedSequence``, và ``get`` trả về theo đúng thứ tự gửi đi,
+nên chuỗi instance chỉ phụ thuộc seed chứ không phụ thuộc số worker hay thời điểm gọi.
+"""
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from gymnasium_env.envs.instance_generator import DroneTspInstance, generate_instance
+
+PREFETCH_EXECUTORS = ("thread", "process")
+
+
+def _generate(
+    seed_sequence: np.random.SeedSequence, generator_kwargs: dict
+) -> DroneTspInstance:
+    """Sinh một instance từ seed riêng (hàm cấp module để pickle được)."""
+    return generate_instance(np.random.default_rng(seed_sequence), **generator_kwargs)
+
+
+class InstancePrefetcher:
+    """
+    Hàng đợi instance sinh trước.
+
+    Attributes:
+        depth (int): Số instance được giữ sẵn (đang sinh hoặc đã xong).
+        hits (int): Số lần ``get`` lấy được instance đã sinh xong, không phải chờ.
+        stalls (int): Số lần ``get`` phải chờ instance đang sinh.
+        stall_time (float): Tổng thời gian chờ của các lần ``stalls`` (giây).
+    """
+
+    def __init__(
+        self,
+        generator_kwargs: dict,
+        seed_sequence: np.random.SeedSequence,
+        depth: int = 4,
+        num_workers: int = 1,
+        executor: str = "thread",
+    ):
+        """
+        Args:
+            generator_kwargs (dict): Tham số truyền cho
+                ``generate_instance`` (trừ ``np_random``).
+            seed_sequence (np.random.SeedSequence): Seed gốc, mỗi
+                instance dùng một seed con.
+            depth (int, optional): Độ sâu hàng đợi. Defaults to 4.
+            num_workers (int, optional): Số worker sinh song song. Defaults to 1.
+            executor (str, optional): ``"thread"`` hoặc
+                ``"process"``. Defaults to "thread".
+        """
+        if depth < 1:
+            raise ValueError("Prefetch depth must be at least 1.")
+        if executor not in PREFETCH_EXECUTORS:
+            raise ValueError(
+                f"Unknown prefetch executor {executor!r}, "
+                f"expected one of {PREFETCH_EXECUTORS}."
+            )
+        self.generator_kwargs = dict(generator_kwargs)
+        self.depth = depth
+        executor_cls = (
+            ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        )
+        self._executor = executor_cls(max_workers=num_workers)
+        self._pending = deque()
+        self.hits = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+        self.reseed(seed_sequence)
+
+    def reseed(self, seed_sequence: np.random.SeedSequence):
+        """Bỏ các instance đang chờ và bắt đầu lại chuỗi từ ``seed_sequence``."""
+        while self._pending:
+            self._pending.popleft().cancel()
+        self._seed_sequence = seed_sequence
+        self._fill()
+
+    def _fill(self):
+        while len(self._pending) < self.depth:
+            child = self._seed_sequence.spawn(1)[0]
+            self._pending.append(
+                self._executor.submit(_generate, child, self.generator_kwargs)
+            )
+
+    def get(self) -> DroneTspInstance:
+        """Lấy instance kế tiếp (chờ nếu chưa sinh xong) rồi gửi thêm một instance."""
+        future = self._pending.popleft()
+        if future.done():
+            self.hits += 1
+            instance = future.result()
+        else:
+            self.stalls += 1
+            start = time.perf_counter()
+            instance = future.result()
+            self.stall_time += time.perf_counter() - start
+        self._fill()
+        return instance
+
+    @property
+    def ready(self) -> int:
+        """Số instance trong hàng đợi đã sinh xong."""
+        return sum(future.done() for future in self._pending)
+
+    def stats(self) -> dict:
+        """Thống kê hàng đợi: độ sâu, số instance sẵn sàng, số lần lấy ngay/phải chờ."""
+        return {
+            "depth": self.depth,
+            "ready": self.ready,
+            "hits": self.hits,
+            "stalls": self.stalls,
+            "stall_time": self.stall_time,
+        }
+
+    def close(self):
+        """Huỷ các instance đang chờ và tắt executor."""
+        while self._pending:
+            self._pending.popleft().cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,171 @@
+"""
+Lưu trữ trạng thái node dạng struct-of-arrays cho môi trường Drone TSP.
+
+Thay vì một danh sách ``Node`` độc lập, mỗi thuộc tính được lưu trong một mảng NumPy có
+kiểu cố định và bảng observation ``(N, 5)`` float32 được cập nhật tại chỗ. ``NodeView``
+giữ nguyên giao diện của ``Node`` để mã cũ vẫn hoạt động.
+"""
+from typing import Iterable, List
+
+import numpy as np
+
+from gymnasium_env.envs.interfaces import NODE_TYPES, Node
+from gymnasium_env.envs.node_transformer import NodeTransformer
+
+
+class NodeStorage:
+    """
+    Kho dữ liệu node dạng cột.
+
+    Attributes:
+        coords (np.ndarray): Toạ độ ``[lon, lat]`` float64, shape (N, 2).
+        node_types (np.ndarray): Giá trị ``NODE_TYPES`` dạng int8, shape (N,).
+        package_weights (np.ndarray): Khối lượng gói hàng float64, shape (N,).
+        visited_order (np.ndarray): Thứ tự ghé thăm int64, shape (N,).
+        visited_count (int): Số node có ``visited_order > 0``, cập nhật tăng dần.
+        unvisited_customers (int): Số khách hàng chưa được ghé thăm.
+        unvisited_weight (float): Tổng khối lượng hàng của các
+            khách hàng chưa được ghé thăm.
+        available (np.ndarray): Mảng bool (N,), ``False`` tại các
+            khách hàng đã được ghé thăm.
+        table (np.ndarray): Bảng observation float32 (N, 5) theo
+            ``NodeTransformer.STRUCT``.
+        compact (dict): Các mảng observation dạng nén (xem
+            ``NodeTransformer.encode_compact``), ``None`` cho tới
+            khi gọi ``compact_table``.
+    """
+
+    LON, LAT, NODE_TYPE, PACKAGE_WEIGHT, VISITED_ORDER = range(
+        len(NodeTransformer.STRUCT)
+    )
+
+    def __init__(self, coords, node_types, package_weights, visited_order=None):
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.node_types = np.asarray(node_types, dtype=np.int8)
+        self.package_weights = np.asarray(package_weights, dtype=np.float64)
+        num_nodes = self.coords.shape[0]
+        if visited_order is None:
+            visited_order = (self.node_types == NODE_TYPES.depot.value).astype(np.int64)
+        self.visited_order = np.array(visited_order, dtype=np.int64)
+        self._is_customer = self.node_types == NODE_TYPES.customer.value
+        self.num_customers = int(np.count_nonzero(self._is_customer))
+        self._recount()
+
+        self.table = np.empty(
+            (num_nodes, NodeTransformer.get_shape()), dtype=np.float32
+        )
+        self.table[:, self.LON] = self.coords[:, 0]
+        self.table[:, self.LAT] = self.coords[:, 1]
+        self.table[:, self.NODE_TYPE] = self.node_types
+        self.table[:, self.PACKAGE_WEIGHT] = self.package_weights
+        self.table[:, self.VISITED_ORDER] = self.visited_order
+        self.compact = None
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[Node]) -> "NodeStorage":
+        """Tạo kho dữ liệu từ danh sách ``Node``."""
+        node_list = list(nodes)
+        return cls(
+            coords=[(node.lon, node.lat) for node in node_list],
+            node_types=[node.node_type.value for node in node_list],
+            package_weights=[node.package_weight for node in node_list],
+            visited_order=[node.visited_order for node in node_list],
+        )
+
+    def __len__(self) -> int:
+        return self.coords.shape[0]
+
+    def _recount(self):
+        """Tính lại các bộ đếm từ ``visited_order`` (O(N), chỉ khi khởi tạo/reset)."""
+        visited = self.visited_order > 0
+        self.visited_count = int(np.count_nonzero(visited))
+        self.available = ~(self._is_customer & visited)
+        self.unvisited_customers = int(
+            np.count_nonzero(self.available & self._is_customer)
+        )
+        self.unvisited_weight = float(
+            self.package_weights[self.available & self._is_customer].sum()
+        )
+
+    def set_visited_order(self, index: int, order: int):
+        """Ghi thứ tự ghé thăm của một node vào cả cột dữ liệu và bảng observation.
+
+        Các bộ đếm ``visited_count``, ``unvisited_customers`` và ``unvisited_weight``
+        được cập nhật trong O(1).
+        """
+        was_visited = self.visited_order[index] > 0
+        is_visited = order > 0
+        if was_visited != is_visited:
+            delta = 1 if is_visited else -1
+            self.visited_count += delta
+            if self._is_customer[index]:
+                self.unvisited_customers -= delta
+                self.unvisited_weight -= delta * float(self.package_weights[index])
+                self.available[index] = not is_visited
+        self.visited_order[index] = order
+        self.table[index, self.VISITED_ORDER] = order
+        if self.compact is not None:
+            self.compact["visited_order"][index] = order
+
+    def reset_visited_order(self):
+        """Đưa thứ tự ghé thăm về đầu episode: depot = 1, các node khác = 0."""
+        self.restore_visited_order(self.node_types == NODE_TYPES.depot.value)
+
+    def restore_visited_order(self, visited_order):
+        """Ghi lại toàn bộ cột thứ tự ghé thăm (O(N)) và tính lại các bộ đếm."""
+        self.visited_order[:] = visited_order
+        self.table[:, self.VISITED_ORDER] = self.visited_order
+        if self.compact is not None:
+            self.compact["visited_order"][:] = self.visited_order
+        self._recount()
+
+    def compact_table(self) -> dict:
+        """Mảng observation nén, tạo ở lần gọi đầu, cập nhật tại chỗ như ``table``."""
+        if self.compact is None:
+            self.compact = NodeTransformer.encode_compact(
+                self.coords, self.node_types, self.package_weights, self.visited_order
+            )
+        return self.compact
+
+    def views(self) -> List["NodeView"]:
+        """Danh sách ``NodeView`` trỏ vào kho dữ liệu, dùng thay danh sách ``Node``."""
+        return [NodeView(self, index) for index in range(len(self))]
+
+
+class NodeView(Node):
+    """
+    ``Node`` đọc/ghi trực tiếp trên ``NodeStorage``.
+
+    Kế thừa ``Node`` nên ``isinstance``, ``NodeTransformer.encode``, so sánh bằng và
+    ``repr`` vẫn hoạt động như với dataclass gốc.
+    """
+
+    __slots__ = ("_storage", "_index")
+
+    def __init__(self, storage: NodeStorage, index: int):
+        self._storage = storage
+        self._index = index
+
+    @property
+    def lon(self) -> float:
+        return float(self._storage.coords[self._index, 0])
+
+    @property
+    def lat(self) -> float:
+        return float(self._storage.coords[self._index, 1])
+
+    @property
+    def node_type(self) -> NODE_TYPES:
+        return NODE_TYPES(int(self._storage.node_types[self._index]))
+
+    @property
+    def package_weight(self) -> float:
+        return float(self._storage.package_weights[self._index])
+
+    @property
+    def visited_order(self) -> int:
+        return int(self._storage.visited_order[self._index])
+
+    @visited_order.setter
+    def visited_order(self, value: int):
+        self._storage.set_visited_order(self._index, value)
@@ -1,16 +1,31 @@
 # file: node_transformer.py (hoặc giữ node_encoder.py nếu bạn không thích rename)
 """
-Cung cấp các hàm chuyển đổi giữa đối tượng Node và mảng numpy để phục vụ cho việc encode/decode trong môi trường Drone TSP.
+Cung cấp các hàm chuyển đổi giữa đối tượng Node và mảng numpy để phục vụ cho việc
+encode/decode trong môi trường Drone TSP.
 """
+from typing import List
+
 import numpy as np
 from gymnasium_env.envs.interfaces import Node, NODE_TYPES
 
+
 class NodeTransformer:
     """
-    Lớp tiện ích để mã hóa (encode) và giải mã (decode) đối tượng Node thành mảng numpy và ngược lại.
-    Dùng cho việc xử lý dữ liệu trong môi trường học tăng cường.
+    Lớp tiện ích để mã hóa (encode) và giải mã (decode) đối tượng Node thành mảng numpy
+    và ngược lại. Dùng cho việc xử lý dữ liệu trong môi trường học tăng cường.
     """
+
     STRUCT = ["lon", "lat", "node_type", "package_weight", "visited_order"]
+    # Dạng nén: toạ độ lệch so với depot, fixed-point int16 với 2**18 đơn vị mỗi độ
+    # (~0.42 m mỗi đơn vị, phạm vi ±0.125° ≈ ±14 km quanh depot)
+    COMPACT_COORD_SCALE = 2.0**18
+    COMPACT_DTYPES = {
+        "coords": np.int16,
+        "node_type": np.uint8,
+        "package_weight": np.float16,
+        "visited_order": np.uint16,
+        "depot": np.float64,
+    }
 
     @staticmethod
     def encode(node: Node) -> np.ndarray:
@@ -26,13 +41,16 @@ class NodeTransformer:
         if not isinstance(node, Node):
             raise TypeError(f"Expected Node, got {type(node)}")
 
-        return np.array([
-            node.lon,
-            node.lat,
-            node.node_type.value,
-            node.package_weight,
-            node.visited_order,
-        ], dtype=np.float32)
+        return np.array(
+            [
+                node.lon,
+                node.lat,
+                node.node_type.value,
+                node.package_weight,
+                node.visited_order,
+            ],
+            dtype=np.float32,
+        )
 
     @staticmethod
     def decode(arr: np.ndarray) -> Node:
@@ -49,7 +67,9 @@ class NodeTransformer:
         if not isinstance(arr, (list, tuple, np.ndarray)):
             raise TypeError("Expected array-like input")
         if len(arr) != len(NodeTransformer.STRUCT):
-            raise ValueError(f"Expected {len(NodeTransformer.STRUCT)} elements, got {len(arr)}")
+            raise ValueError(
+                f"Expected {len(NodeTransformer.STRUCT)} elements, got {len(arr)}"
+            )
 
         return Node(
             lon=float(arr[0]),
@@ -67,3 +87,81 @@ class NodeTransformer:
             int: Số chiều của vector node.
         """
         return len(NodeTransformer.STRUCT)
+
+    @staticmethod
+    def encode_compact(coords, node_types, package_weights, visited_order) -> dict:
+        """
+        Mã hóa các cột node thành dạng nén cho replay buffer lớn.
+
+        Args:
+            coords (np.ndarray): Toạ độ ``[lon, lat]`` (N, 2), node 0 là depot.
+            node_types (np.ndarray): Loại node (N,).
+            package_weights (np.ndarray): Khối lượng (N,).
+            visited_order (np.ndarray): Thứ tự ghé thăm (N,).
+        Returns:
+            dict: ``coords`` int16 (N, 2) lệch so với depot theo
+                ``COMPACT_COORD_SCALE``, ``node_type`` uint8,
+                ``package_weight`` float16, ``visited_order`` uint16 và
+                ``depot`` float64 (2,) toạ độ tuyệt đối của depot.
+        Raises:
+            ValueError: Nếu có node nằm ngoài phạm vi biểu diễn quanh depot.
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        depot = coords[0].copy()
+        fixed = np.rint((coords - depot) * NodeTransformer.COMPACT_COORD_SCALE)
+        limit = np.iinfo(np.int16)
+        if fixed.size and (fixed.min() < limit.min or fixed.max() > limit.max):
+            max_span = limit.max / NodeTransformer.COMPACT_COORD_SCALE
+            raise ValueError(
+                f"Node coordinates span more than {max_span:.3f} "
+                "degrees from the depot; the compact observation cannot represent them."
+            )
+        dtypes = NodeTransformer.COMPACT_DTYPES
+        return {
+            "coords": fixed.astype(dtypes["coords"]),
+            "node_type": np.asarray(node_types).astype(dtypes["node_type"]),
+            "package_weight": np.asarray(package_weights).astype(
+                dtypes["package_weight"]
+            ),
+            "visited_order": np.asarray(visited_order).astype(dtypes["visited_order"]),
+            "depot": depot,
+        }
+
+    @staticmethod
+    def decode_compact_table(observation: dict) -> np.ndarray:
+        """
+        Giải mã observation dạng nén về bảng (N, 5) float64 theo ``STRUCT``.
+
+        Toạ độ sai lệch tối đa nửa đơn vị fixed-point (~0.2 m), khối lượng theo độ chính
+        xác float16; loại node và thứ tự ghé thăm khôi phục chính xác.
+        Args:
+            observation (dict): Observation dạng nén (có thể có thêm các khoá khác).
+        Returns:
+            np.ndarray: Bảng (N, 5) float64.
+        """
+        coords = (
+            np.asarray(observation["coords"], dtype=np.float64)
+            / NodeTransformer.COMPACT_COORD_SCALE
+        )
+        table = np.empty(
+            (coords.shape[0], NodeTransformer.get_shape()), dtype=np.float64
+        )
+        table[:, :2] = coords + np.asarray(observation["depot"], dtype=np.float64)
+        table[:, 2] = observation["node_type"]
+        table[:, 3] = observation["package_weight"]
+        table[:, 4] = observation["visited_order"]
+        return table
+
+    @staticmethod
+    def decode_compact(observation: dict) -> List[Node]:
+        """
+        Giải mã observation dạng nén thành danh sách Node.
+        Args:
+            observation (dict): Observation dạng nén.
+        Returns:
+            List[Node]: Các node theo thứ tự index.
+        """
+        return [
+            NodeTransformer.decode(row)
+            for row in NodeTransformer.decode_compact_table(observation)
+        ]
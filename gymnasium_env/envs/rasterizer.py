@@ -0,0 +1,234 @@
+"""
+Vẽ instance và lộ trình ra ảnh RGB ``(H, W, 3)`` uint8 chỉ bằng NumPy (không cần tile
+bản đồ hay mạng), dùng cho ``render_mode="rgb_array"`` và ghi video đánh giá.
+
+Lớp tĩnh (nền và marker node) của mỗi instance được vẽ một lần và lưu đệm; mỗi frame chỉ
+vẽ thêm các đoạn đường đi, khách hàng đã giao và vị trí hiện tại. Mọi thao tác đều chạy
+trên cả batch nên một lần gọi vẽ được frame cho toàn bộ instance của vector env.
+"""
+import numpy as np
+
+from gymnasium_env.envs.interfaces import NODE_TYPES
+
+
+def _disk_offsets(radius: int) -> np.ndarray:
+    """Các offset ``(dy, dx)`` của một hình tròn đặc bán kính ``radius``."""
+    dy, dx = np.mgrid[-radius : radius + 1, -radius : radius + 1]
+    inside = dy**2 + dx**2 <= radius**2
+    return np.stack([dy[inside], dx[inside]], axis=1)
+
+
+def _square_offsets(radius: int) -> np.ndarray:
+    """Các offset ``(dy, dx)`` của một hình vuông đặc cạnh ``2 * radius + 1``."""
+    dy, dx = np.mgrid[-radius : radius + 1, -radius : radius + 1]
+    return np.stack([dy.ravel(), dx.ravel()], axis=1)
+
+
+class Rasterizer:
+    """
+    Bộ vẽ offscreen cho một hoặc nhiều instance cùng số node.
+
+    Màu sắc: depot đỏ (hình vuông), khách hàng xanh lá, trạm sạc xanh dương, khách hàng
+    đã giao màu xám, vị trí hiện tại màu cam, đường đi màu đen.
+    """
+
+    BACKGROUND = (250, 250, 250)
+    DEPOT_COLOR = (220, 40, 40)
+    CUSTOMER_COLOR = (40, 160, 60)
+    CHARGING_COLOR = (40, 90, 220)
+    VISITED_COLOR = (160, 160, 160)
+    CURRENT_COLOR = (255, 140, 0)
+    ROUTE_COLOR = (30, 30, 30)
+
+    def __init__(
+        self,
+        width: int = 256,
+        height: int = 256,
+        marker_radius: int = 4,
+        line_width: int = 1,
+    ):
+        """
+        Args:
+            width (int, optional): Chiều rộng ảnh (pixel). Defaults to 256.
+            height (int, optional): Chiều cao ảnh (pixel). Defaults to 256.
+            marker_radius (int, optional): Bán kính marker node. Defaults to 4.
+            line_width (int, optional): Độ dày đường đi. Defaults to 1.
+        """
+        self.width = width
+        self.height = height
+        self.marker_radius = marker_radius
+        self.margin = marker_radius + 2
+        self._disk = _disk_offsets(marker_radius)
+        self._square = _square_offsets(marker_radius)
+        self._current = _disk_offsets(max(marker_radius // 2, 1))
+        self._line = (
+            _square_offsets(line_width // 2)
+            if line_width > 1
+            else np.zeros((1, 2), dtype=np.int64)
+        )
+        # Lớp tĩnh đã vẽ cho từng vị trí trong batch
+        self._cached_coords = None
+        self._static = None
+        self._marker_mask = None
+        self._marker_index = None
+        self._marker_colors = None
+        self._pixels = None
+
+    def project(self, coords: np.ndarray) -> np.ndarray:
+        """Chiếu toạ độ ``[lon, lat]`` (B, N, 2) sang pixel ``(y, x)`` int64.
+
+        Giữ tỉ lệ khung hình: khung nhìn được tính theo bounding box của từng instance
+        (kinh độ nhân ``cos(lat)`` để không méo), bắc hướng lên trên.
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        lon, lat = coords[..., 0], coords[..., 1]
+        x = lon * np.cos(np.radians(lat.mean(axis=-1, keepdims=True)))
+        y = lat
+        x_min, y_min = x.min(axis=-1, keepdims=True), y.min(axis=-1, keepdims=True)
+        span_x = np.maximum(x.max(axis=-1, keepdims=True) - x_min, 1e-12)
+        span_y = np.maximum(y.max(axis=-1, keepdims=True) - y_min, 1e-12)
+        usable_w, usable_h = (
+            self.width - 2 * self.margin - 1,
+            self.height - 2 * self.margin - 1,
+        )
+        scale = np.minimum(usable_w / span_x, usable_h / span_y)
+        offset_x = self.margin + (usable_w - span_x * scale) / 2
+        offset_y = self.margin + (usable_h - span_y * scale) / 2
+        px = np.rint(offset_x + (x - x_min) * scale)
+        py = np.rint(self.height - 1 - (offset_y + (y - y_min) * scale))
+        return np.stack([py, px], axis=-1).astype(np.int64)
+
+    def _stamp(
+        self,
+        flat: np.ndarray,
+        batch: np.ndarray,
+        centers: np.ndarray,
+        offsets: np.ndarray,
+        color,
+    ):
+        """Tô ``offsets`` quanh các tâm ``centers`` (M, 2) của frame ``batch`` (M,).
+
+        ``flat`` là ảnh của cả batch đã làm phẳng.
+        """
+        if centers.shape[0] == 0:
+            return
+        ys = np.clip(centers[:, None, 0] + offsets[None, :, 0], 0, self.height - 1)
+        xs = np.clip(centers[:, None, 1] + offsets[None, :, 1], 0, self.width - 1)
+        flat[(batch[:, None] * self.height + ys) * self.width + xs] = color
+
+    def _update_static(self, coords: np.ndarray, node_types: np.ndarray):
+        """Vẽ lại lớp tĩnh cho các instance có toạ độ khác với lần trước."""
+        B = coords.shape[0]
+        if self._cached_coords is None or self._cached_coords.shape != coords.shape:
+            self._cached_coords = np.full(coords.shape, np.nan)
+            self._static = np.empty((B, self.height, self.width, 3), dtype=np.uint8)
+            self._marker_mask = np.zeros((B, self.height, self.width), dtype=bool)
+            self._pixels = np.zeros(coords.shape[:2] + (2,), dtype=np.int64)
+        changed = np.flatnonzero(~(self._cached_coords == coords).all(axis=(1, 2)))
+        if changed.size == 0:
+            return
+        pixels = self.project(coords[changed])
+        self._pixels[changed] = pixels
+        self._cached_coords[changed] = coords[changed]
+
+        static = self._static[changed]
+        static[:] = self.BACKGROUND
+        flat = static.reshape(-1, 3)
+        types = node_types[changed]
+        local = np.arange(changed.size)[:, None].repeat(pixels.shape[1], axis=1)
+        for node_type, offsets, color in (
+            (NODE_TYPES.charging_station.value, self._disk, self.CHARGING_COLOR),
+            (NODE_TYPES.customer.value, self._disk, self.CUSTOMER_COLOR),
+            (NODE_TYPES.depot.value, self._square, self.DEPOT_COLOR),
+        ):
+            selected = types == node_type
+            self._stamp(flat, local[selected], pixels[selected], offsets, color)
+        self._static[changed] = static
+        self._marker_mask[changed] = (
+            static != np.array(self.BACKGROUND, dtype=np.uint8)
+        ).any(axis=-1)
+        # Vị trí và màu các pixel marker trên ảnh phẳng của cả
+        # batch, để vẽ lại sau đường đi
+        self._marker_index = np.flatnonzero(self._marker_mask)
+        self._marker_colors = self._static.reshape(-1, 3)[self._marker_index]
+
+    def _draw_routes(
+        self, flat: np.ndarray, routes: np.ndarray, route_lengths: np.ndarray
+    ):
+        """Vẽ tất cả các đoạn đường đi của cả batch trong một lần."""
+        B, L = routes.shape
+        if L < 2:
+            return
+        valid = np.arange(L - 1)[None, :] < (route_lengths[:, None] - 1)
+        batch, step = np.nonzero(valid)
+        if batch.size == 0:
+            return
+        start = self._pixels[batch, routes[batch, step]]
+        delta = self._pixels[batch, routes[batch, step + 1]] - start
+        counts = np.abs(delta).max(axis=1) + 1
+        segment = np.repeat(np.arange(batch.size), counts)
+        position = np.arange(segment.size) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        t = position / np.maximum(counts - 1, 1)[segment]
+        points = start[segment] + np.rint(t[:, None] * delta[segment]).astype(np.int64)
+        self._stamp(flat, batch[segment], points, self._line, self.ROUTE_COLOR)
+
+    def render_batch(
+        self, coords, node_types, routes, route_lengths, visited=None
+    ) -> np.ndarray:
+        """Vẽ frame cho cả batch.
+
+        Args:
+            coords: Toạ độ ``[lon, lat]`` (B, N, 2).
+            node_types: Loại node (N,) dùng chung hoặc (B, N).
+            routes: Lộ trình (B, L) index node, chỉ
+                ``route_lengths[b]`` phần tử đầu có nghĩa.
+            route_lengths: Độ dài lộ trình (B,).
+            visited (optional): Mảng bool (B, N), khách hàng đã giao được tô màu xám.
+
+        Returns:
+            np.ndarray: Ảnh (B, H, W, 3) uint8.
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        B, N = coords.shape[:2]
+        node_types = np.broadcast_to(np.asarray(node_types), (B, N))
+        routes = np.asarray(routes, dtype=np.int64).reshape(B, -1)
+        route_lengths = np.asarray(route_lengths, dtype=np.int64).reshape(B)
+        self._update_static(coords, node_types)
+
+        frames = self._static.copy()
+        flat = frames.reshape(-1, 3)
+        self._draw_routes(flat, routes, route_lengths)
+        # Marker luôn nằm trên đường đi
+        flat[self._marker_index] = self._marker_colors
+        batch_index = np.arange(B)
+        if visited is not None:
+            done = np.asarray(visited, dtype=bool) & (
+                node_types == NODE_TYPES.customer.value
+            )
+            batch, node = np.nonzero(done)
+            self._stamp(
+                flat, batch, self._pixels[batch, node], self._disk, self.VISITED_COLOR
+            )
+        current = routes[batch_index, np.maximum(route_lengths - 1, 0)]
+        self._stamp(
+            flat,
+            batch_index,
+            self._pixels[batch_index, current],
+            self._current,
+            self.CURRENT_COLOR,
+        )
+        return frames
+
+    def render(self, coords, node_types, route, visited=None) -> np.ndarray:
+        """Vẽ frame (H, W, 3) uint8 cho một instance, xem ``render_batch``."""
+        route = np.asarray(route, dtype=np.int64)
+        frames = self.render_batch(
+            np.asarray(coords)[None],
+            node_types,
+            route[None],
+            np.array([route.shape[0]]),
+            None if visited is None else np.asarray(visited)[None],
+        )
+        return frames[0]
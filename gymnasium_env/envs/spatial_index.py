@@ -0,0 +1,214 @@
+"""
+Chỉ mục không gian dạng lưới đều để tìm nhanh các node gần nhất
+còn lại trong instance lớn.
+
+Toạ độ ``[lon, lat]`` được chiếu phẳng (equirectangular quanh vĩ độ trung bình, đơn
+vị mét) rồi chia thành các ô vuông với trung bình ``points_per_cell`` điểm mỗi ô.
+Điểm được xếp theo ô (dạng CSR) nên truy vấn chỉ duyệt các vòng ô quanh điểm nguồn,
+dừng khi ``k`` ứng viên tốt nhất chắc chắn gần hơn mọi ô chưa duyệt. Xoá điểm chỉ
+bật cờ, không dựng lại lưới.
+"""
+import math
+
+import numpy as np
+
+# Số mét trên một độ vĩ (xấp xỉ), đủ cho việc xếp hạng láng giềng
+# trong phạm vi thành phố
+METRES_PER_DEGREE = 111_320.0
+
+
+class GridIndex:
+    """
+    Lưới đều trên một tập node, hỗ trợ xoá node và truy vấn ``k`` node gần nhất có lọc.
+
+    Attributes:
+        indices (np.ndarray): Index toàn cục của các node được đánh chỉ mục.
+        cell_size (float): Cạnh ô lưới (mét).
+        shape (tuple): Số ô theo trục x (kinh độ) và y (vĩ độ).
+    """
+
+    def __init__(self, coords, indices=None, points_per_cell: float = 2.0):
+        """
+        Args:
+            coords (np.ndarray): Toạ độ ``[lon, lat]`` (N, 2)
+                của mọi node trong instance.
+            indices (np.ndarray, optional): Index toàn cục của các node cần đánh chỉ
+                mục. Defaults to tất cả node.
+            points_per_cell (float, optional): Số điểm trung
+                bình mỗi ô. Defaults to 2.0.
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        num_nodes = coords.shape[0]
+        self.indices = (
+            np.arange(num_nodes)
+            if indices is None
+            else np.asarray(indices, dtype=np.intp)
+        )
+        lat0 = (
+            math.radians(float(coords[self.indices, 1].mean()))
+            if self.indices.size
+            else 0.0
+        )
+        scale = np.array([math.cos(lat0), 1.0]) * METRES_PER_DEGREE
+        # Toạ độ phẳng của mọi node (kể cả không đánh chỉ mục) để
+        # truy vấn từ depot/trạm sạc
+        self._node_xy = coords * scale
+        xy = self._node_xy[self.indices]
+        self._xy = xy
+
+        count = self.indices.size
+        self._origin = xy.min(axis=0) if count else np.zeros(2)
+        extent = (xy.max(axis=0) - self._origin) if count else np.zeros(2)
+        num_cells = max(1, math.ceil(count / points_per_cell))
+        area = max(float(extent[0]), 1.0) * max(float(extent[1]), 1.0)
+        self.cell_size = math.sqrt(area / num_cells)
+        self.shape = tuple(int(v) for v in np.floor(extent / self.cell_size) + 1)
+
+        cells = self._cell_of(xy)
+        cell_ids = cells[:, 0] * self.shape[1] + cells[:, 1]
+        self._order = np.argsort(cell_ids, kind="stable")
+        self._cell_start = np.searchsorted(
+            cell_ids[self._order], np.arange(self.shape[0] * self.shape[1] + 1)
+        )
+        self._local = np.full(num_nodes, -1, dtype=np.intp)
+        self._local[self.indices] = np.arange(count)
+        self._alive = np.ones(count, dtype=bool)
+        self._size = count
+        # Offset ô (dx, dy) xếp theo vòng (khoảng cách Chebyshev); vòng r nằm trong
+        # ``_ring_offsets[_ring_start[r]:_ring_start[r + 1]]``
+        reach = max(self.shape) - 1
+        dx, dy = np.meshgrid(
+            np.arange(-reach, reach + 1), np.arange(-reach, reach + 1), indexing="ij"
+        )
+        rings = np.maximum(np.abs(dx), np.abs(dy)).ravel()
+        order = np.argsort(rings, kind="stable")
+        self._ring_offsets = np.stack([dx.ravel()[order], dy.ravel()[order]], axis=1)
+        self._ring_start = np.searchsorted(rings[order], np.arange(reach + 2))
+
+    def _cell_of(self, xy: np.ndarray) -> np.ndarray:
+        """Ô ``(cx, cy)`` chứa các điểm phẳng ``xy``, chặn trong lưới."""
+        cells = np.floor((xy - self._origin) / self.cell_size).astype(np.intp)
+        return np.clip(cells, 0, np.array(self.shape) - 1)
+
+    def __len__(self) -> int:
+        """Số node còn trong chỉ mục."""
+        return self._size
+
+    def __contains__(self, node: int) -> bool:
+        local = self._local[node]
+        return bool(local >= 0 and self._alive[local])
+
+    def remove(self, node: int):
+        """Xoá node (index toàn cục) khỏi chỉ mục; bỏ qua nếu không có."""
+        local = self._local[node]
+        if local >= 0 and self._alive[local]:
+            self._alive[local] = False
+            self._size -= 1
+
+    def reset(self):
+        """Khôi phục mọi node đã xoá."""
+        self._alive[:] = True
+        self._size = self.indices.size
+
+    def restore(self, available: np.ndarray):
+        """Đặt lại tập node trong chỉ mục theo mặt nạ toàn cục ``available`` (N,)."""
+        self._alive[:] = available[self.indices]
+        self._size = int(np.count_nonzero(self._alive))
+
+    def _ring_cells(self, cx: int, cy: int, first: int, last: int) -> np.ndarray:
+        """Id các ô thuộc vòng ``first..last`` quanh ô ``(cx, cy)``, chặn trong lưới."""
+        offsets = self._ring_offsets[
+            self._ring_start[first] : self._ring_start[last + 1]
+        ]
+        xs, ys = offsets[:, 0] + cx, offsets[:, 1] + cy
+        inside = (xs >= 0) & (xs < self.shape[0]) & (ys >= 0) & (ys < self.shape[1])
+        return xs[inside] * self.shape[1] + ys[inside]
+
+    def _points_in(self, cells: np.ndarray) -> np.ndarray:
+        """Index cục bộ của các điểm còn sống trong các ô ``cells``."""
+        starts = self._cell_start[cells]
+        lengths = self._cell_start[cells + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.intp)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        local = self._order[offsets + np.arange(total)]
+        return local[self._alive[local]]
+
+    def nearest(self, source: int, k: int, accept=None) -> np.ndarray:
+        """
+        ``k`` node gần ``source`` nhất (theo khoảng cách phẳng) còn trong chỉ mục.
+
+        Args:
+            source (int): Index toàn cục của node nguồn (không cần nằm trong chỉ mục).
+            k (int): Số node cần lấy.
+            accept (Callable[[np.ndarray], np.ndarray], optional): Nhận mảng index toàn
+                cục, trả về mặt nạ bool các node được chấp nhận; gọi theo lô điểm gom từ
+                nhiều vòng ô. Defaults to None.
+        Returns:
+            np.ndarray: Tối đa ``k`` index toàn cục (int64), xếp
+            theo khoảng cách tăng dần.
+        """
+        if k <= 0 or self._size == 0:
+            return np.empty(0, dtype=np.int64)
+        point = self._node_xy[source]
+        cx, cy = (
+            min(
+                max(int((point[axis] - self._origin[axis]) // self.cell_size), 0),
+                self.shape[axis] - 1,
+            )
+            for axis in (0, 1)
+        )
+        low_edge = self._origin + np.array([cx, cy]) * self.cell_size
+        found_ids, found_dist = [], []
+        num_found = 0
+        # Điểm đã gom nhưng chưa lọc: chỉ gọi ``accept`` khi số điểm chờ, nhân
+        # với tỉ lệ chấp nhận đã quan sát, có thể đủ ``k`` ứng viên, để mỗi truy
+        # vấn gọi ``accept`` ít lần
+        pending, num_pending = [], 0
+        num_tested = num_accepted = 0
+        kth = np.inf
+        max_radius = max(cx, cy, self.shape[0] - 1 - cx, self.shape[1] - 1 - cy)
+        first, radius = 0, 0
+        while True:
+            # Bán kính tăng gấp đôi mỗi lượt (0, 1, 2, 4, ...) nên số
+            # lượt chỉ cỡ log của lưới
+            local = self._points_in(self._ring_cells(cx, cy, first, radius))
+            if local.size:
+                pending.append(local)
+                num_pending += local.size
+            # Khoảng cách nhỏ nhất tới các ô ngoài hình vuông hiện tại; cạnh đã
+            # chạm biên lưới bị bỏ qua
+            bound = np.inf
+            lo = low_edge - radius * self.cell_size
+            hi = low_edge + (radius + 1) * self.cell_size
+            for axis, (cell, size) in enumerate(zip((cx, cy), self.shape)):
+                if cell - radius > 0:
+                    bound = min(bound, point[axis] - lo[axis])
+                if cell + radius < size - 1:
+                    bound = min(bound, hi[axis] - point[axis])
+            expected = num_pending * (num_accepted + 1) / (num_tested + 1)
+            if num_pending and (num_found + expected >= k or bound == np.inf):
+                local = np.concatenate(pending)
+                pending, num_pending = [], 0
+                nodes = self.indices[local]
+                if accept is not None:
+                    keep = np.asarray(accept(nodes), dtype=bool)
+                    local, nodes = local[keep], nodes[keep]
+                    num_tested += keep.size
+                    num_accepted += nodes.size
+                if nodes.size:
+                    found_ids.append(nodes)
+                    found_dist.append(np.hypot(*(self._xy[local] - point).T))
+                    num_found += nodes.size
+                    if num_found >= k:
+                        kth = np.partition(np.concatenate(found_dist), k - 1)[k - 1]
+            if kth <= bound or bound == np.inf or radius >= max_radius:
+                break
+            first, radius = radius + 1, min(max(1, 2 * radius), max_radius)
+        if not num_found:
+            return np.empty(0, dtype=np.int64)
+        ids = np.concatenate(found_ids)
+        dist = np.concatenate(found_dist)
+        order = np.lexsort((ids, dist))[:k]
+        return ids[order].astype(np.int64)
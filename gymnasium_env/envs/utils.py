@@ -1,37 +1,42 @@
 import random
-from typing import Iterable
+from typing import Iterable, Optional
 
+import numpy as np
 from geopy.distance import geodesic
 
+from gymnasium_env.envs.energy import DEFAULT_ENERGY_MODEL, EnergyModel
 from gymnasium_env.envs.interfaces import NODE_TYPES, Node
 
 
 def generate_packages_weight(max_weight: float, total_packages: int):
     """
-    Ngẫu nhiên tạo ra một danh sách khối lượng các gói hàng sao cho tổng khối lượng xấp xỉ max_weight.
-    Mỗi khối lượng gói hàng là số nguyên không âm, và số lượng gói là total_packages.
+    Ngẫu nhiên tạo ra một danh sách khối lượng các gói hàng sao cho tổng khối
+    lượng xấp xỉ max_weight. Mỗi khối lượng gói hàng là số nguyên không âm, và số
+    lượng gói là total_packages.
 
     Tham số:
         max_weight (float): Tổng khối lượng tối đa cần phân phối cho các gói hàng.
         total_packages (int): Số lượng gói hàng cần tạo khối lượng.
 
-    Trả về:
-        list[int]: Danh sách các số nguyên đại diện cho khối lượng từng gói hàng, tổng lại bằng max_weight.
+    Trả về: list[int]: Danh sách các số nguyên đại diện cho khối lượng từng gói hàng,
+        tổng lại bằng max_weight.
     """
     if max_weight < 0 or total_packages < 0:
         raise ValueError("Max weight and total packages can't be negative.")
-    
+
     if max_weight == 0 or total_packages == 0:
         return []
 
     result = []
 
     # Tạo danh sách điểm cắt ngẫu nhiên đã sắp xếp để chia khối lượng
-    cut_points = sorted([random.randint(0, max_weight) for _ in range(total_packages - 1)])
+    cut_points = sorted(
+        [random.randint(0, max_weight) for _ in range(total_packages - 1)]
+    )
     cut_points = [0] + cut_points + [max_weight]
 
     # Tính hiệu giữa các điểm cắt liên tiếp để lấy khối lượng từng gói
-    result = [round(cut_points[i+1] - cut_points[i]) for i in range(total_packages)]
+    result = [round(cut_points[i + 1] - cut_points[i]) for i in range(total_packages)]
 
     # Điều chỉnh nếu tổng khối lượng chưa đúng max_weight
     diff = sum(result) - max_weight
@@ -48,11 +53,14 @@ def generate_packages_weight(max_weight: float, total_packages: int):
 
     return result
 
+
 def calc_energy_consumption(gij: float, distanceij: float, speedij: float = 15):
-    """Tính năng lượng tiêu thụ, hàm này theo công thức trong bài báo 
+    """Tính năng lượng tiêu thụ, hàm này theo công thức trong bài báo
     Trajectory Optimization for Drone Logistics
     Delivery via Attention-Based Pointer Network
 
+    Các hằng số của công thức được tính sẵn trong ``DEFAULT_ENERGY_MODEL``.
+
     Args:
         gij (float): Khối lượng hàng drone phải mang giữa hai điểm i và j (kg).
         distanceij (float): Khoảng cách giữa 2 điểm i và j (m).
@@ -61,24 +69,256 @@ def calc_energy_consumption(gij: float, distanceij: float, speedij: float = 15):
     Returns:
         float: Năng lượng tiêu thụ
     """
-    if gij < 0:
-        raise ValueError("Weight can't be negative.")
+    return DEFAULT_ENERGY_MODEL.consumption(gij, distanceij, speedij)
+
+
+# Thông số ellipsoid WGS-84, trùng với mặc định của geopy.distance.geodesic
+WGS84_A = 6_378_137.0  # m
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+
+def geodesic_distances(
+    lat_a, lon_a, lat_b, lon_b, tol: float = 1e-12, max_iter: int = 200
+):
+    """Khoảng cách geodesic (mét) giữa các cặp điểm theo công thức Vincenty (WGS-84).
+
+    Các tham số được broadcast theo quy tắc của NumPy nên có thể tính một hàng hoặc cả
+    một ma trận khoảng cách trong một lần gọi. Với khoảng cách trong phạm vi thành phố,
+    sai lệch so với ``geopy.distance.geodesic`` (thuật toán Karney) nhỏ hơn 1e-6 m. Các
+    cặp điểm gần đối cực mà Vincenty không hội tụ được tính lại bằng geopy.
+
+    Args:
+        lat_a, lon_a: Vĩ độ, kinh độ (độ) của điểm đầu.
+        lat_b, lon_b: Vĩ độ, kinh độ (độ) của điểm cuối.
+        tol (float, optional): Ngưỡng hội tụ của lambda (radian). Defaults to 1e-12.
+        max_iter (int, optional): Số vòng lặp tối đa. Defaults to 200.
+
+    Returns:
+        np.ndarray: Mảng float64 khoảng cách theo mét, shape là shape sau broadcast.
+    """
+    lat_a, lon_a, lat_b, lon_b = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (lat_a, lon_a, lat_b, lon_b))
+    )
+    f = WGS84_F
+    L = np.radians(lon_b - lon_a)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat_a)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat_b)))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(
+                cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam
+            )
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(
+                sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma
+            )
+            cos2_alpha = 1 - sin_alpha**2
+            cos_2sigma_m = np.where(
+                cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha
+            )
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma
+                + C
+                * sin_sigma
+                * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m**2))
+            )
+            converged = np.abs(lam - lam_prev) <= tol
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = (
+            B
+            * sin_sigma
+            * (
+                cos_2sigma_m
+                + B
+                / 4
+                * (
+                    cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                    - B
+                    / 6
+                    * cos_2sigma_m
+                    * (-3 + 4 * sin_sigma**2)
+                    * (-3 + 4 * cos_2sigma_m**2)
+                )
+            )
+        )
+        distances = np.array(WGS84_B * A * (sigma - delta_sigma), dtype=np.float64)
+
+    # Trường hợp hiếm: cặp điểm gần đối cực, dùng lại thuật toán của geopy.
+    fallback = ~converged | ~np.isfinite(distances)
+    for idx in map(tuple, np.argwhere(fallback)):
+        distances[idx] = geodesic(
+            (lat_a[idx], lon_a[idx]), (lat_b[idx], lon_b[idx])
+        ).meters
+    return distances
+
+
+def calc_distance_matrix(coords, block_size: int = 256) -> np.ndarray:
+    """Tính ma trận khoảng cách geodesic giữa mọi cặp node.
+
+    Ma trận đối xứng nên chỉ tính nửa trên theo từng khối hàng rồi sao chép sang nửa
+    dưới, giúp giới hạn bộ nhớ tạm khi số node lớn.
+
+    Args:
+        coords: Mảng (N, 2) theo thứ tự ``[lon, lat]`` như trong ``NodeTransformer``.
+        block_size (int, optional): Số hàng tính trong một lần. Defaults to 256.
+
+    Returns:
+        np.ndarray: Ma trận (N, N) float64, đơn vị mét, đường chéo bằng 0.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    num_nodes = coords.shape[0]
+    lons, lats = coords[:, 0], coords[:, 1]
+    matrix = np.zeros((num_nodes, num_nodes), dtype=np.float64)
+    for start in range(0, num_nodes, block_size):
+        stop = min(start + block_size, num_nodes)
+        block = geodesic_distances(
+            lats[start:stop, None],
+            lons[start:stop, None],
+            lats[None, start:],
+            lons[None, start:],
+        )
+        matrix[start:stop, start:] = block
+        matrix[start:, start:stop] = block.T
+    np.fill_diagonal(matrix, 0.0)
+    return matrix
+
+
+class LazyDistanceMatrix:
+    """Ma trận khoảng cách geodesic tính theo yêu cầu cho instance lớn.
+
+    Hỗ trợ truy cập ``m[i, j]`` với ``i``/``j`` là số nguyên, mảng index (broadcast
+    như fancy indexing) hoặc slice, chỉ tính đúng các cặp được hỏi thay vì cả ma
+    trận O(N²). Mỗi cặp được tính theo chiều (index nhỏ, index lớn) nên ma trận đối
+    xứng; giá trị có thể lệch ``calc_distance_matrix`` cỡ micromet do Vincenty dừng
+    lặp theo cả lô. ``np.asarray(m)`` tính và lưu lại toàn bộ ma trận, các truy cập
+    sau đó đọc từ ma trận này.
+    """
+
+    def __init__(self, coords):
+        """
+        Args:
+            coords: Mảng (N, 2) theo thứ tự ``[lon, lat]``.
+        """
+        self.coords = np.asarray(coords, dtype=np.float64)
+        num_nodes = self.coords.shape[0]
+        self.shape = (num_nodes, num_nodes)
+        self.ndim = 2
+        self.dtype = np.dtype(np.float64)
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if self._matrix is not None:
+            return self._matrix[key]
+        rows, cols = key
+        index = np.arange(self.shape[0])
+        row_ids = index[rows] if isinstance(rows, slice) else np.asarray(rows)
+        col_ids = index[cols] if isinstance(cols, slice) else np.asarray(cols)
+        if isinstance(rows, slice) and isinstance(cols, slice):
+            row_ids = row_ids[:, None]
+        low, high = np.minimum(row_ids, col_ids), np.maximum(row_ids, col_ids)
+        lons, lats = self.coords[:, 0], self.coords[:, 1]
+        distances = geodesic_distances(lats[low], lons[low], lats[high], lons[high])
+        distances[low == high] = 0.0
+        return float(distances) if distances.ndim == 0 else distances
+
+    def __array__(self, dtype=None, copy=None):
+        if self._matrix is None:
+            self._matrix = calc_distance_matrix(self.coords)
+            self._matrix.setflags(write=False)
+        return self._matrix if dtype is None else self._matrix.astype(dtype, copy=False)
+
+    @property
+    def materialized(self) -> bool:
+        """Đã tính toàn bộ ma trận hay chưa."""
+        return self._matrix is not None
+
+
+def calc_route_distance(route, distance_matrix: np.ndarray) -> float:
+    """Tổng quãng đường của một lộ trình dựa trên ma trận khoảng cách đã tính sẵn.
+
+    Args:
+        route: Danh sách index node theo thứ tự đi.
+        distance_matrix (np.ndarray): Ma trận khoảng cách (N, N) của instance.
+
+    Returns:
+        float: Tổng khoảng cách (mét), làm tròn 2 chữ số.
+    """
+    route = np.asarray(route, dtype=np.intp)
+    if route.size < 2:
+        return 0.0
+    return round(float(distance_matrix[route[:-1], route[1:]].sum()), 2)
+
+
+def nearest_neighbours(distance_matrix: np.ndarray, k: int) -> np.ndarray:
+    """Index của ``k`` node gần nhất (khác chính nó) của mọi node.
+
+    Args:
+        distance_matrix (np.ndarray): Ma trận khoảng cách (N, N) của instance.
+        k (int): Số láng giềng, bị chặn bởi ``N - 1``.
+
+    Returns:
+        np.ndarray: Mảng (N, k) int32, mỗi hàng xếp theo khoảng cách tăng dần
+        (hoà thì index nhỏ trước).
+    """
+    distances = np.array(distance_matrix, dtype=np.float64)
+    num_nodes = distances.shape[0]
+    k = max(0, min(int(k), num_nodes - 1))
+    np.fill_diagonal(distances, np.inf)
+    if k < num_nodes - 1:
+        candidates = (
+            np.argpartition(distances, k - 1, axis=1)[:, :k]
+            if k
+            else np.empty((num_nodes, 0), np.intp)
+        )
+    else:
+        candidates = np.broadcast_to(np.arange(num_nodes), (num_nodes, num_nodes))
+    candidates = np.sort(candidates, axis=1)
+    order = np.argsort(
+        np.take_along_axis(distances, candidates, axis=1), axis=1, kind="stable"
+    )
+    return np.take_along_axis(candidates, order, axis=1)[:, :k].astype(np.int32)
 
-    drone_frame_weight = 42.5  # kg
-    battery_weight = 22.5      # kg
-    gravity = 9.81             # m/s^2
-    wind_fluid_density = 1.225 # kg/m^3
-    motor_area = 1.375         # m^2
-    motor_number = 8
 
-    total_mass = drone_frame_weight + battery_weight + gij
-    lambda_coef = (gravity ** 3) / (2 * wind_fluid_density * motor_area * motor_number)
+def calc_energy_consumption_batch(
+    gij, distanceij, speedij: float = 15, energy_model: Optional[EnergyModel] = None
+) -> np.ndarray:
+    """Phiên bản mảng của ``calc_energy_consumption``.
+
+    Cùng thứ tự phép tính và cách làm tròn nên từng phần tử trùng khớp với hàm vô hướng.
+
+    Args:
+        gij: Khối lượng hàng (kg), scalar hoặc mảng.
+        distanceij: Khoảng cách (m), scalar hoặc mảng, broadcast cùng ``gij``.
+        speedij (float, optional): Tốc độ bay (m/s). Defaults to 15.
+        energy_model (EnergyModel, optional): Mô hình năng lượng. Defaults to
+            ``DEFAULT_ENERGY_MODEL``.
+
+    Returns:
+        np.ndarray: Năng lượng tiêu thụ của từng cặp.
+    """
+    energy_model = energy_model or DEFAULT_ENERGY_MODEL
+    return np.asarray(
+        energy_model.consumption(np.asarray(gij, dtype=np.float64), distanceij, speedij)
+    )
 
-    gij_energy_consumption = (total_mass ** 1.5) * lambda_coef
-    gij_energy_consumption /= 1_000.0
-    distanceij_energy_consumption = distanceij / 100.0
-    energy_consumption = gij_energy_consumption * (distanceij_energy_consumption / speedij)
-    return round(energy_consumption, 2)
 
 def total_distance_of_a_random_route(nodes):
     """
@@ -90,16 +330,57 @@ def total_distance_of_a_random_route(nodes):
     """
     if len(nodes) < 2:
         return 0.0
-    total_distance = 0.0
-    for i in range(len(nodes) - 1):
-        node_a = nodes[i]
-        node_b = nodes[i + 1]
-        total_distance += geodesic((node_a.lat, node_a.lon), (node_b.lat, node_b.lon)).meters
-    return round(total_distance, 2)
+    lats = np.array([node.lat for node in nodes], dtype=np.float64)
+    lons = np.array([node.lon for node in nodes], dtype=np.float64)
+    total_distance = geodesic_distances(lats[:-1], lons[:-1], lats[1:], lons[1:]).sum()
+    return round(float(total_distance), 2)
+
 
 def calc_distance(node_a, node_b):
-    distance = geodesic((node_a[1], node_a[0]), (node_b[1], node_b[0])).meters
-    return round(distance, 2)
+    distance = geodesic_distances(node_a[1], node_a[0], node_b[1], node_b[0])
+    return round(float(distance), 2)
+
+
+def infeasible_nodes_mask(
+    depot_distances: np.ndarray,
+    node_types: np.ndarray,
+    max_energy: float,
+    drone_speed: float,
+    max_payload: float,
+    energy_model: Optional[EnergyModel] = None,
+) -> np.ndarray:
+    """Đánh dấu các node không thể đi depot -> node -> depot trong giới hạn năng lượng.
+
+    Chiều đi giả định mang tối đa tải trọng (với khách hàng), chiều về mang khối
+    lượng 0.
+
+    Args:
+        depot_distances (np.ndarray): Khoảng cách (m) từ depot tới từng node.
+        node_types (np.ndarray): Giá trị ``NODE_TYPES`` của từng node.
+        max_energy (float): Giới hạn năng lượng; âm nghĩa là không giới hạn.
+        drone_speed (float): Vận tốc bay của drone (m/s).
+        max_payload (float): Khối lượng tối đa drone có thể mang (kg).
+        energy_model (EnergyModel, optional): Mô hình năng lượng. Defaults to
+            ``DEFAULT_ENERGY_MODEL``.
+
+    Returns:
+        np.ndarray: Mảng bool, ``True`` tại node không khả thi. Depot luôn ``False``.
+    """
+    node_types = np.asarray(node_types)
+    if max_energy < 0:
+        return np.zeros(node_types.shape, dtype=bool)
+    outbound_weight = np.where(
+        node_types == NODE_TYPES.customer.value, max_payload, 0.0
+    )
+    outbound_energy = calc_energy_consumption_batch(
+        outbound_weight, depot_distances, drone_speed, energy_model
+    )
+    inbound_energy = calc_energy_consumption_batch(
+        0.0, depot_distances, drone_speed, energy_model
+    )
+    infeasible = outbound_energy + inbound_energy > max_energy
+    infeasible[node_types == NODE_TYPES.depot.value] = False
+    return infeasible
 
 
 def is_new_env_valid(
@@ -107,6 +388,8 @@ def is_new_env_valid(
     max_energy: float,
     drone_speed: float,
     max_payload: float,
+    distance_matrix: Optional[np.ndarray] = None,
+    energy_model: Optional[EnergyModel] = None,
 ) -> bool:
     """Đánh giá tính hợp lệ của danh sách node dựa trên giới hạn năng lượng của drone.
 
@@ -120,14 +403,20 @@ def is_new_env_valid(
             không giới hạn.
         drone_speed (float): Vận tốc bay của drone (m/s).
         max_payload (float): Khối lượng tối đa drone có thể mang (kg).
+        distance_matrix (np.ndarray, optional): Ma trận khoảng cách đã tính
+            sẵn theo đúng thứ tự ``nodes``. Nếu bỏ trống, khoảng cách từ
+            depot được tính trực tiếp.
+        energy_model (EnergyModel, optional): Mô hình năng lượng. Defaults to
+            ``DEFAULT_ENERGY_MODEL``.
 
     Returns:
-        bool: ``True`` nếu tất cả các node đều có thể thực hiện lộ trình depot -> node ->
-            depot trong giới hạn năng lượng, ``False`` nếu tồn tại node không đáp ứng
-            điều kiện này.
+        bool: ``True`` nếu tất cả các node đều có thể thực hiện lộ trình depot ->
+            node -> depot trong giới hạn năng lượng, ``False`` nếu tồn tại node
+            không đáp ứng điều kiện này.
 
     Raises:
-        ValueError: Nếu ``max_payload`` âm hoặc danh sách node không chứa đúng một depot.
+        ValueError: Nếu ``max_payload`` âm hoặc danh sách node
+            không chứa đúng một depot.
     """
 
     if max_payload < 0:
@@ -141,38 +430,25 @@ def is_new_env_valid(
     if not node_list:
         return True
 
-    depot_candidates = [node for node in node_list if node.node_type == NODE_TYPES.depot]
-    if len(depot_candidates) != 1:
+    node_types = np.array([node.node_type.value for node in node_list], dtype=np.int8)
+    depot_indices = np.flatnonzero(node_types == NODE_TYPES.depot.value)
+    if depot_indices.size != 1:
         raise ValueError("Node list must contain exactly one depot node.")
-    depot = depot_candidates[0]
-
-    depot_coord = (depot.lat, depot.lon)
-
-    for node in node_list:
-        if node is depot:
-            continue
-
-        node_coord = (node.lat, node.lon)
-
-        # Khoảng cách đi và về (mét). Khoảng cách hai chiều giống nhau nên chỉ tính một lần.
-        round_trip_distance = geodesic(depot_coord, node_coord).meters
-
-        # Khối lượng mang theo ở chiều đi giả định bằng tối đa tải trọng cho trường hợp xấu nhất.
-        outbound_weight = max_payload if node.node_type == NODE_TYPES.customer else 0.0
-
-        outbound_energy = calc_energy_consumption(
-            gij=outbound_weight,
-            distanceij=round_trip_distance,
-            speedij=drone_speed,
+    depot_index = int(depot_indices[0])
+    depot = node_list[depot_index]
+
+    # Khoảng cách từ depot tới mọi node (mét). Khoảng cách hai chiều giống nhau nên chỉ
+    # tính một lần.
+    if distance_matrix is not None:
+        depot_distances = distance_matrix[depot_index]
+    else:
+        depot_distances = geodesic_distances(
+            depot.lat,
+            depot.lon,
+            [node.lat for node in node_list],
+            [node.lon for node in node_list],
         )
-        inbound_energy = calc_energy_consumption(
-            gij=0.0,
-            distanceij=round_trip_distance,
-            speedij=drone_speed,
-        )
-
-        total_round_trip_energy = outbound_energy + inbound_energy
-        if total_round_trip_energy > max_energy:
-            return False
 
-    return True
+    return not infeasible_nodes_mask(
+        depot_distances, node_types, max_energy, drone_speed, max_payload, energy_model
+    ).any()
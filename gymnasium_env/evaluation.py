@@ -0,0 +1,400 @@
+"""
+Đánh giá policy trên nhiều seed hoặc nhiều instance, chia episode cho nhiều tiến trình.
+
+Mỗi episode được xác định hoàn toàn bởi ``(seed, instance_id)``: env được ``reset`` với
+seed của episode, nên kết quả từng episode (và bản tóm tắt) không phụ thuộc số worker,
+kích thước shard hay cách gom batch, miễn là policy tất định theo observation (policy
+ngẫu nhiên nên dùng ``env.np_random``, vốn được seed theo từng episode).
+
+Chạy từ dòng lệnh:
+    python -m gymnasium_env.evaluation --policy greedy --episodes 1000 --workers 8 \
+        --num-customer-nodes 20 --max-energy 300 --output eval.json
+
+Lệnh trả về mã 1 nếu có episode kết thúc vì policy chọn khách
+vượt sức chứa (``overload``).
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from gymnasium_env.envs.drone_tsp import DroneTspEnv
+
+# Số bước tối đa mặc định của một episode, theo số node (tránh policy lặp vô hạn)
+DEFAULT_MAX_STEPS_PER_NODE = 4
+# Thứ tự ưu tiên khi nhiều lý do truncated cùng xảy ra
+TRUNCATION_REASONS = ("overload", "energy", "charge_limit", "max_steps")
+SUMMARY_METRICS = ("distance", "energy", "charge_count", "steps", "visited_customers")
+
+
+def greedy_policy(observation, env) -> int:
+    """Khách hàng hợp lệ gần nhất, không có thì về depot."""
+    env = env.unwrapped
+    if env.action_mode == "candidates":
+        # Ứng viên đã xếp theo khoảng cách, ô 1 là khách hàng hợp lệ gần nhất
+        return 1 if env.action_masks()[1:2].any() else 0
+    candidates = np.flatnonzero(env.action_masks() & env._is_customer)
+    if candidates.size == 0:
+        return 0
+    distances = env.distance_matrix[env.prev_position, candidates]
+    return int(candidates[np.argmin(distances)])
+
+
+def random_policy(observation, env) -> int:
+    """Khách hàng hợp lệ ngẫu nhiên (theo ``env.np_random``), không có thì về depot."""
+    env = env.unwrapped
+    if env.action_mode == "candidates":
+        return env._sample()
+    candidates = np.flatnonzero(env.action_masks() & env._is_customer)
+    return int(env.np_random.choice(candidates)) if candidates.size else 0
+
+
+POLICIES = {"greedy": greedy_policy, "random": random_policy}
+
+
+@dataclass
+class EvaluationResult:
+    """
+    Kết quả đánh giá.
+
+    Attributes:
+        summary (dict): Số episode, tỉ lệ hoàn thành (``terminated`` mà không vi
+            phạm ràng buộc), số episode theo lý do kết thúc và thống kê
+            (mean/std/min/max) của từng chỉ số.
+        episodes (List[dict]): Bản ghi từng episode theo thứ tự đầu vào.
+        wall_time (float): Thời gian chạy (giây), không thuộc phần tất định của kết quả.
+    """
+
+    summary: dict
+    episodes: List[dict]
+    wall_time: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "summary": self.summary,
+            "episodes": self.episodes,
+            "wall_time": self.wall_time,
+        }
+
+
+def _truncation_reason(env: DroneTspEnv) -> str:
+    if env.remain_packages_weight < 0:
+        return "overload"
+    if env.max_energy != -1 and env.total_energy_consumption >= env.max_energy:
+        return "energy"
+    return "charge_limit"
+
+
+def _stack_observations(observations: list) -> dict:
+    return {
+        key: np.stack([observation[key] for observation in observations])
+        for key in observations[0]
+    }
+
+
+def _run_shard(
+    policy, env_kwargs: dict, episodes: list, batch_size: int, batched: bool, max_steps
+) -> list:
+    """Chạy một shard episode trên ``batch_size`` env.
+
+    Mỗi bước gọi policy một lần cho mọi env đang chạy.
+
+    Args:
+        episodes (list): Các bộ ``(index, seed, instance_id)``.
+
+    Returns:
+        list: Bản ghi các episode của shard.
+    """
+    envs = [DroneTspEnv(**env_kwargs) for _ in range(min(batch_size, len(episodes)))]
+    pending = iter(episodes)
+    active, records = {}, []
+
+    def start(slot: int):
+        episode = next(pending, None)
+        if episode is None:
+            active.pop(slot, None)
+            return
+        index, seed, instance_id = episode
+        options = None if instance_id is None else {"instance_id": instance_id}
+        observation, _ = envs[slot].reset(seed=seed, options=options)
+        limit = max_steps or DEFAULT_MAX_STEPS_PER_NODE * envs[slot]._is_customer.size
+        active[slot] = {
+            "index": index,
+            "seed": seed,
+            "instance_id": instance_id,
+            "observation": observation,
+            "energy": 0.0,
+            "steps": 0,
+            "max_steps": limit,
+        }
+
+    for slot in range(len(envs)):
+        start(slot)
+    try:
+        while active:
+            slots = list(active)
+            if batched:
+                actions = policy(
+                    _stack_observations(
+                        [active[slot]["observation"] for slot in slots]
+                    ),
+                    [envs[slot] for slot in slots],
+                )
+            else:
+                actions = [
+                    policy(active[slot]["observation"], envs[slot]) for slot in slots
+                ]
+            for slot, action in zip(slots, actions):
+                env, state = envs[slot], active[slot]
+                state["steps"] += 1
+                try:
+                    observation, _, terminated, truncated, _ = env.step(int(action))
+                except ValueError:
+                    # ``step`` báo lỗi khi tính năng lượng với khối lượng âm (chọn
+                    # khách vượt sức chứa): kết thúc episode với lý do "overload"
+                    # thay vì dừng cả đánh giá
+                    if env.remain_packages_weight >= 0:
+                        raise
+                    terminated, truncated = False, True
+                else:
+                    state["observation"] = observation
+                    state["energy"] += float(env.energy_consumption_histories[-1])
+                # Vi phạm ràng buộc được tính là lý do kết thúc kể cả
+                # khi đồng thời terminated
+                if truncated:
+                    reason = _truncation_reason(env)
+                elif terminated:
+                    reason = "terminated"
+                elif state["steps"] >= state["max_steps"]:
+                    reason = "max_steps"
+                else:
+                    continue
+                records.append(
+                    {
+                        "index": state["index"],
+                        "seed": state["seed"],
+                        "instance_id": env.instance_id,
+                        "distance": env.total_distance,
+                        "energy": state["energy"],
+                        "charge_count": env.charge_count,
+                        "steps": state["steps"],
+                        "visited_customers": env.num_customer_nodes
+                        - env._nodes.unvisited_customers,
+                        "terminated": terminated,
+                        "truncated": reason != "terminated",
+                        "reason": reason,
+                    }
+                )
+                start(slot)
+    finally:
+        for env in envs:
+            env.close()
+    return records
+
+
+def summarize(episodes: List[dict]) -> dict:
+    """Tổng hợp bản ghi các episode."""
+    reasons = {reason: 0 for reason in ("terminated",) + TRUNCATION_REASONS}
+    for episode in episodes:
+        reasons[episode["reason"]] += 1
+    summary = {
+        "episodes": len(episodes),
+        "terminated_rate": reasons["terminated"] / len(episodes)
+        if episodes
+        else float("nan"),
+        "reasons": reasons,
+    }
+    for metric in SUMMARY_METRICS:
+        values = np.array([episode[metric] for episode in episodes], dtype=np.float64)
+        summary[metric] = {
+            "mean": float(values.mean()) if values.size else float("nan"),
+            "std": float(values.std()) if values.size else float("nan"),
+            "min": float(values.min()) if values.size else float("nan"),
+            "max": float(values.max()) if values.size else float("nan"),
+        }
+    terminated = np.array(
+        [
+            episode["distance"]
+            for episode in episodes
+            if episode["reason"] == "terminated"
+        ]
+    )
+    summary["distance_terminated_mean"] = (
+        float(terminated.mean()) if terminated.size else float("nan")
+    )
+    return summary
+
+
+def evaluate(
+    policy: Callable,
+    seeds=100,
+    instance_ids=None,
+    env_kwargs: Optional[dict] = None,
+    num_workers: int = 1,
+    batch_size: int = 16,
+    batched: bool = False,
+    max_steps: Optional[int] = None,
+    shard_size: Optional[int] = None,
+) -> EvaluationResult:
+    """
+    Đánh giá ``policy`` trên nhiều episode.
+
+    Args:
+        policy (Callable): ``policy(observation, env) -> action``; với ``batched=True``
+            là ``policy(observations, envs) -> actions`` trong đó ``observations`` là
+            dict các mảng đã xếp chồng theo env (cùng thứ tự với ``envs``). Phải pickle
+            được khi ``num_workers > 1`` (hàm cấp module).
+        seeds (int | Sequence[int], optional): Số episode (seed ``0..seeds-1``) hoặc
+            danh sách seed, mỗi seed một episode. Defaults to 100.
+        instance_ids (Sequence[int], optional): Instance trong
+            ``env_kwargs["instance_bank"]`` cho từng episode; khi có mà ``seeds`` là số
+            thì seed là ``0..len-1``.
+        env_kwargs (dict, optional): Tham số khởi tạo ``DroneTspEnv``.
+        num_workers (int, optional): Số tiến trình; 1 là chạy trong tiến trình hiện tại.
+            Defaults to 1.
+        batch_size (int, optional): Số env chạy song song trong một worker (số
+            observation mỗi lần gọi policy). Defaults to 16.
+        batched (bool, optional): Gọi policy một lần cho cả batch. Defaults to False.
+        max_steps (int, optional): Số bước tối đa mỗi episode; mặc định
+            ``DEFAULT_MAX_STEPS_PER_NODE * num_nodes``.
+        shard_size (int, optional): Số episode mỗi shard gửi cho worker; mặc định chia
+            mỗi worker khoảng 4 shard.
+
+    Returns:
+        EvaluationResult: Tóm tắt và bản ghi từng episode.
+
+    Raises:
+        ValueError: Nếu số seed khác số instance hoặc tham số không hợp lệ.
+    """
+    env_kwargs = dict(env_kwargs or {})
+    if isinstance(seeds, (int, np.integer)):
+        seeds = range(len(instance_ids) if instance_ids is not None else int(seeds))
+    seeds = [int(seed) for seed in seeds]
+    if instance_ids is None:
+        instance_ids = [None] * len(seeds)
+    else:
+        instance_ids = [int(instance_id) for instance_id in instance_ids]
+        if len(instance_ids) != len(seeds):
+            raise ValueError(
+                f"Got {len(seeds)} seeds for {len(instance_ids)} instances."
+            )
+        if env_kwargs.get("instance_bank") is None:
+            raise ValueError("instance_ids requires env_kwargs['instance_bank'].")
+    if num_workers < 1 or batch_size < 1:
+        raise ValueError("num_workers and batch_size must be positive.")
+
+    episodes = list(zip(range(len(seeds)), seeds, instance_ids))
+    if shard_size is None:
+        shard_size = max(1, math.ceil(len(episodes) / (num_workers * 4)))
+    shards = [
+        episodes[start : start + shard_size]
+        for start in range(0, len(episodes), shard_size)
+    ]
+
+    start_time = time.perf_counter()
+    args = (policy, env_kwargs)
+    records = []
+    if num_workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(
+                    _run_shard, *args, shard, batch_size, batched, max_steps
+                )
+                for shard in shards
+            ]
+            for future in futures:
+                records.extend(future.result())
+    else:
+        for shard in shards:
+            records.extend(_run_shard(*args, shard, batch_size, batched, max_steps))
+    records.sort(key=lambda record: record["index"])
+    return EvaluationResult(
+        summarize(records), records, time.perf_counter() - start_time
+    )
+
+
+def _load_policy(name: str) -> Callable:
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(
+            f"Policy must be one of {sorted(POLICIES)} or 'module:function', "
+            f"got {name!r}."
+        )
+    return getattr(importlib.import_module(module), attribute)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Evaluate a policy on DroneTSP episodes."
+    )
+    parser.add_argument(
+        "--policy", default="greedy", help=f"{sorted(POLICIES)} or 'module:function'"
+    )
+    parser.add_argument(
+        "--batched",
+        action="store_true",
+        help="Policy takes stacked observations and env list",
+    )
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0, help="First episode seed")
+    parser.add_argument(
+        "--instance-bank", help="Evaluate on instances 0..episodes-1 of this bank"
+    )
+    parser.add_argument("--num-customer-nodes", type=int, default=5)
+    parser.add_argument("--num-charge-nodes", type=int, default=1)
+    parser.add_argument("--max-energy", type=float, default=-1.0)
+    parser.add_argument("--max-charge-times", type=int, default=-1)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-steps", type=int)
+    parser.add_argument(
+        "--output", help="Write summary and per-episode records as JSON"
+    )
+    args = parser.parse_args(argv)
+
+    env_kwargs = {
+        "num_customer_nodes": args.num_customer_nodes,
+        "num_charge_nodes": args.num_charge_nodes,
+        "max_energy": args.max_energy,
+        "max_charge_times": args.max_charge_times,
+        "instance_bank": args.instance_bank,
+    }
+    seeds = range(args.seed, args.seed + args.episodes)
+    instance_ids = range(args.episodes) if args.instance_bank else None
+    result = evaluate(
+        _load_policy(args.policy),
+        seeds,
+        instance_ids,
+        env_kwargs,
+        num_workers=args.workers,
+        batch_size=args.batch_size,
+        batched=args.batched,
+        max_steps=args.max_steps,
+    )
+    print(json.dumps(result.summary, indent=2))
+    print(f"{len(result.episodes)} episodes in {result.wall_time:.2f}s")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result.to_dict(), f, indent=2)
+    # Policy chọn action vượt sức chứa là lỗi của policy, không phải kết
+    # quả đánh giá bình thường
+    overloads = result.summary["reasons"]["overload"]
+    if overloads:
+        print(f"{overloads} episode(s) ended with an overload action", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+from gymnasium_env.solvers.problem import (
+    Problem,
+    SolverResult,
+    actions_to_routes,
+    replay,
+    routes_to_actions,
+)
+from gymnasium_env.solvers.heuristics import (
+    local_search,
+    nearest_neighbour,
+    or_opt,
+    reduce_routes,
+    savings,
+    solve,
+    two_opt,
+)
+from gymnasium_env.solvers.exact import solve_exact, solve_exact_batch
+from gymnasium_env.solvers.beam import solve_beam, solve_beam_batch
+
+__all__ = [
+    "Problem",
+    "SolverResult",
+    "actions_to_routes",
+    "replay",
+    "routes_to_actions",
+    "local_search",
+    "nearest_neighbour",
+    "or_opt",
+    "reduce_routes",
+    "savings",
+    "solve",
+    "two_opt",
+    "solve_exact",
+    "solve_exact_batch",
+    "solve_beam",
+    "solve_beam_batch",
+]
@@ -0,0 +1,337 @@
+"""
+Beam search theo lô cho Drone TSP, mô phỏng đúng động lực của ``DroneTspEnv.step`` trên
+nhiều lộ trình dở dang cùng lúc bằng các phép toán mảng.
+
+Mỗi tầng của tìm kiếm giao thêm đúng một khách, nên mọi trạng thái trong beam đã giao
+cùng số khách và so sánh được bằng quãng đường đã đi. Có hai loại nước đi (macro move):
+    - ``j``: bay thẳng từ vị trí hiện tại tới khách ``j``.
+    - ``0, j``: về depot (nạp đầy hàng, đặt lại năng lượng, tăng
+      ``charge_count``) rồi tới ``j``.
+
+Ràng buộc được kiểm tra như ``step`` (xem ``problem.py``): sức chứa không âm, năng lượng
+tích luỹ nhỏ hơn ``max_energy`` với cạnh tính theo khối lượng còn lại sau khi giao, số
+route không vượt ``max_charge_times``. Trạng thái chắc chắn vượt ``max_charge_times``
+(tổng hàng còn lại cần nhiều route hơn số lần sạc còn lại) bị loại sớm.
+
+Mỗi tầng, toàn bộ nước đi của cả beam được tính trên mảng (beam, khách); mỗi trạng thái
+giữ tối đa ``num_candidates`` nước đi mỗi loại có chi phí nhỏ nhất, các trạng thái trùng
+(cùng tập khách đã giao, vị trí, số lần sạc và khối lượng còn lại) chỉ giữ các bản không
+bị trội (không có bản nào vừa đi ít hơn hoặc bằng vừa tốn ít năng lượng hơn hoặc bằng),
+rồi chọn ``beam_width`` trạng thái tốt nhất. Chi phí mỗi tầng là O(beam_width * N).
+
+``solve_beam_batch`` chia các instance cho nhiều tiến trình để dùng nhiều nhân CPU.
+"""
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from gymnasium_env.envs.energy import round_half_even_2
+from gymnasium_env.solvers.heuristics import local_search
+from gymnasium_env.solvers.problem import Problem, SolverResult, make_result
+
+DEFAULT_BEAM_WIDTH = 64
+DEFAULT_NUM_CANDIDATES = 8
+# Sai số khi làm tròn lên số route cần thêm từ tổng khối lượng còn lại
+ROUTE_BOUND_EPS = 1e-9
+
+
+def _as_problem(problem_or_env) -> Problem:
+    if isinstance(problem_or_env, Problem):
+        return problem_or_env
+    return Problem.from_env(problem_or_env)
+
+
+def _smallest(scores: np.ndarray, k: int) -> np.ndarray:
+    """Cột của ``k`` giá trị nhỏ nhất mỗi hàng (chưa sắp xếp)."""
+    if scores.shape[1] <= k:
+        return np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    return np.argpartition(scores, k - 1, axis=1)[:, :k]
+
+
+def _routes_needed(
+    unvisited_weight: np.ndarray, remain: np.ndarray, capacity: float
+) -> np.ndarray:
+    """Số route tối thiểu phải mở thêm để giao phần hàng vượt quá ``remain``."""
+    extra = np.maximum(unvisited_weight - remain, 0.0) / capacity
+    return np.ceil(extra - ROUTE_BOUND_EPS)
+
+
+def _backtrack(layers: list, index: int, customers: np.ndarray) -> List[List[int]]:
+    """Dựng lại các route (index node) của trạng thái ``index`` ở tầng cuối."""
+    moves = []
+    for parent, node, macro in reversed(layers):
+        moves.append((int(node[index]), bool(macro[index])))
+        index = int(parent[index])
+    routes = [[]]
+    for node, macro in reversed(moves):
+        if macro:
+            routes.append([])
+        routes[-1].append(int(customers[node - 1]))
+    return [route for route in routes if route]
+
+
+def solve_beam(
+    problem_or_env,
+    beam_width: int = DEFAULT_BEAM_WIDTH,
+    num_candidates: int = DEFAULT_NUM_CANDIDATES,
+    improve: bool = False,
+    time_limit: Optional[float] = None,
+) -> SolverResult:
+    """Giải instance bằng beam search trên các nước đi macro (xem đầu module).
+
+    Args:
+        problem_or_env: ``Problem`` hoặc ``DroneTspEnv`` đã ``reset``.
+        beam_width (int, optional): Số trạng thái giữ lại mỗi tầng. Defaults to
+            ``DEFAULT_BEAM_WIDTH``.
+        num_candidates (int, optional): Số nước đi mỗi loại (bay thẳng / qua depot) tối
+            đa được mở rộng từ một trạng thái. Defaults to ``DEFAULT_NUM_CANDIDATES``.
+        improve (bool, optional): Chạy 2-opt/Or-opt trên lời giải
+            tìm được. Defaults to False.
+        time_limit (float, optional): Ngân sách thời gian (giây); khi hết, các tầng còn
+            lại chạy với beam rộng 1 (tham lam) để vẫn trả về lời giải đầy đủ.
+
+    Returns:
+        SolverResult: ``actions`` phát lại được qua ``env.step``; ``stats`` gồm
+            số tầng, số trạng thái được mở rộng, số nước đi hợp lệ, số nước đi
+            được sinh, số trạng thái trùng bị gộp, số nước đi bị loại do giới hạn
+            sạc, và ``time_limited``.
+
+    Raises:
+        ValueError: Nếu ``beam_width`` hoặc ``num_candidates`` không dương.
+    """
+    if beam_width < 1 or num_candidates < 1:
+        raise ValueError("beam_width and num_candidates must be positive.")
+    start = time.perf_counter()
+    deadline = np.inf if time_limit is None else start + time_limit
+    problem = _as_problem(problem_or_env)
+    customers = problem.customers
+    n = customers.size
+    stats = {
+        "method": "beam",
+        "beam_width": beam_width,
+        "num_candidates": num_candidates,
+        "layers": 0,
+        "expanded": 0,
+        "feasible_moves": 0,
+        "generated": 0,
+        "duplicates": 0,
+        "charge_pruned": 0,
+        "time_limited": False,
+    }
+    if n == 0:
+        return make_result(problem, [], start, **stats)
+
+    # Không gian cục bộ: 0 là depot, 1..n là khách
+    nodes = np.concatenate(([0], customers))
+    distances = np.asarray(
+        problem.distance_matrix[np.ix_(nodes, nodes)], dtype=np.float64
+    )
+    weights = np.asarray(problem.package_weights, dtype=np.float64)[nodes]
+    weights[0] = 0.0
+    capacity = float(problem.capacity)
+    energy_limited = problem.energy_limited
+    charge_limited = problem.max_charge_times != -1
+    energy_scale = 1.0 / (100.0 * problem.speed)
+    # Lớn hơn khoảng giá trị năng lượng tích luỹ của một trạng thái hợp lệ
+    energy_span = 2.0 * abs(float(problem.max_energy)) + 1.0 if energy_limited else 1.0
+
+    def edge_energy(payload, distance):
+        factor = problem.energy_model.payload_factor(np.maximum(payload, 0.0))
+        return round_half_even_2(factor * (distance * energy_scale))
+
+    # Nước đi từ depot chỉ phụ thuộc khách: tính một lần
+    depot_remain = capacity - weights
+    depot_ok = depot_remain >= 0
+    depot_ok[0] = False
+    if energy_limited:
+        depot_energy = edge_energy(depot_remain, distances[0])
+        depot_ok &= depot_energy < problem.max_energy
+    else:
+        depot_energy = np.zeros(n + 1)
+    zobrist = np.random.default_rng(0).integers(
+        1, np.iinfo(np.int64).max, size=n + 1, dtype=np.int64
+    )
+
+    position = np.zeros(1, dtype=np.int64)
+    remain = np.full(1, capacity)
+    energy = np.zeros(1)
+    charges = np.zeros(1, dtype=np.int64)
+    travelled = np.zeros(1)
+    keys = np.zeros(1, dtype=np.int64)
+    visited = np.zeros((1, n + 1), dtype=bool)
+    visited[:, 0] = True
+    unvisited_weight = np.full(1, float(weights.sum()))
+    layers = []
+
+    for _ in range(n):
+        width = beam_width
+        if time.perf_counter() > deadline:
+            width = 1
+            stats["time_limited"] = True
+        count = position.size
+        rows = np.arange(count)[:, None]
+        open_ = ~visited
+        row_distances = distances[position]
+
+        # Bay thẳng tới j
+        direct_remain = remain[:, None] - weights
+        direct_ok = open_ & (direct_remain >= 0)
+        if energy_limited:
+            direct_energy = energy[:, None] + edge_energy(direct_remain, row_distances)
+            direct_ok &= direct_energy < problem.max_energy
+        # Về depot rồi tới j (chỉ khi đang ở khách)
+        macro_ok = open_ & depot_ok & (position > 0)[:, None]
+        after_weight = unvisited_weight[:, None] - weights
+        if charge_limited:
+            routes_left = problem.max_charge_times - charges[:, None]
+            direct_bound = (
+                1 + _routes_needed(after_weight, direct_remain, capacity) <= routes_left
+            )
+            macro_bound = (
+                2 + _routes_needed(after_weight, depot_remain, capacity) <= routes_left
+            )
+            stats["charge_pruned"] += int(np.count_nonzero(direct_ok & ~direct_bound))
+            stats["charge_pruned"] += int(np.count_nonzero(macro_ok & ~macro_bound))
+            direct_ok &= direct_bound
+            macro_ok &= macro_bound
+        stats["expanded"] += count
+        stats["feasible_moves"] += int(
+            np.count_nonzero(direct_ok) + np.count_nonzero(macro_ok)
+        )
+
+        direct_score = np.where(direct_ok, travelled[:, None] + row_distances, np.inf)
+        macro_score = np.where(
+            macro_ok, (travelled + row_distances[:, 0])[:, None] + distances[0], np.inf
+        )
+        direct_pick = _smallest(direct_score, num_candidates)
+        macro_pick = _smallest(macro_score, num_candidates)
+        pick = np.concatenate((direct_pick, macro_pick), axis=1)
+        macro = np.zeros(pick.shape, dtype=bool)
+        macro[:, direct_pick.shape[1] :] = True
+        score = np.concatenate(
+            (direct_score[rows, direct_pick], macro_score[rows, macro_pick]), axis=1
+        )
+        parent, column = np.nonzero(np.isfinite(score))
+        if parent.size == 0:
+            break
+        node = pick[parent, column]
+        macro = macro[parent, column]
+        score = score[parent, column]
+        stats["generated"] += parent.size
+
+        child_remain = np.where(macro, depot_remain[node], direct_remain[parent, node])
+        child_charges = charges[parent] + macro
+        child_keys = keys[parent] ^ zobrist[node]
+        if energy_limited:
+            child_energy = np.where(
+                macro, depot_energy[node], direct_energy[parent, node]
+            )
+        else:
+            child_energy = np.zeros(node.size)
+        # Gộp trạng thái trùng: trong mỗi nhóm (xếp theo quãng đường rồi năng
+        # lượng) chỉ giữ trạng thái tốn ít năng lượng hơn mọi trạng thái có quãng
+        # đường nhỏ hơn hoặc bằng
+        order = np.lexsort(
+            (child_energy, score, child_remain, child_charges, node, child_keys)
+        )
+        first = np.ones(order.size, dtype=bool)
+        first[1:] = (
+            (np.diff(child_keys[order]) != 0)
+            | (np.diff(node[order]) != 0)
+            | (np.diff(child_charges[order]) != 0)
+            | (np.diff(child_remain[order]) != 0)
+        )
+        # Trừ dần theo nhóm để min tích luỹ không tràn sang nhóm sau
+        shifted = child_energy[order] - np.cumsum(first) * energy_span
+        previous = np.concatenate(([np.inf], np.minimum.accumulate(shifted)[:-1]))
+        kept = order[shifted < previous]
+        stats["duplicates"] += int(order.size - kept.size)
+        if kept.size > width:
+            kept = kept[np.argpartition(score[kept], width - 1)[:width]]
+        kept = kept[np.lexsort((kept, score[kept]))]
+
+        parent, node, macro = parent[kept], node[kept], macro[kept]
+        energy = child_energy[kept]
+        position = node
+        remain = child_remain[kept]
+        charges = child_charges[kept]
+        keys = child_keys[kept]
+        travelled = score[kept]
+        unvisited_weight = after_weight[parent, node]
+        visited = visited[parent]
+        visited[np.arange(kept.size), node] = True
+        layers.append((parent, node, macro))
+        stats["layers"] += 1
+
+    if layers:
+        if len(layers) == n:
+            best = int(np.argmin(travelled + distances[position, 0]))
+        else:
+            # Không mở rộng được tới hết khách: trả lời giải dở dang (không hợp lệ)
+            best = 0
+        routes = _backtrack(layers, best, customers)
+    else:
+        routes = []
+    stats["beam_cost"] = problem.routes_cost(routes) if routes else 0.0
+    if improve and len(layers) == n:
+        remaining = (
+            None if time_limit is None else max(deadline - time.perf_counter(), 0.0)
+        )
+        stats.update(local_search(problem, routes, time_limit=remaining))
+    return make_result(problem, routes, start, **stats)
+
+
+def _solve_beam_problems(
+    problems: Sequence[Problem], kwargs: dict
+) -> List[SolverResult]:
+    return [solve_beam(problem, **kwargs) for problem in problems]
+
+
+def solve_beam_batch(
+    problems_or_envs: Sequence, num_workers: int = 1, **kwargs
+) -> List[SolverResult]:
+    """Giải nhiều instance bằng ``solve_beam``, chia cho ``num_workers`` tiến trình.
+
+    Args:
+        problems_or_envs (Sequence): Các ``Problem`` hoặc ``DroneTspEnv`` đã ``reset``.
+        num_workers (int, optional): Số tiến trình; 1 là chạy trong tiến trình hiện tại.
+            Defaults to 1.
+        **kwargs: Tham số của ``solve_beam``.
+
+    Returns:
+        List[SolverResult]: Kết quả theo đúng thứ tự đầu vào.
+
+    Raises:
+        ValueError: Nếu ``num_workers`` không dương.
+    """
+    if num_workers < 1:
+        raise ValueError("num_workers must be positive.")
+    problems = [_as_problem(p) for p in problems_or_envs]
+    if num_workers == 1 or len(problems) < 2:
+        return _solve_beam_problems(problems, kwargs)
+    # Ma trận khoảng cách tính lười được vật chất hoá trước khi gửi sang tiến trình con
+    problems = [
+        problem
+        if isinstance(problem.distance_matrix, np.ndarray)
+        else replace(
+            problem,
+            distance_matrix=np.asarray(problem.distance_matrix, dtype=np.float64),
+        )
+        for problem in problems
+    ]
+    shard_size = max(1, math.ceil(len(problems) / (num_workers * 4)))
+    shards = [
+        problems[begin : begin + shard_size]
+        for begin in range(0, len(problems), shard_size)
+    ]
+    results = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for solved in executor.map(
+            _solve_beam_problems, shards, [kwargs] * len(shards)
+        ):
+            results.extend(solved)
+    return results
@@ -0,0 +1,429 @@
+"""
+Bộ giải chính xác bằng quy hoạch động trên bitmask cho instance
+nhỏ (tới khoảng 20 khách).
+
+Hai tầng, đều vector hoá theo tập con và theo batch instance cùng số khách:
+    1. Held–Karp cho một route: ``f[S, j]`` là quãng đường ngắn nhất đi từ depot qua
+       đúng tập khách ``S`` và dừng ở ``j``; tính theo tầng ``|S|``. Khối lượng còn lại
+       sau khi giao xong ``S`` chỉ phụ thuộc ``S`` nên sức chứa và năng lượng của cạnh
+       vào ``j`` tính được theo ``(S, i, j)``.
+    2. Phân hoạch tập khách thành các route: ``P[T] = min rc[S] + P[T \\ S]`` với ``S``
+       chứa khách có index nhỏ nhất của ``T`` (mỗi phân hoạch chỉ đếm một lần). Giới hạn
+       ``max_charge_times`` thêm một chiều số route.
+
+Khi không giới hạn năng lượng, kết quả là tối ưu. Với ``max_energy``, ràng buộc năng
+lượng phụ thuộc thứ tự nên bài toán route là hai tiêu chí; bộ giải tính cận dưới (quãng
+đường ngắn nhất chỉ xét sức chứa, trên các tập có ít nhất một thứ tự hợp lệ) và cận trên
+(đường hợp lệ tốt nhất tìm được bởi DP chỉ mở rộng đường hợp lệ, hoặc đường tốn ít năng
+lượng nhất). ``stats["optimal"]`` là True khi hai cận trùng nhau.
+
+Bộ nhớ mỗi instance khoảng ``2**n * n`` phần tử cho mỗi bảng (9 byte/phần tử khi không
+giới hạn năng lượng, 42 byte/phần tử khi có), nên n = 20 cần khoảng 190 MB / 880 MB.
+"""
+import time
+from functools import lru_cache
+from typing import List, Sequence
+
+import numpy as np
+
+from gymnasium_env.envs.energy import round_half_even_2
+from gymnasium_env.solvers.problem import Problem, SolverResult, make_result
+
+MAX_CUSTOMERS = 20
+# Bộ nhớ tối đa cho các bảng DP của một nhóm instance giải cùng lúc
+DEFAULT_MAX_BATCH_BYTES = 1 << 30
+# Số phần tử tối đa của mảng (instance x tập x tập con) tính
+# trong một lần khi phân hoạch
+PARTITION_CHUNK_ELEMENTS = 1 << 18
+# Sai số tương đối khi so cận dưới và cận trên
+BOUND_RTOL = 1e-9
+
+
+@lru_cache(maxsize=None)
+def _layers(n: int) -> tuple:
+    """Các mask ``n`` bit nhóm theo số bit 1 (tầng)."""
+    masks = np.arange(1 << n, dtype=np.int64)
+    counts = np.zeros(1 << n, dtype=np.int64)
+    for bit in range(n):
+        counts += (masks >> bit) & 1
+    order = np.argsort(counts, kind="stable")
+    bounds = np.searchsorted(counts[order], np.arange(n + 2))
+    return tuple(order[bounds[k] : bounds[k + 1]] for k in range(n + 1))
+
+
+def _subset_weights(weights: np.ndarray) -> np.ndarray:
+    """Tổng khối lượng của mọi tập con khách, shape (B, 2**n)."""
+    B, n = weights.shape
+    masks = np.arange(1 << n, dtype=np.int64)
+    totals = np.zeros((B, 1 << n), dtype=np.float64)
+    for bit in range(n):
+        totals += np.where((masks >> bit) & 1, weights[:, bit, None], 0.0)
+    return totals
+
+
+def _take(values: np.ndarray, index: np.ndarray) -> np.ndarray:
+    return np.take_along_axis(values, index[..., None], axis=-1)[..., 0]
+
+
+def _route_tables(
+    distances, weights, capacity, max_energy, speed, energy_model, energy_limited
+) -> dict:
+    """Held–Karp cho mọi tập con khách (tầng 1).
+
+    Args:
+        distances (np.ndarray): (B, n+1, n+1), index 0 là depot.
+        weights (np.ndarray): (B, n) khối lượng khách.
+        capacity, max_energy, speed (np.ndarray): (B,) tham số từng instance.
+
+    Returns:
+        dict: ``lower``/``upper`` (B, 2**n) chi phí route của từng tập (inf nếu
+            không hợp lệ), ``end``, ``kind`` (tập dùng đường năng lượng nhỏ
+            nhất) và bảng cha để dựng lại.
+    """
+    B, n = weights.shape
+    size = 1 << n
+    customers = np.arange(n)
+    batch = np.arange(B)[:, None]
+    single = np.int64(1) << customers
+    layers = _layers(n)
+    between, depot, back = (
+        distances[:, 1:, 1:],
+        distances[:, 0, 1:],
+        distances[:, 1:, 0],
+    )
+
+    remain = capacity[:, None] - _subset_weights(weights)
+    capacity_ok = remain >= 0
+
+    dist = np.full((B, size, n), np.inf)
+    parent = np.full((B, size, n), -1, dtype=np.int8)
+    dist[:, single, customers] = np.where(capacity_ok[:, single], depot, np.inf)
+    if energy_limited:
+        factor = energy_model.payload_factor(np.maximum(remain, 0.0))
+        limit = max_energy[:, None, None]
+        first = round_half_even_2(
+            factor[:, single] * ((depot / 100.0) / speed[:, None])
+        )
+        ok = capacity_ok[:, single] & (first < max_energy[:, None])
+        # Đường hợp lệ ngắn nhất (chỉ mở rộng đường hợp lệ) và năng lượng của nó
+        upper = np.full((B, size, n), np.inf)
+        upper_energy = np.full((B, size, n), np.inf)
+        upper_parent = np.full((B, size, n), -1, dtype=np.int8)
+        # Đường tốn ít năng lượng nhất và quãng đường của nó
+        least = np.full((B, size, n), np.inf)
+        least_dist = np.full((B, size, n), np.inf)
+        least_parent = np.full((B, size, n), -1, dtype=np.int8)
+        upper[:, single, customers] = np.where(ok, depot, np.inf)
+        upper_energy[:, single, customers] = np.where(ok, first, np.inf)
+        least[:, single, customers] = np.where(ok, first, np.inf)
+        least_dist[:, single, customers] = np.where(ok, depot, np.inf)
+
+    for k in range(2, n + 1):
+        layer = layers[k]
+        for j in range(n):
+            subsets = layer[(layer >> j) & 1 == 1]
+            previous = subsets ^ (1 << j)
+            edge = between[:, None, :, j]
+            ok = capacity_ok[:, subsets]
+
+            candidates = dist[:, previous, :] + edge
+            best = np.argmin(candidates, axis=2)
+            dist[:, subsets, j] = np.where(ok, _take(candidates, best), np.inf)
+            parent[:, subsets, j] = best
+            if not energy_limited:
+                continue
+
+            energy = round_half_even_2(
+                factor[:, subsets, None] * ((edge / 100.0) / speed[:, None, None])
+            )
+            cumulative = upper_energy[:, previous, :] + energy
+            candidates = np.where(
+                cumulative < limit, upper[:, previous, :] + edge, np.inf
+            )
+            best = np.argmin(candidates, axis=2)
+            upper[:, subsets, j] = np.where(ok, _take(candidates, best), np.inf)
+            upper_energy[:, subsets, j] = np.where(ok, _take(cumulative, best), np.inf)
+            upper_parent[:, subsets, j] = best
+
+            cumulative = least[:, previous, :] + energy
+            cumulative = np.where(cumulative < limit, cumulative, np.inf)
+            best = np.argmin(cumulative, axis=2)
+            least[:, subsets, j] = np.where(ok, _take(cumulative, best), np.inf)
+            least_dist[:, subsets, j] = np.where(
+                ok,
+                _take(least_dist[:, previous, :], best) + between[batch, best, j],
+                np.inf,
+            )
+            least_parent[:, subsets, j] = best
+
+    totals = dist + back[:, None, :]
+    end = np.argmin(totals, axis=2)
+    lower = _take(totals, end)
+    tables = {
+        "lower": lower,
+        "upper": lower,
+        "end": end,
+        "parent": parent,
+        "kind": None,
+    }
+    if energy_limited:
+        reachable = np.isfinite(least).any(axis=2)
+        totals_upper = upper + back[:, None, :]
+        totals_least = (
+            np.where(np.isfinite(least), least_dist, np.inf) + back[:, None, :]
+        )
+        end_upper, end_least = np.argmin(totals_upper, axis=2), np.argmin(
+            totals_least, axis=2
+        )
+        value_upper, value_least = _take(totals_upper, end_upper), _take(
+            totals_least, end_least
+        )
+        kind = value_least < value_upper
+        tables.update(
+            lower=np.where(reachable, lower, np.inf),
+            upper=np.minimum(value_upper, value_least),
+            end=np.where(kind, end_least, end_upper),
+            parent=upper_parent,
+            least_parent=least_parent,
+            kind=kind,
+        )
+    tables["lower"][:, 0] = np.inf
+    tables["upper"][:, 0] = np.inf
+    return tables
+
+
+def _partition_layer(target, source, route_costs, choice, layer):
+    """Cập nhật ``target[T]`` từ ``source`` cho các tập ``T`` trong ``layer``."""
+    B = route_costs.shape[0]
+    if layer.size == 0:
+        return
+    n_bits = bin(int(layer[0])).count("1")
+    n = route_costs.shape[1].bit_length() - 1
+    low = layer & -layer
+    rest = layer ^ low
+    width = 1 << (n_bits - 1)
+    chunk = max(1, PARTITION_CHUNK_ELEMENTS // (B * width))
+    for begin in range(0, layer.size, chunk):
+        sl = slice(begin, begin + chunk)
+        bits = ((rest[sl, None] >> np.arange(n)) & 1).astype(bool)
+        columns = np.int64(1) << np.nonzero(bits)[1].reshape(bits.shape[0], n_bits - 1)
+        # Mọi tập con của ``rest``: nhân đôi theo từng bit
+        subsets = np.empty((bits.shape[0], width), dtype=np.int64)
+        subsets[:, 0] = low[sl]
+        for column in range(n_bits - 1):
+            half = 1 << column
+            np.bitwise_or(
+                subsets[:, :half],
+                columns[:, column, None],
+                out=subsets[:, half : 2 * half],
+            )
+        values = np.take(route_costs, subsets, axis=1)
+        values += np.take(source, layer[sl, None] ^ subsets, axis=1)
+        best = np.argmin(values, axis=2)
+        target[:, layer[sl]] = _take(values, best)
+        choice[:, layer[sl]] = np.take_along_axis(
+            subsets[None], best[..., None], axis=2
+        )[..., 0]
+
+
+def _partition(route_costs: np.ndarray, max_routes) -> tuple:
+    """Phân hoạch tối ưu tập mọi khách thành route (tầng 2).
+
+    Chỉ cần bảng ``P`` trên các tập không chứa khách 0: tập đầy đủ tách route chứa khách
+    0 trước, phần còn lại không chứa khách 0.
+
+    Args:
+        route_costs (np.ndarray): (B, 2**n) chi phí route của từng tập.
+        max_routes (int): Số route tối đa; ``None`` là không giới hạn.
+
+    Returns:
+        tuple: ``(cost, first, choices)``: chi phí tối ưu (B,), route chứa khách 0 (B,),
+            và ``choices[c][b, T]`` là route đầu của ``T`` khi còn tối đa ``c + 1``
+            route (không giới hạn: một bảng).
+    """
+    B, size = route_costs.shape
+    n = size.bit_length() - 1
+    full = np.array([size - 1], dtype=np.int64)
+    layers = [layer[(layer & 1) == 0] for layer in _layers(n)[1:n]]
+    table = np.full((B, size), np.inf)
+    table[:, 0] = 0.0
+    choices = []
+    # Không giới hạn: một bảng tự tham chiếu (tầng nhỏ tính trước); có giới
+    # hạn: bảng theo số route
+    for _ in range(1 if max_routes is None else max_routes - 1):
+        source = table
+        if max_routes is not None:
+            table = source.copy()
+        choice = np.zeros((B, size), dtype=np.int64)
+        for layer in layers:
+            _partition_layer(table, source, route_costs, choice, layer)
+        choices.append(choice)
+    cost = np.full((B, size), np.inf)
+    first = np.zeros((B, size), dtype=np.int64)
+    _partition_layer(cost, table, route_costs, first, full)
+    return cost[:, -1], first[:, -1], choices
+
+
+def _route_order(subset: int, end: int, parent: np.ndarray) -> List[int]:
+    """Thứ tự khách (index cục bộ) của route đi qua ``subset`` và dừng ở ``end``."""
+    order = []
+    while subset:
+        order.append(end)
+        previous = int(parent[subset, end])
+        subset ^= 1 << end
+        end = previous
+    return order[::-1]
+
+
+def _max_routes(problem: Problem, n: int):
+    if problem.max_charge_times == -1 or problem.max_charge_times >= n:
+        return None
+    return int(problem.max_charge_times)
+
+
+def _solve_group(problems: Sequence[Problem], max_routes) -> List[SolverResult]:
+    """Giải một nhóm instance cùng số khách, mô hình năng lượng và giới hạn route."""
+    start = time.perf_counter()
+    first_problem = problems[0]
+    customers = [problem.customers for problem in problems]
+    n = customers[0].size
+    energy_limited = first_problem.energy_limited
+    distances = np.stack(
+        [
+            np.asarray(problem.distance_matrix[np.ix_(nodes, nodes)], dtype=np.float64)
+            for problem, nodes in (
+                (p, np.concatenate(([0], c))) for p, c in zip(problems, customers)
+            )
+        ]
+    )
+    weights = np.stack(
+        [
+            np.asarray(problem.package_weights, dtype=np.float64)[nodes]
+            for problem, nodes in zip(problems, customers)
+        ]
+    )
+    params = {
+        name: np.array([float(getattr(problem, name)) for problem in problems])
+        for name in ("capacity", "max_energy", "speed")
+    }
+    tables = _route_tables(
+        distances,
+        weights,
+        params["capacity"],
+        params["max_energy"],
+        params["speed"],
+        first_problem.energy_model,
+        energy_limited,
+    )
+    if max_routes == 0:
+        upper = lower = np.full(len(problems), np.inf)
+        first, choices = np.zeros(len(problems), dtype=np.int64), []
+    else:
+        upper, first, choices = _partition(tables["upper"], max_routes)
+        lower = upper
+        if energy_limited and not np.array_equal(tables["lower"], tables["upper"]):
+            lower = _partition(tables["lower"], max_routes)[0]
+
+    results = []
+    for b, problem in enumerate(problems):
+        routes = []
+        if np.isfinite(upper[b]):
+            subset, level = int(first[b]), len(choices) - 1
+            remaining = (1 << n) - 1
+            while True:
+                parent = tables["parent"][b]
+                if tables["kind"] is not None and tables["kind"][b, subset]:
+                    parent = tables["least_parent"][b]
+                local = _route_order(subset, int(tables["end"][b, subset]), parent)
+                routes.append(customers[b][local])
+                remaining ^= subset
+                if not remaining:
+                    break
+                subset = int(choices[level][b, remaining])
+                if max_routes is not None:
+                    level -= 1
+        optimal = bool(
+            np.isfinite(upper[b])
+            and upper[b] - lower[b] <= BOUND_RTOL * max(abs(upper[b]), 1.0)
+        )
+        results.append(
+            make_result(
+                problem,
+                routes,
+                start,
+                method="held_karp",
+                lower_bound=float(lower[b]),
+                optimal=optimal,
+                batch_size=len(problems),
+            )
+        )
+    return results
+
+
+def solve_exact_batch(
+    problems_or_envs: Sequence, max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES
+) -> List[SolverResult]:
+    """Giải chính xác nhiều instance nhỏ trong một lần gọi.
+
+    Các instance được nhóm theo số khách, mô hình năng lượng và giới hạn route; mỗi nhóm
+    được giải bằng các phép toán mảng chung, chia nhỏ theo ``max_batch_bytes``.
+
+    Args:
+        problems_or_envs (Sequence): Các ``Problem`` hoặc ``DroneTspEnv`` đã ``reset``.
+        max_batch_bytes (int, optional): Bộ nhớ tối đa cho các bảng DP của một lần giải.
+            Defaults to ``DEFAULT_MAX_BATCH_BYTES``.
+
+    Returns:
+        List[SolverResult]: Kết quả theo đúng thứ tự đầu vào;
+        ``stats`` gồm ``lower_bound``
+            và ``optimal``; ``solve_time`` là thời gian của cả nhóm giải cùng lúc.
+
+    Raises:
+        ValueError: Nếu instance có nhiều hơn ``MAX_CUSTOMERS`` khách.
+    """
+    problems = [
+        p if isinstance(p, Problem) else Problem.from_env(p) for p in problems_or_envs
+    ]
+    groups = {}
+    for index, problem in enumerate(problems):
+        n = problem.customers.size
+        if n > MAX_CUSTOMERS:
+            raise ValueError(
+                f"Exact solver supports at most {MAX_CUSTOMERS} customers, got {n}."
+            )
+        key = (n, problem.energy_limited, _max_routes(problem, n), problem.energy_model)
+        groups.setdefault(key, []).append(index)
+
+    results = [None] * len(problems)
+    for (n, energy_limited, max_routes, _), indices in groups.items():
+        per_instance = (1 << n) * max(n, 1) * (42 if energy_limited else 9) + (
+            1 << n
+        ) * 8 * (2 + (max_routes or 1))
+        chunk = max(1, max_batch_bytes // per_instance)
+        for begin in range(0, len(indices), chunk):
+            batch = indices[begin : begin + chunk]
+            if n == 0:
+                solved = [
+                    make_result(
+                        problems[i],
+                        [],
+                        time.perf_counter(),
+                        method="held_karp",
+                        lower_bound=0.0,
+                        optimal=True,
+                        batch_size=len(batch),
+                    )
+                    for i in batch
+                ]
+            else:
+                solved = _solve_group([problems[i] for i in batch], max_routes)
+            for index, result in zip(batch, solved):
+                results[index] = result
+    return results
+
+
+def solve_exact(
+    problem_or_env, max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES
+) -> SolverResult:
+    """Giải chính xác một instance nhỏ (xem ``solve_exact_batch``)."""
+    return solve_exact_batch([problem_or_env], max_batch_bytes)[0]
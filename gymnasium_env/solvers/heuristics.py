@@ -0,0 +1,540 @@
+"""
+Heuristic xây dựng (nearest neighbour, savings) và tìm kiếm cục bộ (2-opt, Or-opt) cho
+Drone TSP, tuân theo đúng ràng buộc của ``DroneTspEnv.step`` (xem ``problem.py``).
+
+Savings tiếp tục ghép route (kể cả khi saving âm) tới khi số route không vượt
+``max_charge_times``; nếu lời giải xây dựng vẫn vượt, ``reduce_routes`` bỏ dần route
+bằng cách chèn khách sang route khác rồi chuyển/đổi chỗ khách để hết quá tải.
+
+Các bước đánh giá nước đi được vector hoá trên ma trận khoảng cách; tính hợp lệ của
+route sau khi thay đổi được kiểm tra lại chính xác bằng ``Problem.route_feasible``.
+"""
+import time
+from typing import List, Optional, Union
+
+import numpy as np
+
+from gymnasium_env.envs.energy import round_half_even_2
+from gymnasium_env.solvers.problem import Problem, SolverResult, make_result
+
+# Mức cải thiện tối thiểu (mét) để chấp nhận một nước đi, tránh lặp vô hạn do sai số
+IMPROVEMENT_EPS = 1e-7
+# Số khách gần nhất của mỗi đầu đoạn dùng làm vị trí chèn ở Or-opt
+OR_OPT_NEIGHBOURS = 10
+
+
+def _as_problem(problem_or_env) -> Problem:
+    if isinstance(problem_or_env, Problem):
+        return problem_or_env
+    return Problem.from_env(problem_or_env)
+
+
+def _deadline(time_limit: Optional[float]) -> float:
+    return np.inf if time_limit is None else time.perf_counter() + time_limit
+
+
+def _nearest_customers(problem: Problem, k: int) -> np.ndarray:
+    """``k`` khách gần nhất (index node) của mỗi node theo hàng; hàng depot bỏ trống."""
+    customers = problem.customers
+    nearest = np.zeros(
+        (
+            np.asarray(problem.package_weights).shape[0],
+            max(min(k, customers.size - 1), 1),
+        ),
+        dtype=np.int64,
+    )
+    if customers.size < 2:
+        nearest[customers] = customers[:, None]
+        return nearest
+    sub = np.array(
+        problem.distance_matrix[np.ix_(customers, customers)], dtype=np.float64
+    )
+    np.fill_diagonal(sub, np.inf)
+    nearest[customers] = customers[
+        np.argpartition(sub, nearest.shape[1] - 1, axis=1)[:, : nearest.shape[1]]
+    ]
+    return nearest
+
+
+def nearest_neighbour_routes(problem: Problem) -> List[List[int]]:
+    """Nearest neighbour: luôn tới khách gần nhất còn hợp lệ, hết thì về depot."""
+    distances = problem.distance_matrix
+    weights = np.asarray(problem.package_weights, dtype=np.float64)
+    unvisited = np.zeros(weights.shape[0], dtype=bool)
+    unvisited[problem.customers] = True
+    routes = []
+    while unvisited.any():
+        route, current, remain, energy = [], 0, float(problem.capacity), 0.0
+        while True:
+            candidates = unvisited & (weights <= remain)
+            row = np.asarray(distances[current], dtype=np.float64)
+            if problem.energy_limited:
+                payloads = np.maximum(remain - weights, 0.0)
+                energies = round_half_even_2(
+                    problem.energy_model.payload_factor(payloads)
+                    * ((row / 100.0) / problem.speed)
+                )
+                candidates &= energy + energies < problem.max_energy
+            if not candidates.any():
+                break
+            nxt = int(np.argmin(np.where(candidates, row, np.inf)))
+            route.append(nxt)
+            unvisited[nxt] = False
+            remain -= float(weights[nxt])
+            if problem.energy_limited:
+                energy += float(energies[nxt])
+            current = nxt
+        if not route:
+            break  # Còn khách không thể phục vụ ngay cả khi xuất phát từ depot
+        routes.append(route)
+    return routes
+
+
+def savings_routes(problem: Problem, neighbours: int = 25) -> List[List[int]]:
+    """Xây route bằng savings (Clarke–Wright) trên ``neighbours`` láng giềng gần nhất.
+
+    Mỗi lần ghép hai route thử cả bốn cách nối đầu/cuối (có đảo chiều) và chỉ nhận nếu
+    route mới hợp lệ về sức chứa và năng lượng.
+    """
+    customers = problem.customers
+    n = customers.size
+    if n == 0:
+        return []
+    distances = problem.distance_matrix
+    depot = np.asarray(distances[0, customers], dtype=np.float64)
+    if n == 1:
+        return [[int(customers[0])]]
+
+    sub = np.asarray(distances[np.ix_(customers, customers)], dtype=np.float64)
+    k = min(neighbours, n - 1)
+    masked = sub.copy()
+    np.fill_diagonal(masked, np.inf)
+    nearest = np.argpartition(masked, k - 1, axis=1)[:, :k]
+    i = np.repeat(np.arange(n), k)
+    j = nearest.ravel()
+    pairs = np.unique(np.stack([np.minimum(i, j), np.maximum(i, j)], axis=1), axis=0)
+    i, j = pairs[:, 0], pairs[:, 1]
+    saving = depot[i] + depot[j] - sub[i, j]
+    order = np.argsort(-saving, kind="stable")
+    # Khi có giới hạn số route, vẫn ghép các cặp có saving không dương
+    # nếu còn quá nhiều route
+    max_routes = problem.max_charge_times if problem.max_charge_times != -1 else n
+
+    weights = np.asarray(problem.package_weights, dtype=np.float64)
+    route_of = {int(node): index for index, node in enumerate(customers)}
+    routes = {index: [int(node)] for index, node in enumerate(customers)}
+    loads = {index: float(weights[node]) for index, node in enumerate(customers)}
+    for pair in order:
+        if saving[pair] <= 0 and len(routes) <= max_routes:
+            break
+        a, b = int(customers[i[pair]]), int(customers[j[pair]])
+        ra, rb = route_of[a], route_of[b]
+        if ra == rb or loads[ra] + loads[rb] > problem.capacity + 1e-9:
+            continue
+        A, B = routes[ra], routes[rb]
+        options = []
+        if A[-1] == a and B[0] == b:
+            options.append(A + B)
+        if B[-1] == b and A[0] == a:
+            options.append(B + A)
+        if A[-1] == a and B[-1] == b:
+            options.append(A + B[::-1])
+        if A[0] == a and B[0] == b:
+            options.append(A[::-1] + B)
+        for merged in options:
+            if problem.route_feasible(merged):
+                routes[ra] = merged
+                loads[ra] += loads.pop(rb)
+                del routes[rb]
+                for node in B:
+                    route_of[node] = ra
+                break
+    return list(routes.values())
+
+
+def _cheapest_insertion(problem: Problem, route: List[int], node: int) -> tuple:
+    """Vị trí chèn ``node`` vào ``route`` rẻ nhất: ``(quãng đường thêm, vị trí)``."""
+    padded = np.array([0] + route + [0], dtype=np.int64)
+    distances = problem.distance_matrix
+    delta = np.asarray(
+        distances[padded[:-1], node]
+        + distances[node, padded[1:]]
+        - distances[padded[:-1], padded[1:]],
+        dtype=np.float64,
+    )
+    position = int(np.argmin(delta))
+    return float(delta[position]), position
+
+
+def _eliminate_route(
+    problem: Problem, routes: List[List[int]], index: int, max_moves: int
+):
+    """Thử bỏ route ``index``: chèn khách của nó vào các route khác rồi sửa quá tải.
+
+    Khách được chèn (nặng trước) vào vị trí rẻ nhất giữ route hợp lệ; nếu không còn
+    chỗ thì chèn vào route ít quá tải nhất. Sau đó lặp chuyển (relocate) hoặc đổi
+    chỗ (swap) một khách của route quá tải với route khác sao cho tổng quá tải giảm
+    ngặt, tới khi hết quá tải.
+
+    Returns:
+        List[List[int]] | None: Các route mới (đều hợp lệ), hoặc
+        ``None`` nếu không sửa được.
+    """
+    weights = np.asarray(problem.package_weights, dtype=np.float64)
+    capacity = float(problem.capacity) + 1e-9
+    kept = [list(route) for r, route in enumerate(routes) if r != index]
+    if not kept:
+        return None
+    for node in sorted(routes[index], key=lambda node: -weights[node]):
+        best = None
+        for r, route in enumerate(kept):
+            delta, position = _cheapest_insertion(problem, route, node)
+            candidate = route[:position] + [node] + route[position:]
+            overload = max(weights[candidate].sum() - capacity, 0.0)
+            key = (
+                overload > 0 or not problem.route_feasible(candidate),
+                overload,
+                delta,
+            )
+            if best is None or key < best[0]:
+                best = (key, r, candidate)
+        kept[best[1]] = best[2]
+
+    for _ in range(max_moves):
+        loads = np.array([weights[route].sum() for route in kept])
+        overloaded = np.flatnonzero(loads > capacity)
+        if overloaded.size == 0:
+            break
+        best = None
+        for a in overloaded:
+            excess = loads[a] - capacity
+            for position_x, x in enumerate(kept[a]):
+                source = kept[a][:position_x] + kept[a][position_x + 1 :]
+                for b, target in enumerate(kept):
+                    if b == a:
+                        continue
+                    room = capacity - loads[b]
+                    # Đổi x lấy y (hoặc chuyển x khi y là None) từ route b sang route a
+                    for position_y, y in [(None, None)] + list(enumerate(target)):
+                        moved = weights[x] - (0.0 if y is None else weights[y])
+                        if moved <= 0 or moved > room:
+                            continue
+                        gain = min(moved, excess)
+                        if best is not None and gain <= best[0]:
+                            continue
+                        new_target = (
+                            target
+                            if y is None
+                            else target[:position_y] + target[position_y + 1 :]
+                        )
+                        new_target = list(new_target)
+                        _, position = _cheapest_insertion(problem, new_target, x)
+                        new_target = new_target[:position] + [x] + new_target[position:]
+                        if not problem.route_feasible(new_target):
+                            continue
+                        new_source = list(source)
+                        if y is not None:
+                            _, position = _cheapest_insertion(problem, new_source, y)
+                            new_source = (
+                                new_source[:position] + [y] + new_source[position:]
+                            )
+                        best = (gain, a, new_source, b, new_target)
+        if best is None:
+            return None
+        _, a, new_source, b, new_target = best
+        kept[a], kept[b] = new_source, new_target
+    if not all(problem.route_feasible(route) for route in kept):
+        return None
+    return kept
+
+
+def reduce_routes(
+    problem: Problem,
+    routes: List[List[int]],
+    max_routes: Optional[int] = None,
+    deadline: float = np.inf,
+) -> int:
+    """Giảm số route xuống ``max_routes`` (mặc định ``max_charge_times``).
+
+    Bỏ dần từng route; mỗi lần thử bỏ route có tải nhỏ nhất trước (xem
+    ``_eliminate_route``). Sửa ``routes`` tại chỗ và trả về số route đã bỏ; nếu không bỏ
+    được route nào nữa thì dừng, lời giải vẫn vượt giới hạn (``feasible=False``).
+    """
+    if max_routes is None:
+        max_routes = problem.max_charge_times
+    if max_routes == -1:
+        return 0
+    weights = np.asarray(problem.package_weights, dtype=np.float64)
+    routes[:] = [route for route in routes if route]
+    total = sum(weights[route].sum() for route in routes)
+    if np.ceil(total / problem.capacity - 1e-9) > max_routes:
+        return 0  # Tổng khối lượng cần nhiều route hơn giới hạn
+    eliminated = 0
+    while len(routes) > max_routes and time.perf_counter() < deadline:
+        order = np.argsort([weights[route].sum() for route in routes], kind="stable")
+        max_moves = 4 * sum(len(route) for route in routes)
+        for index in order:
+            reduced = _eliminate_route(problem, routes, int(index), max_moves)
+            if reduced is not None:
+                routes[:] = reduced
+                eliminated += 1
+                break
+        else:
+            break
+    return eliminated
+
+
+def two_opt(problem: Problem, routes: List[List[int]], deadline: float = np.inf) -> int:
+    """2-opt trong từng route (đảo đoạn), tại chỗ. Trả về số nước đi đã áp dụng."""
+    distances = problem.distance_matrix
+    moves = 0
+    for index, route in enumerate(routes):
+        while len(route) >= 2 and time.perf_counter() < deadline:
+            padded = np.array([0] + route + [0], dtype=np.int64)
+            u, v = padded[:-1], padded[1:]
+            # Đảo đoạn route[i..j] (index trong padded: i+1..j+1) thay cạnh
+            # (u_i, v_i), (u_j+1, v_j+1)
+            current = np.asarray(distances[u, v], dtype=np.float64)
+            delta = (
+                np.asarray(distances[u[:, None], u[None, :]], dtype=np.float64)
+                + np.asarray(distances[v[:, None], v[None, :]], dtype=np.float64)
+                - current[:, None]
+                - current[None, :]
+            )
+            delta = np.triu(delta, k=2)
+            candidates = np.flatnonzero(delta.ravel() < -IMPROVEMENT_EPS)
+            if candidates.size == 0:
+                break
+            applied = False
+            for flat in candidates[
+                np.argsort(delta.ravel()[candidates], kind="stable")
+            ]:
+                first, last = divmod(int(flat), delta.shape[1])
+                new_route = route[:first] + route[first:last][::-1] + route[last:]
+                if problem.route_feasible(new_route):
+                    route[:] = new_route
+                    moves += 1
+                    applied = True
+                    break
+            if not applied:
+                break
+        routes[index] = route
+    return moves
+
+
+def or_opt(
+    problem: Problem,
+    routes: List[List[int]],
+    max_segment: int = 3,
+    neighbours: int = OR_OPT_NEIGHBOURS,
+    deadline: float = np.inf,
+) -> int:
+    """Or-opt: chuyển một đoạn 1..``max_segment`` khách sang vị trí khác.
+
+    Đoạn có thể đảo chiều và chuyển trong cùng route hoặc sang route khác. Mỗi vòng
+    chọn nước đi tốt nhất cho từng đoạn trong các cạnh kề ``neighbours`` khách gần
+    nhất của hai đầu đoạn (vector hoá), rồi áp dụng tham lam các nước không chạm cùng
+    route. Sửa ``routes`` tại chỗ, trả về số nước đi đã áp dụng.
+    """
+    distances = problem.distance_matrix
+    weights = np.asarray(problem.package_weights, dtype=np.float64)
+    num_nodes = weights.shape[0]
+    nearest = _nearest_customers(problem, neighbours)
+    moves = 0
+    while time.perf_counter() < deadline:
+        routes[:] = [route for route in routes if route]
+        if not routes:
+            break
+        loads = np.array([weights[route].sum() for route in routes])
+        # Cạnh của lời giải: (u, v, route, vị trí chèn)
+        edge_u, edge_v, edge_route, edge_pos = [], [], [], []
+        seg_route, seg_start, seg_len, seg_a, seg_b, seg_p, seg_q, seg_w = (
+            [] for _ in range(8)
+        )
+        for r, route in enumerate(routes):
+            padded = [0] + route + [0]
+            m = len(route)
+            edge_u.extend(padded[:-1])
+            edge_v.extend(padded[1:])
+            edge_route.extend([r] * (m + 1))
+            edge_pos.extend(range(m + 1))
+            prefix = np.concatenate(([0.0], np.cumsum(weights[route])))
+            for length in range(1, min(max_segment, m) + 1):
+                for start in range(m - length + 1):
+                    seg_route.append(r)
+                    seg_start.append(start)
+                    seg_len.append(length)
+                    seg_a.append(route[start])
+                    seg_b.append(route[start + length - 1])
+                    seg_p.append(padded[start])
+                    seg_q.append(padded[start + length + 1])
+                    seg_w.append(prefix[start + length] - prefix[start])
+        edge_u, edge_v, edge_route, edge_pos = map(
+            np.asarray, (edge_u, edge_v, edge_route, edge_pos)
+        )
+        seg_route, seg_start, seg_len, seg_a, seg_b, seg_p, seg_q = map(
+            np.asarray, (seg_route, seg_start, seg_len, seg_a, seg_b, seg_p, seg_q)
+        )
+        seg_w = np.asarray(seg_w, dtype=np.float64)
+        removal = (
+            distances[seg_p, seg_a] + distances[seg_b, seg_q] - distances[seg_p, seg_q]
+        ).astype(np.float64)
+        edge_cost = np.asarray(distances[edge_u, edge_v], dtype=np.float64)
+
+        # Chỉ xét chèn vào cạnh kề với láng giềng gần của hai đầu đoạn
+        # (granular neighbourhood)
+        out_edge = np.zeros(num_nodes, dtype=np.int64)
+        in_edge = np.zeros(num_nodes, dtype=np.int64)
+        customer_edges = edge_u != 0
+        out_edge[edge_u[customer_edges]] = np.flatnonzero(customer_edges)
+        customer_edges = edge_v != 0
+        in_edge[edge_v[customer_edges]] = np.flatnonzero(customer_edges)
+        near = np.concatenate((nearest[seg_a], nearest[seg_b]), axis=1)
+        candidates = np.concatenate((out_edge[near], in_edge[near]), axis=1)
+
+        u, v = edge_u[candidates], edge_v[candidates]
+        a, b = seg_a[:, None], seg_b[:, None]
+        cost = edge_cost[candidates]
+        forward = np.asarray(distances[u, a] + distances[b, v], dtype=np.float64) - cost
+        backward = (
+            np.asarray(distances[u, b] + distances[a, v], dtype=np.float64) - cost
+        )
+        reverse = backward < forward
+        insert = np.where(reverse, backward, forward)
+        target_route = edge_route[candidates]
+        same = target_route == seg_route[:, None]
+        # Không chèn vào các cạnh đang chạm đoạn bị chuyển
+        position = edge_pos[candidates]
+        touching = (
+            same
+            & (position >= seg_start[:, None])
+            & (position <= (seg_start + seg_len)[:, None])
+        )
+        overload = ~same & (
+            loads[target_route] + seg_w[:, None] > problem.capacity + 1e-9
+        )
+        gain = removal[:, None] - insert
+        gain[touching | overload] = -np.inf
+        column = np.argmax(gain, axis=1)
+        rows = np.arange(column.size)
+        best_gain = gain[rows, column]
+        best_edge = candidates[rows, column]
+        best_reversed = reverse[rows, column]
+
+        improving = np.flatnonzero(best_gain > IMPROVEMENT_EPS)
+        if improving.size == 0:
+            break
+        touched = set()
+        applied = 0
+        for s in improving[np.argsort(-best_gain[improving], kind="stable")]:
+            source, target = int(seg_route[s]), int(edge_route[best_edge[s]])
+            if source in touched or target in touched:
+                continue
+            start, length = int(seg_start[s]), int(seg_len[s])
+            segment = routes[source][start : start + length]
+            if best_reversed[s]:
+                segment = segment[::-1]
+            remaining = routes[source][:start] + routes[source][start + length :]
+            position = int(edge_pos[best_edge[s]])
+            if source == target:
+                if position > start:
+                    position -= length
+                new_source = remaining[:position] + segment + remaining[position:]
+                if not problem.route_feasible(new_source):
+                    continue
+                routes[source] = new_source
+            else:
+                new_target = (
+                    routes[target][:position] + segment + routes[target][position:]
+                )
+                if not (
+                    problem.route_feasible(remaining)
+                    and problem.route_feasible(new_target)
+                ):
+                    continue
+                routes[source], routes[target] = remaining, new_target
+            touched.update((source, target))
+            applied += 1
+        if applied == 0:
+            break
+        moves += applied
+    routes[:] = [route for route in routes if route]
+    return moves
+
+
+def local_search(
+    problem: Problem,
+    routes: List[List[int]],
+    max_segment: int = 3,
+    time_limit: Optional[float] = None,
+) -> dict:
+    """Xen kẽ 2-opt và Or-opt tới khi không còn cải thiện hoặc hết ``time_limit`` giây.
+
+    Sửa ``routes`` tại chỗ và trả về số nước đi của từng loại.
+    """
+    deadline = _deadline(time_limit)
+    stats = {"two_opt_moves": 0, "or_opt_moves": 0, "rounds": 0}
+    while time.perf_counter() < deadline:
+        stats["rounds"] += 1
+        two = two_opt(problem, routes, deadline)
+        orr = or_opt(problem, routes, max_segment, deadline=deadline)
+        stats["two_opt_moves"] += two
+        stats["or_opt_moves"] += orr
+        if two + orr == 0:
+            break
+    return stats
+
+
+CONSTRUCTIONS = {
+    "nearest_neighbour": nearest_neighbour_routes,
+    "savings": savings_routes,
+}
+
+
+def solve(
+    problem_or_env: Union[Problem, object],
+    method: str = "savings",
+    improve: bool = True,
+    max_segment: int = 3,
+    time_limit: Optional[float] = None,
+) -> SolverResult:
+    """Giải instance bằng heuristic xây dựng, tuỳ chọn cải thiện bằng 2-opt/Or-opt.
+
+    Args:
+        problem_or_env: ``Problem`` hoặc ``DroneTspEnv`` đã ``reset``.
+        method (str, optional): ``"savings"`` hoặc
+            ``"nearest_neighbour"``. Defaults to "savings".
+        improve (bool, optional): Chạy tìm kiếm cục bộ sau khi
+            xây dựng. Defaults to True.
+        max_segment (int, optional): Độ dài đoạn tối đa của Or-opt. Defaults to 3.
+        time_limit (float, optional): Giới hạn thời gian cho tìm kiếm cục bộ (giây).
+
+    Returns:
+        SolverResult: ``actions`` phát lại được qua ``env.step``.
+    """
+    if method not in CONSTRUCTIONS:
+        raise ValueError(
+            f"Unknown method {method!r}, expected one of {sorted(CONSTRUCTIONS)}."
+        )
+    start = time.perf_counter()
+    problem = _as_problem(problem_or_env)
+    routes = CONSTRUCTIONS[method](problem)
+    construction_cost = problem.routes_cost(routes) if routes else 0.0
+    stats = {"method": method, "construction_cost": construction_cost}
+    if problem.max_charge_times != -1 and len(routes) > problem.max_charge_times:
+        stats["eliminated_routes"] = reduce_routes(
+            problem, routes, deadline=_deadline(time_limit)
+        )
+    if improve:
+        stats.update(local_search(problem, routes, max_segment, time_limit))
+    return make_result(problem, routes, start, **stats)
+
+
+def nearest_neighbour(problem_or_env, improve: bool = False, **kwargs) -> SolverResult:
+    """Lời giải nearest neighbour (mặc định không cải thiện)."""
+    return solve(problem_or_env, "nearest_neighbour", improve=improve, **kwargs)
+
+
+def savings(problem_or_env, improve: bool = False, **kwargs) -> SolverResult:
+    """Lời giải savings (Clarke–Wright) (mặc định không cải thiện)."""
+    return solve(problem_or_env, "savings", improve=improve, **kwargs)
@@ -0,0 +1,225 @@
+"""
+Dữ liệu bài toán và các quy tắc ràng buộc dùng chung cho các bộ giải.
+
+Lời giải được biểu diễn bằng danh sách route, mỗi route là dãy index khách hàng đi từ
+depot rồi quay về depot. Chuỗi action tương ứng là các route nối nhau, mỗi route kết
+thúc bằng ``0``; phát lại chuỗi này qua ``DroneTspEnv.step`` cho đúng tổng quãng đường
+và kết thúc bằng ``terminated``.
+
+Các quy tắc khớp với ``DroneTspEnv.step``:
+    - Sức chứa: ``remain_packages_weight`` trừ dần theo khối lượng
+      từng khách, không được âm.
+    - Năng lượng cạnh ``i -> j`` tính với khối lượng còn lại *sau* khi giao cho ``j``;
+      năng lượng tích luỹ sau mỗi khách phải nhỏ hơn ``max_energy``. Chặng về depot
+      không bị giới hạn và đặt lại năng lượng.
+    - Mỗi lần về depot tăng ``charge_count``; số route không vượt ``max_charge_times``.
+    - Trạm sạc không đặt lại năng lượng trong ``step`` nên các bộ giải không dùng tới.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from gymnasium_env.envs.energy import (
+    DEFAULT_ENERGY_MODEL,
+    EnergyModel,
+    round_half_even_2,
+)
+from gymnasium_env.envs.interfaces import NODE_TYPES
+
+
+@dataclass
+class Problem:
+    """
+    Dữ liệu tĩnh của một instance, index node trùng với action của env.
+
+    Attributes:
+        distance_matrix (np.ndarray): Ma trận khoảng cách (N, N) theo mét.
+        package_weights (np.ndarray): Khối lượng hàng của từng node (kg).
+        node_types (np.ndarray): Giá trị ``NODE_TYPES`` của từng node.
+        capacity (float): Sức chứa của drone (``package_weights`` của env).
+        max_energy (float): Giới hạn năng lượng; ``-1`` là không giới hạn.
+        max_charge_times (int): Số lần về depot tối đa; ``-1`` là không giới hạn.
+        speed (float): Vận tốc bay (m/s).
+        energy_model (EnergyModel): Mô hình năng lượng.
+    """
+
+    distance_matrix: np.ndarray
+    package_weights: np.ndarray
+    node_types: np.ndarray
+    capacity: float
+    max_energy: float = -1.0
+    max_charge_times: int = -1
+    speed: float = 15
+    energy_model: EnergyModel = field(default=DEFAULT_ENERGY_MODEL)
+
+    @classmethod
+    def from_env(cls, env) -> "Problem":
+        """Dữ liệu instance hiện tại của ``DroneTspEnv`` (đã ``reset``), không copy."""
+        env = env.unwrapped
+        nodes = env._nodes
+        return cls(
+            distance_matrix=env.distance_matrix,
+            package_weights=nodes.package_weights,
+            node_types=nodes.node_types,
+            capacity=env.max_packages_weight,
+            max_energy=env.max_energy,
+            max_charge_times=env.max_charge_times,
+            speed=env.drone_speed,
+            energy_model=env.energy_model,
+        )
+
+    @property
+    def customers(self) -> np.ndarray:
+        """Index các node khách hàng."""
+        return np.flatnonzero(np.asarray(self.node_types) == NODE_TYPES.customer.value)
+
+    @property
+    def energy_limited(self) -> bool:
+        return self.max_energy != -1
+
+    def route_loads(self, route) -> np.ndarray:
+        """Khối lượng còn lại sau mỗi khách của route, trừ dần như ``step``."""
+        weights = self.package_weights[np.asarray(route, dtype=np.int64)]
+        return np.subtract.accumulate(
+            np.concatenate(([float(self.capacity)], weights))
+        )[1:]
+
+    def route_energies(self, route, loads: Optional[np.ndarray] = None) -> np.ndarray:
+        """Năng lượng tích luỹ sau mỗi khách của route (chưa gồm chặng về depot)."""
+        route = np.asarray(route, dtype=np.int64)
+        if loads is None:
+            loads = self.route_loads(route)
+        previous = np.concatenate(([0], route[:-1]))
+        distances = np.asarray(self.distance_matrix[previous, route], dtype=np.float64)
+        energies = round_half_even_2(
+            self.energy_model.payload_factor(np.maximum(loads, 0.0))
+            * ((distances / 100.0) / self.speed)
+        )
+        return np.cumsum(energies)
+
+    def route_feasible(self, route) -> bool:
+        """Route có thoả sức chứa và giới hạn năng lượng hay không."""
+        if len(route) == 0:
+            return True
+        loads = self.route_loads(route)
+        if loads[-1] < 0:
+            return False
+        if not self.energy_limited:
+            return True
+        return bool(np.all(self.route_energies(route, loads) < self.max_energy))
+
+    def route_cost(self, route) -> float:
+        """Quãng đường của route gồm cả chặng đi và về depot."""
+        if len(route) == 0:
+            return 0.0
+        padded = np.concatenate(([0], np.asarray(route, dtype=np.int64), [0]))
+        return float(
+            np.asarray(
+                self.distance_matrix[padded[:-1], padded[1:]], dtype=np.float64
+            ).sum()
+        )
+
+    def routes_cost(self, routes) -> float:
+        """Tổng quãng đường của lời giải, cộng dồn theo thứ tự action như ``step``."""
+        path = np.concatenate(([0], routes_to_actions(routes)))
+        distances = np.asarray(
+            self.distance_matrix[path[:-1], path[1:]], dtype=np.float64
+        )
+        return float(np.add.accumulate(distances)[-1])
+
+    def routes_feasible(self, routes) -> bool:
+        """Lời giải hợp lệ: mọi khách được giao đúng một lần và mọi ràng buộc thoả."""
+        non_empty = [route for route in routes if len(route)]
+        if self.max_charge_times != -1 and len(non_empty) > self.max_charge_times:
+            return False
+        visited = np.concatenate(
+            [np.zeros(0, dtype=np.int64)]
+            + [np.asarray(route, dtype=np.int64) for route in non_empty]
+        )
+        if visited.size != self.customers.size or not np.array_equal(
+            np.sort(visited), self.customers
+        ):
+            return False
+        return all(self.route_feasible(route) for route in non_empty)
+
+
+@dataclass
+class SolverResult:
+    """
+    Kết quả của một bộ giải.
+
+    Attributes:
+        actions (np.ndarray): Chuỗi action phát lại được qua
+            ``step``, kết thúc bằng ``0``.
+        routes (List[np.ndarray]): Các route (không gồm depot).
+        cost (float): Tổng quãng đường (m), bằng tổng reward khi phát lại.
+        feasible (bool): Lời giải thoả mọi ràng buộc của env.
+        solve_time (float): Thời gian giải (giây).
+        stats (dict): Thông tin thêm của bộ giải (số vòng cải thiện, ...).
+    """
+
+    actions: np.ndarray
+    routes: List[np.ndarray]
+    cost: float
+    feasible: bool
+    solve_time: float = 0.0
+    stats: dict = field(default_factory=dict)
+
+
+def routes_to_actions(routes) -> np.ndarray:
+    """Nối các route thành chuỗi action, mỗi route kết thúc bằng ``0``."""
+    parts = []
+    for route in routes:
+        if len(route):
+            parts.append(np.asarray(route, dtype=np.int64))
+            parts.append(np.zeros(1, dtype=np.int64))
+    return np.concatenate(parts) if parts else np.zeros(1, dtype=np.int64)
+
+
+def actions_to_routes(actions) -> List[np.ndarray]:
+    """Tách chuỗi action thành các route theo các lần về depot."""
+    actions = np.asarray(actions, dtype=np.int64)
+    splits = np.flatnonzero(actions == 0)
+    routes, start = [], 0
+    for stop in splits:
+        if stop > start:
+            routes.append(actions[start:stop])
+        start = stop + 1
+    if start < actions.size:
+        routes.append(actions[start:])
+    return routes
+
+
+def make_result(problem: Problem, routes, start_time: float, **stats) -> SolverResult:
+    """Đóng gói route thành ``SolverResult`` (tính lại chi phí và tính hợp lệ)."""
+    routes = [np.asarray(route, dtype=np.int64) for route in routes if len(route)]
+    return SolverResult(
+        actions=routes_to_actions(routes),
+        routes=routes,
+        cost=problem.routes_cost(routes),
+        feasible=problem.routes_feasible(routes),
+        solve_time=time.perf_counter() - start_time,
+        stats=stats,
+    )
+
+
+def replay(env, actions) -> dict:
+    """Phát lại chuỗi action trên env (đã ``reset``).
+
+    Trả về tổng reward cùng trạng thái kết thúc.
+    """
+    total_reward, terminated, truncated, steps = 0.0, False, False, 0
+    for action in actions:
+        _, reward, terminated, truncated, _ = env.step(int(action))
+        total_reward += reward
+        steps += 1
+        if terminated or truncated:
+            break
+    return {
+        "total_reward": total_reward,
+        "terminated": terminated,
+        "truncated": truncated,
+        "steps": steps,
+    }
@@ -0,0 +1,244 @@
+"""
+Đo thời gian từng pha của ``DroneTspEnv.step``/``reset`` (bật khi cần,
+không tốn chi phí khi tắt).
+
+``PhaseProfiler`` không sửa mã env: khi bọc, nó gán các hàm đo thời gian làm thuộc tính
+của chính instance env (ghi đè method của lớp), và gỡ bỏ khi ``close``/``uninstall``.
+Env không bọc chạy đúng mã gốc, không có bất kỳ lệnh đo nào.
+
+Các pha:
+    step, reset                Tổng thời gian
+    step.self, reset.self      Phần còn lại sau khi trừ các pha con (tra khoảng cách,
+                               cộng dồn, ...)
+    init_nodes                 Sinh/nạp instance (gồm cả ma trận khoảng cách)
+    energy                     ``EnergyTable.edge`` trong ``step``
+    visit_order                ``NodeStorage.set_visited_order``
+    action_mask                ``_update_action_mask``
+    route                      ``_append_route``
+    get_obs, get_info          ``_get_obs``, ``_get_info``
+    render                     ``_render_frame``
+"""
+import json
+import time
+
+import gymnasium as gym
+
+# Biên histogram theo luỹ thừa 2 của nano giây: bin 0 là < 2**MIN_BIT ns,
+# bin cuối >= 2**MAX_BIT ns
+MIN_BIT, MAX_BIT = 6, 31
+NUM_BINS = MAX_BIT - MIN_BIT + 2
+
+ENV_PHASES = {
+    "step": "step",
+    "reset": "reset",
+    "init_nodes": "_DroneTspEnv__init_nodes",
+    "action_mask": "_update_action_mask",
+    "route": "_append_route",
+    "get_obs": "_get_obs",
+    "get_info": "_get_info",
+    "render": "_render_frame",
+}
+# Pha cần ghi thêm thời gian riêng (không tính các pha con)
+SELF_TIME_PHASES = ("step", "reset")
+
+
+def bin_edges_ns() -> list:
+    """Biên trên (ns) của các bin histogram, bin cuối không giới hạn."""
+    return [2**bit for bit in range(MIN_BIT, MAX_BIT + 1)] + [None]
+
+
+class PhaseStats:
+    """Thống kê thời gian của một pha: số lần, tổng, min/max và histogram log2."""
+
+    __slots__ = ("count", "total_ns", "min_ns", "max_ns", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.histogram = [0] * NUM_BINS
+
+    def record(self, elapsed_ns: int):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if self.min_ns is None or elapsed_ns < self.min_ns:
+            self.min_ns = elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.histogram[
+            min(max(elapsed_ns.bit_length() - MIN_BIT, 0), NUM_BINS - 1)
+        ] += 1
+
+    def percentile_ns(self, q: float):
+        """Phân vị ``q`` (0..100) xấp xỉ bằng biên trên của bin chứa nó."""
+        if self.count == 0:
+            return None
+        target, running = q / 100.0 * self.count, 0
+        for index, count in enumerate(self.histogram):
+            running += count
+            if running >= target:
+                return min(2 ** (MIN_BIT + index), self.max_ns)
+        return self.max_ns
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_us": self.total_ns / 1e3,
+            "mean_us": self.total_ns / self.count / 1e3 if self.count else None,
+            "min_us": None if self.min_ns is None else self.min_ns / 1e3,
+            "max_us": self.max_ns / 1e3,
+            "p50_us": None if self.count == 0 else self.percentile_ns(50) / 1e3,
+            "p90_us": None if self.count == 0 else self.percentile_ns(90) / 1e3,
+            "p99_us": None if self.count == 0 else self.percentile_ns(99) / 1e3,
+            "histogram": list(self.histogram),
+        }
+
+
+class PhaseProfiler(gym.Wrapper):
+    """
+    Wrapper đo thời gian từng pha của ``DroneTspEnv``.
+
+    Example:
+        env = PhaseProfiler(gym.make("gymnasium_env/DroneTsp-v1"))
+        ... chạy vài episode ...
+        print(env.stats()["phases"]["action_mask"]["mean_us"])
+        env.export_jsonl("profile.jsonl")
+    """
+
+    def __init__(self, env: gym.Env):
+        super().__init__(env)
+        self.phases = {}
+        self.counters = {
+            "instances": 0,
+            "generation_retries": 0,
+            "max_generation_retries": 0,
+        }
+        self._stack = []
+        # (đối tượng, tên thuộc tính) đã gán hàm đo trên env, để gỡ bỏ sau này
+        self._installed = []
+        # Như trên nhưng cho bảng năng lượng/kho node của instance hiện tại;
+        # instance cũ được gỡ khi sang instance mới để wrapper không giữ lại các đối
+        # tượng (và ma trận O(N²)) đó
+        self._instance_patches = []
+        self.install()
+
+    def _timed(self, name: str, func):
+        stats = self.phases.setdefault(name, PhaseStats())
+        self_stats = (
+            self.phases.setdefault(f"{name}.self", PhaseStats())
+            if name in SELF_TIME_PHASES
+            else None
+        )
+        stack = self._stack
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            stack.append(0)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                children = stack.pop()
+                stats.record(elapsed)
+                if self_stats is not None:
+                    self_stats.record(elapsed - children)
+                if stack:
+                    stack[-1] += elapsed
+
+        return timed
+
+    def _patch(self, obj, attribute: str, name: str, installed: list):
+        if attribute in vars(obj):
+            return  # Đã gán trên đối tượng này
+        setattr(obj, attribute, self._timed(name, getattr(obj, attribute)))
+        installed.append((obj, attribute))
+
+    @staticmethod
+    def _unpatch(installed: list, keep=()):
+        """Gỡ hàm đo khỏi các đối tượng trong ``installed``, trừ ``keep``."""
+        kept = []
+        while installed:
+            obj, attribute = installed.pop()
+            if any(obj is other for other in keep):
+                kept.append((obj, attribute))
+            elif attribute in vars(obj):
+                delattr(obj, attribute)
+        installed.extend(reversed(kept))
+
+    def _patch_instance_objects(self):
+        """Gán hàm đo cho đối tượng tạo theo instance (bảng năng lượng, kho node)."""
+        env = self.env.unwrapped
+        targets = [
+            (env._energy_table, "edge", "energy"),
+            (env._nodes, "set_visited_order", "visit_order"),
+        ]
+        targets = [target for target in targets if target[0] is not None]
+        self._unpatch(self._instance_patches, keep=[obj for obj, _, _ in targets])
+        for obj, attribute, name in targets:
+            self._patch(obj, attribute, name, self._instance_patches)
+
+    def install(self):
+        """Gán các hàm đo lên env; gọi lại sau ``uninstall`` để bật lại."""
+        env = self.env.unwrapped
+        for name, attribute in ENV_PHASES.items():
+            if name == "init_nodes":
+                continue
+            self._patch(env, attribute, name, self._installed)
+
+        init_nodes = self._timed("init_nodes", getattr(env, ENV_PHASES["init_nodes"]))
+        counters = self.counters
+
+        def init_nodes_and_patch(*args, **kwargs):
+            result = init_nodes(*args, **kwargs)
+            counters["instances"] += 1
+            counters["generation_retries"] += env.generation_retries
+            counters["max_generation_retries"] = max(
+                counters["max_generation_retries"], env.generation_retries
+            )
+            self._patch_instance_objects()
+            return result
+
+        if ENV_PHASES["init_nodes"] not in vars(env):
+            setattr(env, ENV_PHASES["init_nodes"], init_nodes_and_patch)
+            self._installed.append((env, ENV_PHASES["init_nodes"]))
+        self._patch_instance_objects()
+
+    def uninstall(self):
+        """Gỡ mọi hàm đo, env trở lại chạy mã gốc."""
+        self._unpatch(self._instance_patches)
+        self._unpatch(self._installed)
+
+    def reset_stats(self):
+        """Xoá toàn bộ thống kê đã ghi."""
+        for stats in self.phases.values():
+            stats.__init__()
+        for key in self.counters:
+            self.counters[key] = 0
+
+    def stats(self) -> dict:
+        """Thống kê: ``phases`` (tên pha -> tóm tắt kèm histogram) và ``counters``."""
+        return {
+            "phases": {name: stats.summary() for name, stats in self.phases.items()},
+            "counters": dict(self.counters),
+            "bin_edges_ns": bin_edges_ns(),
+        }
+
+    def export_jsonl(self, file_path: str, **extra):
+        """Ghi thêm mỗi pha một dòng JSON, kèm thời điểm và các trường ``extra``."""
+        timestamp = time.time()
+        with open(file_path, "a", encoding="utf-8") as f:
+            for name, stats in self.phases.items():
+                record = {"time": timestamp, "phase": name, **extra, **stats.summary()}
+                f.write(json.dumps(record) + "\n")
+            f.write(
+                json.dumps(
+                    {"time": timestamp, "phase": "counters", **extra, **self.counters}
+                )
+                + "\n"
+            )
+
+    def close(self):
+        self.uninstall()
+        return super().close()
@@ -0,0 +1,464 @@
+"""
+Ghi lại mọi transition của ``DroneTspEnv`` dưới dạng các chunk nén, chỉ ghi thêm, để
+dùng cho offline RL và gỡ lỗi mà không phải pickle ``observation``/``info``.
+
+Cấu trúc thư mục:
+    meta.json                 Phiên bản định dạng và tham số env
+    chunk_000000.npz, ...     Các chunk nén (``np.savez_compressed``), mỗi chunk gồm
+                              trọn vẹn một nhóm episode và tự chứa dữ liệu tĩnh của
+                              các instance nó dùng
+
+Mỗi chunk:
+    instance_coords           (I, N, 2) float64, ``[lon, lat]``
+    instance_node_types       (I, N) int8
+    instance_package_weights  (I, N) float64
+    episode_instance          (E,) int64, index instance trong chunk
+    episode_seed              (E,) int64, seed truyền cho ``reset`` (-1 nếu không có)
+    episode_instance_id       (E,) int64, ``instance_id`` của env (-1 nếu sinh mới)
+    episode_offsets           (E + 1,) int64, các bước của episode ``e`` là
+                              ``[offsets[e], offsets[e + 1])``
+    action, node              (S,) int32, action truyền cho ``step`` và node toàn cục
+                              tương ứng
+    distance, energy          (S,) float64, quãng đường và năng lượng của cạnh vừa đi
+    terminated, truncated     (S,) bool
+
+``TrajectoryRecorder`` chỉ ghi vài số vô hướng mỗi bước; việc dựng mảng, nén và
+ghi file do một thread nền đảm nhận. ``TrajectoryReader`` đọc từng chunk khi
+cần và dựng lại observation mặc định của từng bước từ dữ liệu tĩnh cùng chuỗi
+node, không chạy lại mô phỏng.
+"""
+import glob
+import json
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Iterator
+
+import gymnasium as gym
+import numpy as np
+
+from gymnasium_env.envs.interfaces import NODE_TYPES
+from gymnasium_env.envs.node_storage import NodeStorage
+
+TRAJECTORY_VERSION = 1
+_META_FILE = "meta.json"
+_CHUNK_PATTERN = "chunk_{:06d}.npz"
+# Tham số env lưu vào meta.json (nếu env có)
+_META_ENV_FIELDS = (
+    "num_customer_nodes",
+    "num_charge_nodes",
+    "max_packages_weight",
+    "max_energy",
+    "max_charge_times",
+    "drone_speed",
+    "action_mode",
+    "num_candidates",
+)
+
+
+class _EpisodeBuffer:
+    """Các bước của một episode đang ghi, lưu bằng list Python để ``append`` rẻ."""
+
+    __slots__ = (
+        "instance",
+        "seed",
+        "instance_id",
+        "action",
+        "node",
+        "distance",
+        "energy",
+        "terminated",
+        "truncated",
+    )
+
+    def __init__(self, instance: int, seed: int, instance_id: int):
+        self.instance = instance
+        self.seed = seed
+        self.instance_id = instance_id
+        self.action, self.node, self.distance, self.energy = [], [], [], []
+        self.terminated, self.truncated = [], []
+
+    def __len__(self) -> int:
+        return len(self.action)
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Wrapper ghi trajectory ra thư mục ``path`` theo từng chunk nén.
+
+    Chunk được gửi cho thread nền khi số bước tích luỹ đạt ``chunk_steps`` (chỉ ở ranh
+    giới episode) và khi ``flush``/``close``. Episode đang dở khi ``reset``/``close``
+    vẫn được ghi (bước cuối không có cờ kết thúc); episode chưa có bước nào bị bỏ qua.
+
+    Attributes:
+        episodes_recorded (int): Số episode đã đưa vào chunk.
+        steps_recorded (int): Số bước đã đưa vào chunk.
+        chunks_written (int): Số chunk đã ghi xong ra đĩa.
+        bytes_written (int): Tổng kích thước các chunk đã ghi.
+    """
+
+    def __init__(
+        self,
+        env: gym.Env,
+        path: str,
+        chunk_steps: int = 65536,
+        max_pending_chunks: int = 4,
+    ):
+        """
+        Args:
+            env (gym.Env): Env ``DroneTspEnv`` (có thể đã bọc).
+            path (str): Thư mục đích; phải rỗng hoặc chưa tồn tại.
+            chunk_steps (int, optional): Số bước tối thiểu mỗi chunk. Defaults to 65536.
+            max_pending_chunks (int, optional): Số chunk tối đa chờ ghi; khi đầy
+                ``step`` phải chờ thread nền. Defaults to 4.
+        """
+        super().__init__(env)
+        self.path = os.fspath(path)
+        os.makedirs(self.path, exist_ok=True)
+        if glob.glob(os.path.join(self.path, "chunk_*.npz")):
+            raise ValueError(
+                f"Trajectory directory {self.path!r} already contains chunks."
+            )
+        self.chunk_steps = chunk_steps
+        base = env.unwrapped
+        meta = {"version": TRAJECTORY_VERSION, "num_nodes": int(base._is_customer.size)}
+        meta.update(
+            {
+                field: getattr(base, field)
+                for field in _META_ENV_FIELDS
+                if hasattr(base, field)
+            }
+        )
+        with open(os.path.join(self.path, _META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        self.episodes_recorded = 0
+        self.steps_recorded = 0
+        self.chunks_written = 0
+        self.bytes_written = 0
+        self._episodes = []
+        self._chunk_step_count = 0
+        self._current = None
+        # Kho node của instance cuối cùng và index của nó trong chunk đang gom
+        self._instances = []
+        self._last_nodes = None
+        self._last_instance = -1
+        self._num_chunks = 0
+        self._error = None
+        self._closed = False
+        self._queue = queue.Queue(maxsize=max_pending_chunks)
+        self._thread = threading.Thread(
+            target=self._run, name="drone-tsp-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def reset(self, *, seed=None, options=None):
+        self._finish_episode()
+        observation, info = self.env.reset(seed=seed, options=options)
+        base = self.env.unwrapped
+        if base._nodes is not self._last_nodes:
+            self._last_nodes = base._nodes
+            self._last_instance = -1
+        if self._last_instance < 0:
+            self._instances.append(base._nodes)
+            self._last_instance = len(self._instances) - 1
+        self._current = _EpisodeBuffer(
+            self._last_instance,
+            -1 if seed is None else int(seed),
+            int(getattr(base, "instance_id", -1)),
+        )
+        return observation, info
+
+    def step(self, action):
+        observation, reward, terminated, truncated, info = self.env.step(action)
+        base = self.env.unwrapped
+        episode = self._current
+        if episode is not None:
+            episode.action.append(int(action))
+            episode.node.append(int(base.prev_position))
+            episode.distance.append(float(reward))
+            episode.energy.append(float(base._energy_buffer[base._history_length - 1]))
+            episode.terminated.append(bool(terminated))
+            episode.truncated.append(bool(truncated))
+            if terminated or truncated:
+                self._finish_episode()
+        return observation, reward, terminated, truncated, info
+
+    def _finish_episode(self):
+        """Đưa episode hiện tại vào chunk đang gom, gửi chunk khi đủ số bước."""
+        episode, self._current = self._current, None
+        if episode is None or len(episode) == 0:
+            return
+        self._episodes.append(episode)
+        self._chunk_step_count += len(episode)
+        self.episodes_recorded += 1
+        self.steps_recorded += len(episode)
+        if self._chunk_step_count >= self.chunk_steps:
+            self._submit_chunk()
+
+    def _submit_chunk(self):
+        """Gửi các episode đã gom cho thread nền.
+
+        Instance của episode đang dở được giữ lại cho chunk sau.
+        """
+        if self._error is not None:
+            raise RuntimeError("Background trajectory writer failed.") from self._error
+        if not self._episodes:
+            return
+        file_path = os.path.join(self.path, _CHUNK_PATTERN.format(self._num_chunks))
+        self._queue.put((file_path, self._episodes, self._instances))
+        self._num_chunks += 1
+        self._episodes, self._chunk_step_count = [], 0
+        if self._current is not None:
+            self._instances = [self._instances[self._current.instance]]
+            self._current.instance = self._last_instance = 0
+        else:
+            self._instances, self._last_instance = [], -1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    size = _write_chunk(*item)
+                    self.chunks_written += 1
+                    self.bytes_written += size
+            except Exception as error:  # pylint: disable=broad-except
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Gửi các episode đã xong và chờ mọi chunk được ghi ra đĩa.
+
+        Episode đang dở được ghi ở chunk sau.
+        """
+        self._submit_chunk()
+        self._queue.join()
+        if self._error is not None:
+            raise RuntimeError("Background trajectory writer failed.") from self._error
+
+    def close(self):
+        """Ghi nốt episode đang dở và các chunk còn chờ, dừng thread rồi đóng env."""
+        if not self._closed:
+            self._closed = True
+            self._finish_episode()
+            self._submit_chunk()
+            self._queue.put(None)
+            self._thread.join()
+        super().close()
+        if self._error is not None:
+            raise RuntimeError("Background trajectory writer failed.") from self._error
+
+
+def _write_chunk(file_path: str, episodes: list, instances: list) -> int:
+    """Dựng mảng của một chunk, nén, ghi ra file tạm rồi đổi tên. Trả về số byte."""
+    used = sorted({episode.instance for episode in episodes})
+    remap = np.full(len(instances), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    lengths = np.array([len(episode) for episode in episodes], dtype=np.int64)
+    arrays = {
+        "instance_coords": np.stack([instances[i].coords for i in used]),
+        "instance_node_types": np.stack([instances[i].node_types for i in used]).astype(
+            np.int8
+        ),
+        "instance_package_weights": np.stack(
+            [instances[i].package_weights for i in used]
+        ),
+        "episode_instance": remap[[episode.instance for episode in episodes]],
+        "episode_seed": np.array(
+            [episode.seed for episode in episodes], dtype=np.int64
+        ),
+        "episode_instance_id": np.array(
+            [episode.instance_id for episode in episodes], dtype=np.int64
+        ),
+        "episode_offsets": np.concatenate(([0], np.cumsum(lengths))),
+    }
+    for field, dtype in (
+        ("action", np.int32),
+        ("node", np.int32),
+        ("distance", np.float64),
+        ("energy", np.float64),
+        ("terminated", bool),
+        ("truncated", bool),
+    ):
+        arrays[field] = np.fromiter(
+            (value for episode in episodes for value in getattr(episode, field)),
+            dtype=dtype,
+            count=int(lengths.sum()),
+        )
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, file_path)
+    return os.path.getsize(file_path)
+
+
+@dataclass
+class RecordedEpisode:
+    """
+    Một episode đã ghi; observation được dựng lại khi cần.
+
+    Attributes:
+        coords, node_types, package_weights: Dữ liệu tĩnh của instance.
+        seed (int): Seed của ``reset`` (-1 nếu không có).
+        instance_id (int): ``instance_id`` của env (-1 nếu sinh mới).
+        action, node (np.ndarray): Action đã gửi và node toàn
+            cục tương ứng của từng bước.
+        distance, energy (np.ndarray): Quãng đường và năng lượng của từng cạnh.
+        terminated, truncated (np.ndarray): Cờ kết thúc của từng bước.
+    """
+
+    coords: np.ndarray
+    node_types: np.ndarray
+    package_weights: np.ndarray
+    seed: int
+    instance_id: int
+    action: np.ndarray
+    node: np.ndarray
+    distance: np.ndarray
+    energy: np.ndarray
+    terminated: np.ndarray
+    truncated: np.ndarray
+
+    def __len__(self) -> int:
+        return self.action.shape[0]
+
+    @property
+    def route(self) -> np.ndarray:
+        """Lộ trình như ``env.route``: depot rồi các node đã đi."""
+        return np.concatenate(([0], self.node)).astype(np.int64)
+
+    @property
+    def total_distance(self) -> float:
+        """Tổng quãng đường, cộng dồn tuần tự như ``step``."""
+        return float(np.add.accumulate(self.distance)[-1]) if len(self) else 0.0
+
+    def observations(self) -> Iterator[dict]:
+        """
+        Dựng lại observation mặc định (trừ ``action_mask``) sau
+        ``reset`` và sau từng bước.
+
+        ``action_mask`` phụ thuộc cấu hình env (năng lượng, sức chứa, chế độ
+        action) nên không được dựng lại. Các giá trị tích luỹ được cộng theo
+        đúng thứ tự của ``step``.
+        Yields:
+            dict: ``nodes``, ``total_distance``,
+                ``energy_consumption``, ``charge_count``.
+        """
+        nodes = NodeStorage(self.coords, self.node_types, self.package_weights)
+        total_distance, total_energy, charge_count = 0, 0, 0
+        yield _observation(nodes, total_distance, total_energy, charge_count)
+        for node, distance, energy in zip(
+            self.node.tolist(), self.distance.tolist(), self.energy.tolist()
+        ):
+            if node > 0 and nodes.node_types[node] != NODE_TYPES.charging_station.value:
+                nodes.set_visited_order(node, nodes.visited_count + 1)
+            total_distance += distance
+            total_energy += energy
+            if node == 0:
+                charge_count += 1
+                total_energy = 0
+            yield _observation(nodes, total_distance, total_energy, charge_count)
+
+    def observation(self, step: int) -> dict:
+        """Observation sau bước thứ ``step`` (0 là sau ``reset``)."""
+        if not 0 <= step <= len(self):
+            raise IndexError(f"Step {step} out of range [0, {len(self)}].")
+        for index, observation in enumerate(self.observations()):
+            if index == step:
+                return observation
+
+
+def _observation(
+    nodes: NodeStorage, total_distance, total_energy, charge_count
+) -> dict:
+    return {
+        "nodes": nodes.table.copy(),
+        "total_distance": np.array([total_distance], dtype=np.float32),
+        "energy_consumption": np.array([total_energy], dtype=np.float32),
+        "charge_count": np.array([charge_count], dtype=np.int16),
+    }
+
+
+class TrajectoryReader:
+    """
+    Đọc thư mục trajectory do ``TrajectoryRecorder`` ghi, từng chunk một khi cần.
+
+    Attributes:
+        meta (dict): Nội dung ``meta.json``.
+        chunk_paths (list): Đường dẫn các chunk đã ghi xong, theo thứ tự.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Thư mục trajectory.
+        Raises:
+            ValueError: Nếu phiên bản định dạng không được hỗ trợ.
+        """
+        self.path = os.fspath(path)
+        with open(os.path.join(self.path, _META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != TRAJECTORY_VERSION:
+            raise ValueError(
+                f"Unsupported trajectory version: {self.meta.get('version')}"
+            )
+        self.chunk_paths = sorted(glob.glob(os.path.join(self.path, "chunk_*.npz")))
+        self._chunk_sizes = None
+
+    def _load_chunk(self, index: int) -> dict:
+        with np.load(self.chunk_paths[index]) as chunk:
+            return {key: chunk[key] for key in chunk.files}
+
+    @property
+    def chunk_sizes(self) -> np.ndarray:
+        """Số episode của từng chunk (chỉ đọc mảng ``episode_seed`` của mỗi chunk)."""
+        if self._chunk_sizes is None:
+            sizes = []
+            for chunk_path in self.chunk_paths:
+                with np.load(chunk_path) as chunk:
+                    sizes.append(chunk["episode_seed"].shape[0])
+            self._chunk_sizes = np.array(sizes, dtype=np.int64)
+        return self._chunk_sizes
+
+    def __len__(self) -> int:
+        return int(self.chunk_sizes.sum())
+
+    def iter_chunk(self, index: int) -> Iterator[RecordedEpisode]:
+        """Các episode của chunk thứ ``index``."""
+        chunk = self._load_chunk(index)
+        offsets = chunk["episode_offsets"]
+        for episode in range(offsets.shape[0] - 1):
+            instance = chunk["episode_instance"][episode]
+            steps = slice(offsets[episode], offsets[episode + 1])
+            yield RecordedEpisode(
+                coords=chunk["instance_coords"][instance],
+                node_types=chunk["instance_node_types"][instance],
+                package_weights=chunk["instance_package_weights"][instance],
+                seed=int(chunk["episode_seed"][episode]),
+                instance_id=int(chunk["episode_instance_id"][episode]),
+                action=chunk["action"][steps],
+                node=chunk["node"][steps],
+                distance=chunk["distance"][steps],
+                energy=chunk["energy"][steps],
+                terminated=chunk["terminated"][steps],
+                truncated=chunk["truncated"][steps],
+            )
+
+    def __iter__(self) -> Iterator[RecordedEpisode]:
+        for index in range(len(self.chunk_paths)):
+            yield from self.iter_chunk(index)
+
+    def episode(self, index: int) -> RecordedEpisode:
+        """Episode thứ ``index`` theo thứ tự ghi; chỉ nạp chunk chứa nó."""
+        if not 0 <= index < len(self):
+            raise IndexError(f"Episode {index} out of range [0, {len(self)}).")
+        chunk = int(np.searchsorted(np.cumsum(self.chunk_sizes), index, side="right"))
+        start = int(self.chunk_sizes[:chunk].sum())
+        for position, episode in enumerate(self.iter_chunk(chunk)):
+            if position == index - start:
+                return episode
@@ -1,5 +1,5 @@
 import gymnasium
-import gymnasium_env  # Cái này không dùng nhưng bỏ đi thì bị lỗi. Magical.
+import gymnasium_env  # noqa: F401 Cái này không dùng nhưng bỏ đi thì bị lỗi. Magical.
 from time import sleep
 from visualize_tools import visualize_energy_status
 import re
@@ -54,7 +54,8 @@ def visualize_nodes_status_with_metrics(observation, info):
     # Header
     header = (
         f"\n{'Node':<{w_node}} | {'Lon':<{w_lon}} | {'Lat':<{w_lat}} | "
-        f"{'Type':<{w_type}} | {'Weight (kg)':<{w_weight}} | {'Visited Order':<{w_visit}} | "
+        f"{'Type':<{w_type}} | {'Weight (kg)':<{w_weight}} | "
+        f"{'Visited Order':<{w_visit}} | "
         f"{'Status':<{w_status}} | {'Energy':<{w_energy}} | {'Distance':<{w_distance}}"
     )
     print(header)
@@ -103,8 +104,10 @@ def visualize_nodes_status_with_metrics(observation, info):
         status_cell = f"{status}{pad}"
 
         line = (
-            f"{idx:<{w_node}} | {lon:<{w_lon}.5f} | {lat:<{w_lat}.5f} | {node_type_str:<{w_type}} | "
-            f"{package_weight:<{w_weight}.2f} | {visited_order:<{w_visit}} | {status_cell} | {energy_str:<{w_energy}} | {distance_str:<{w_distance}}"
+            f"{idx:<{w_node}} | {lon:<{w_lon}.5f} | {lat:<{w_lat}.5f} | "
+            f"{node_type_str:<{w_type}} | {package_weight:<{w_weight}.2f} | "
+            f"{visited_order:<{w_visit}} | {status_cell} | "
+            f"{energy_str:<{w_energy}} | {distance_str:<{w_distance}}"
         )
         print(line)
 
@@ -112,13 +115,19 @@ def visualize_nodes_status_with_metrics(observation, info):
 if __name__ == "__main__":
     env = gymnasium.make(
         id="gymnasium_env/DroneTsp-v1",
-        render_mode='human',
+        render_mode="human",
         num_customer_nodes=5,
         num_charge_nodes=0,
         package_weights=40,
         min_package_weight=5,
         max_package_weight=10,
-        max_energy=1000
+        max_energy=1000,
+        # Các khoá info mà phần hiển thị bên dưới sử dụng
+        info_keys=(
+            "distance_histories",
+            "energy_consumption_histories",
+            "remain_packages_weight",
+        ),
     )
     observation, info = env.reset()
 
@@ -127,7 +136,7 @@ if __name__ == "__main__":
         action = env.unwrapped._sample()
         observation, reward, terminated, truncated, info = env.step(action=action)
         done = terminated or truncated
-        print('='*42, 'Action:', action, '='*42)
+        print("=" * 42, "Action:", action, "=" * 42)
         visualize_nodes_status_with_metrics(observation, info)
         visualize_energy_status(observation, info)
         sleep(0.5)